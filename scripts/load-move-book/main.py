@@ -1,4 +1,6 @@
+import base64
 import os
+import struct
 import requests
 import PyPDF2
 import time
@@ -6,6 +8,13 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from typing import List
 
 api_url = os.getenv("ZORKDB_API_URL", "http://localhost:8001")
+embedding_dimension = 384  # all-MiniLM-L6-v2
+column_types = {"id": "INT", "embedding": f"VECTOR({embedding_dimension})", "text": "TEXT"}
+
+
+# Vectors are sent as base64 of their packed little-endian float32 values
+def encode_embedding(embedding: List[float]) -> str:
+    return base64.b64encode(struct.pack(f"<{len(embedding)}f", *embedding)).decode("ascii")
 
 # Step 1: Extract text from PDF
 def extract_text_from_pdf(pdf_path: str) -> str:
@@ -54,7 +63,7 @@ def create_table_if_not_exists(table_name: str) -> None:
         "data": {
             table_name: {
                 "columns": ["id", "embedding", "text"],
-                "column_types": {"id": "INT", "embedding": "TEXT", "text": "TEXT"},
+                "column_types": column_types,
                 "rows": [],
                 "indexes": {}
             }
@@ -79,9 +88,9 @@ def store_in_db_via_api(table_name: str, paragraphs: List[str], embeddings: List
             "data": {
                 table_name: {
                     "columns": ["id", "embedding", "text"],
-                    "column_types": {"id": "INT", "embedding": "TEXT", "text": "TEXT"},
+                    "column_types": column_types,
                     "indexes": {},
-                    "rows": [[i, str(embedding), paragraph]]
+                    "rows": [[i, encode_embedding(embedding), paragraph]]
                 }
             }
         }
@@ -21,13 +21,15 @@ async def generate_proof(
             text = ai_model_inputs_dict["value"]["text"]
             table_name = ai_model_inputs_dict["value"]["table_name"]
             vector = db_api.convert_text_to_embedding(text)
-            sql_query = f"SELECT * FROM {table_name} LIMIT 5 COSINE SIMILARITY embedding WITH {vector}"
+            sql_query = f"SELECT * FROM {table_name} LIMIT 5 COSINE SIMILARITY embedding WITH ?"
+            params = [vector]
         elif ai_model_inputs_dict["type"] == "SQL":
             sql_query = ai_model_inputs_dict["value"]
+            params = None
         else:
             raise ValueError("Unsupported AI model input type")
 
-        result, circuit, proof = db_api.execute_query(sql_query, proof=True)
+        result, circuit, proof = db_api.execute_query(sql_query, proof=True, params=params)
     except Exception as e:
         print("Error generating proof: ", e)
         return None, None, [["An error occurred while executing the query"]]
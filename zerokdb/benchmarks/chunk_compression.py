@@ -0,0 +1,121 @@
+"""
+Bytes transferred and end-to-end load time of an embedding table for each
+chunk format and compression codec.
+
+Run from the zerokdb directory:
+
+    python benchmarks/chunk_compression.py --rows 5000 --dimension 384
+
+Transfer time is simulated from the stored size at `--bandwidth-mbps`; load
+time covers decoding every chunk and inserting the rows into SQLite.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from zerokdb.chunk_format import COMPRESSIONS, compress, decode_document, encode_chunk, zstandard  # noqa: E402
+from zerokdb.simple_sql_db import SimpleSQLDatabase  # noqa: E402
+from zerokdb.vector_type import encode_vector_json  # noqa: E402
+
+
+def embedding_chunks(rows: int, chunk_rows: int, dimension: int):
+    rng = np.random.default_rng(0)
+    words = ["vector", "search", "ledger", "proof", "chunk", "table", "query", "index"]
+    chunks = []
+    for start in range(0, rows, chunk_rows):
+        chunks.append(
+            {
+                "docs": {
+                    "columns": ["id", "text", "embedding"],
+                    "column_types": {"id": "INT", "text": "TEXT", "embedding": f"VECTOR({dimension})"},
+                    "rows": [
+                        [
+                            i,
+                            " ".join(rng.choice(words, size=12)),
+                            encode_vector_json(rng.normal(size=dimension).astype(np.float32)),
+                        ]
+                        for i in range(start, min(start + chunk_rows, rows))
+                    ],
+                    "indexes": {},
+                }
+            }
+        )
+    return chunks
+
+
+class ChunkListStorage:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def get_table_version(self, table_name):
+        return 0
+
+    def load_changes(self, table_name):
+        if self.documents is None:
+            return None
+        chunks = [decode_document(content) for content in self.documents]
+        self.documents = None
+        table = dict(chunks[0][table_name])
+        table["rows"] = [row for chunk in chunks for row in chunk[table_name]["rows"]]
+        return {"reset": True, "table": table}
+
+
+def sequence_document(chunk_count: int) -> bytes:
+    entries = [
+        {"chunk_id": f"bafkrei{i:052d}", "chunk_hash": f"{i:064x}", "size": 100000}
+        for i in range(chunk_count)
+    ]
+    sequence = {
+        "default_sequence": entries,
+        "chunk_history": [{"chunk_id": entry["chunk_id"], "versions": [entry["chunk_id"]]} for entry in entries],
+        "latest_chunk": entries[-1]["chunk_id"],
+    }
+    return json.dumps(sequence).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--chunk-rows", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--bandwidth-mbps", type=float, default=50.0)
+    args = parser.parse_args()
+
+    chunks = embedding_chunks(args.rows, args.chunk_rows, args.dimension)
+    codecs = [None] + [codec for codec in COMPRESSIONS if codec != "zstd" or zstandard is not None]
+    sequence = sequence_document(args.rows)
+
+    print(f"{args.rows} rows of VECTOR({args.dimension}) in {len(chunks)} chunks, {args.bandwidth_mbps} Mbit/s")
+    print(f"{'format':<10}{'compression':<13}{'bytes':>14}{'sequence':>12}{'encode s':>10}{'transfer s':>12}{'load s':>9}{'total s':>9}")
+    for chunk_format in ("json", "columnar"):
+        for codec in codecs:
+            start = time.perf_counter()
+            documents = [
+                encode_chunk(chunk) if chunk_format == "columnar" else json.dumps(chunk).encode("utf-8")
+                for chunk in chunks
+            ]
+            if codec:
+                documents = [compress(content, codec) for content in documents]
+            encode_time = time.perf_counter() - start
+            stored = sum(len(content) for content in documents)
+            sequence_bytes = len(compress(sequence, codec)) if codec else len(sequence)
+
+            start = time.perf_counter()
+            db = SimpleSQLDatabase(ChunkListStorage(documents))
+            db._load_data_from_storage("docs")
+            load_time = time.perf_counter() - start
+            transfer_time = (stored + sequence_bytes) * 8 / (args.bandwidth_mbps * 1e6)
+            print(
+                f"{chunk_format:<10}{codec or 'none':<13}{stored:>14,}{sequence_bytes:>12,}"
+                f"{encode_time:>10.3f}{transfer_time:>12.3f}{load_time:>9.3f}{transfer_time + load_time:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
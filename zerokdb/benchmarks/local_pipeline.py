@@ -0,0 +1,86 @@
+"""
+Append, load and query an embedding table end to end with no network, on
+LocalStorage blocks in a temporary directory or in memory.
+
+Run from the zerokdb directory:
+
+    python benchmarks/local_pipeline.py --rows 2000 --dimension 384 --store directory
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from zerokdb.block_store import DirectoryBlockStore, MemoryBlockStore  # noqa: E402
+from zerokdb.enhanced_file_storage import EnhancedFileStorage  # noqa: E402
+from zerokdb.local_storage import LocalSequenceService, LocalStorage  # noqa: E402
+from zerokdb.simple_sql_db import SimpleSQLDatabase  # noqa: E402
+
+
+def database(service):
+    return SimpleSQLDatabase(EnhancedFileStorage("bench", api_host=None, pinata_api_key=None, service=service))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--store", choices=["directory", "memory"], default="directory")
+    parser.add_argument("--chunk-format", choices=["json", "columnar"], default="json")
+    parser.add_argument("--compression", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.rows, args.dimension)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as directory:
+        blocks = DirectoryBlockStore(directory) if args.store == "directory" else MemoryBlockStore()
+        service = LocalSequenceService(
+            LocalStorage(block_store=blocks, chunk_format=args.chunk_format, compression=args.compression)
+        )
+
+        writer = database(service)
+        writer.execute(f"CREATE TABLE docs (id INT, embedding VECTOR({args.dimension}))")
+        start = time.perf_counter()
+        for i, vector in enumerate(vectors):
+            writer.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[i, vector])
+        append_time = time.perf_counter() - start
+
+        writer.execute(f"CREATE TABLE bulk_docs (id INT, embedding VECTOR({args.dimension}))")
+        start = time.perf_counter()
+        writer.insert_many("bulk_docs", enumerate(vectors), batch_size=args.batch_size)
+        bulk_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sequence_cid = service.get_table_sequence_by_name("docs")["sequence_cid"]
+        compacted_cid, _ = service.storage.compact(sequence_cid)
+        service.update_sequence_cid("docs", compacted_cid)
+        compact_time = time.perf_counter() - start
+
+        reader = database(service)
+        start = time.perf_counter()
+        reader._load_data_from_storage("docs")
+        load_time = time.perf_counter() - start
+
+        query = "SELECT id FROM docs LIMIT 10 COSINE SIMILARITY embedding WITH ?"
+        start = time.perf_counter()
+        for target in rng.normal(size=(args.queries, args.dimension)):
+            reader.execute(query, params=[target])
+        query_time = (time.perf_counter() - start) / args.queries
+
+    print(f"{args.rows} rows of VECTOR({args.dimension}), {args.store} store, {args.chunk_format} chunks")
+    print(f"append   {append_time:8.3f} s  ({args.rows / append_time:,.0f} rows/s, one chunk per insert)")
+    print(f"bulk     {bulk_time:8.3f} s  ({args.rows / bulk_time:,.0f} rows/s, insert_many, one chunk per batch)")
+    print(f"compact  {compact_time:8.3f} s")
+    print(f"load     {load_time:8.3f} s  (compacted sequence, cold reader)")
+    print(f"query    {query_time * 1000:8.2f} ms per top-10 query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import pytest
+
+from zerokdb.enhanced_file_storage import EnhancedFileStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+@pytest.fixture
+def users_chunk():
+    """
+    Build a chunk of the one-column `users` table holding the given ids.
+    """
+    def build(*ids, indexes=None):
+        return {
+            "users": {
+                "columns": ["id"],
+                "column_types": {"id": "INT"},
+                "rows": [[i] for i in ids],
+                "indexes": indexes or {},
+            }
+        }
+
+    return build
+
+
+@pytest.fixture
+def database():
+    """
+    Open a database on the tables of an in-process sequence service. Keyword
+    arguments (result_cache, working_set, ...) go to SimpleSQLDatabase.
+    """
+    def open_database(service, **kwargs):
+        storage = EnhancedFileStorage("db", api_host=None, pinata_api_key=None, service=service)
+        return SimpleSQLDatabase(storage, **kwargs)
+
+    return open_database
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+from zerokdb.api import DatabaseAPI
+from zerokdb.block_store import DirectoryBlockStore, MemoryBlockStore, content_cid
+from zerokdb.enhanced_file_storage import EnhancedFileStorage
+from zerokdb.local_storage import LocalSequenceService, LocalStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+@pytest.mark.parametrize("kind", ["memory", "directory"])
+def test_block_stores_are_content_addressed(tmp_path, kind):
+    store = MemoryBlockStore() if kind == "memory" else DirectoryBlockStore(str(tmp_path))
+    cid = store.put(b"block")
+
+    assert cid == content_cid(b"block") == store.put(b"block")
+    assert store.has(cid) and store.get(cid) == b"block"
+    assert not store.has(content_cid(b"other"))
+    with pytest.raises(ValueError):
+        store.get(content_cid(b"other"))
+
+
+def test_local_storage_has_ipfs_sequence_semantics(tmp_path, users_chunk):
+    storage = LocalStorage(str(tmp_path), chunk_format="columnar", compression="zlib")
+    _, sequence_cid = storage.append_data(users_chunk(1, 2), "0x0")
+    _, sequence_cid = storage.append_data(users_chunk(3), sequence_cid)
+    assert storage.download_db(sequence_cid)["users"]["rows"] == [[1], [2], [3]]
+
+    compacted_cid, chunk_cids = storage.compact(sequence_cid)
+    assert len(chunk_cids) == 1
+    # A new instance reads the same blocks back from disk
+    assert LocalStorage(str(tmp_path)).download_db(compacted_cid)["users"]["rows"] == [[1], [2], [3]]
+
+    # The linked-list API keeps working
+    linked = LocalStorage(str(tmp_path / "linked"))
+    first = linked.append_linked_data({"id": 1})
+    linked.cid = first
+    assert linked.traverse_linked_data() == [{"id": 1}]
+    assert len(linked.get_cid_sequence()["default_sequence"]) == 1
+
+
+def test_pipeline_runs_against_the_fake_pinning_service():
+    blocks = MemoryBlockStore()
+    service = LocalSequenceService(LocalStorage(block_store=blocks))
+    writer = SimpleSQLDatabase(EnhancedFileStorage("db", api_host=None, pinata_api_key=None, service=service))
+    writer.execute("CREATE TABLE docs (id INT, embedding VECTOR(2))")
+    for i, vector in enumerate([[1, 0], [0, 1], [1, 1]]):
+        writer.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[i, vector])
+
+    reader = SimpleSQLDatabase(EnhancedFileStorage("db", api_host=None, pinata_api_key=None, service=service))
+    query = "SELECT id FROM docs LIMIT 1 COSINE SIMILARITY embedding WITH ?"
+    assert reader.execute(query, params=[[0.1, 1]]) == [(1,)]
+
+    # Only the chunk appended since the last sync is read
+    writer.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[3, [-1, 0]])
+    gets = blocks.stats()["gets"]
+    assert reader.execute(query, params=[[-1, 0.1]]) == [(3,)]
+    assert blocks.stats()["gets"] == gets + 2
+
+
+def test_database_api_local_storage_survives_restarts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    location = str(tmp_path / "db")
+    db = DatabaseAPI(storage_type="local", storage_location=location)
+    db.create_table("users", {"id": "INT", "name": "TEXT"})
+    db.insert_into("users", {"id": 1, "name": "Alice"})
+    db.insert_into("users", {"id": 2, "name": "Bob"})
+
+    restarted = DatabaseAPI(storage_type="local", storage_location=location)
+    assert restarted.execute_query("SELECT name FROM users") == [("Alice",), ("Bob",)]
+
+
+def test_database_apis_share_a_local_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    location = str(tmp_path / "db")
+    first = DatabaseAPI(storage_type="local", storage_location=location, result_cache=None)
+    second = DatabaseAPI(storage_type="local", storage_location=location, result_cache=None)
+    first.create_table("t", {"id": "INT"})
+    second.create_table("u", {"id": "INT"})
+    first.insert_into("u", {"id": 1})
+    second.insert_into("t", {"id": 2})
+    second.insert_into("u", {"id": 3})
+
+    # Neither drops the other's tables, and each sees the other's appends
+    with open(os.path.join(location, "sequences.json")) as file:
+        assert sorted(json.load(file)) == ["t", "u"]
+    assert first.execute_query("SELECT id FROM u") == [(1,), (3,)]
+    assert second.execute_query("SELECT id FROM t") == [(2,)]
+    assert DatabaseAPI(storage_type="local", storage_location=location).execute_query("SELECT id FROM t") == [(2,)]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from zerokdb.api import DatabaseAPI
+from zerokdb.block_store import MemoryBlockStore
+from zerokdb.file_storage import FileStorage
+from zerokdb.local_storage import LocalSequenceService, LocalStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+class CountingService(LocalSequenceService):
+    def __init__(self, storage):
+        super().__init__(storage)
+        self.updates = 0
+
+    def append_data(self, table_name, data):
+        self.updates += 1
+        return super().append_data(table_name, data)
+
+    def append_chunks(self, table_name, chunks):
+        self.updates += 1
+        return super().append_chunks(table_name, chunks)
+
+
+def test_insert_many_stores_one_chunk_per_batch(database):
+    service = CountingService(LocalStorage(block_store=MemoryBlockStore()))
+    writer = database(service)
+    writer.execute("CREATE TABLE docs (id INT, name TEXT, embedding VECTOR(4))")
+
+    vectors = np.random.default_rng(0).normal(size=(2500, 4)).astype(np.float32)
+    rows = ((i, f"doc {i}", vectors[i]) for i in range(2500))
+    assert writer.insert_many("docs", rows, batch_size=1000) == 2500
+    assert service.updates == 3
+
+    sequence_cid = service.get_table_sequence_by_name("docs")["sequence_cid"]
+    entries = service.storage.sequence_entries(sequence_cid)
+    # The CREATE TABLE chunk and one chunk per batch
+    assert len(entries) == 1 + 3
+
+    reader = database(service)
+    assert reader.execute("SELECT COUNT(*) FROM docs") == [(2500,)]
+    assert writer.execute("SELECT COUNT(*) FROM docs") == [(2500,)]
+    result = reader.execute("SELECT id FROM docs LIMIT 1 COSINE SIMILARITY embedding WITH ?", params=[vectors[1234]])
+    assert result[0][0] == 1234
+
+
+def test_insert_many_groups_batches_per_request(database):
+    service = CountingService(LocalStorage(block_store=MemoryBlockStore()))
+    db = database(service)
+    db.execute("CREATE TABLE users (id INT, name TEXT)")
+
+    inserted, proofs = db.insert_many(
+        "users", ([i] for i in range(50)), columns=["id"], batch_size=10, batches_per_request=2, generate_proof=True
+    )
+    assert inserted == 50
+    assert len(proofs) == 5
+    # Two requests of two chunks and one of the last chunk
+    assert service.updates == 3
+    sequence_cid = service.get_table_sequence_by_name("users")["sequence_cid"]
+    assert len(service.storage.sequence_entries(sequence_cid)) == 1 + 5
+    assert database(service).execute("SELECT id FROM users WHERE id >= 48") == [(48,), (49,)]
+
+
+def test_insert_many_rejects_bad_rows(tmp_path):
+    db = SimpleSQLDatabase(FileStorage(str(tmp_path / "db.json")))
+    db.execute("CREATE TABLE users (id INT, name TEXT)")
+
+    with pytest.raises(ValueError):
+        db.insert_many("users", [(1, "Alice")], columns=["id", "email"])
+    # Batches before the bad one are kept, locally and in storage
+    with pytest.raises(ValueError):
+        db.insert_many("users", [(1, "Alice"), (2, "Bob"), (3,)], batch_size=2)
+    assert db.execute("SELECT id FROM users") == [(1,), (2,)]
+    assert SimpleSQLDatabase(FileStorage(str(tmp_path / "db.json"))).execute("SELECT id FROM users") == [(1,), (2,)]
+
+
+def test_database_api_insert_many_takes_dicts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseAPI(storage_type="local", storage_location=str(tmp_path / "db"))
+    db.create_table("users", {"id": "INT", "name": "TEXT"})
+
+    assert db.insert_many("users", iter([{"id": i, "name": f"user {i}"} for i in range(5)]), batch_size=2) == 5
+    assert db.insert_many("users", []) == 0
+    assert db.execute_query("SELECT name FROM users WHERE id = 4") == [("user 4",)]
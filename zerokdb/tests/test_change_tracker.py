@@ -0,0 +1,124 @@
+import hashlib
+import json
+
+import pytest
+
+from zerokdb import change_tracker as change_tracker_module
+from zerokdb.change_tracker import ChangeTracker
+from zerokdb.file_storage import FileStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+def rows_digest(previous, rows):
+    rows_hash = hashlib.sha256(json.dumps(rows, separators=(",", ":")).encode()).hexdigest()
+    return hashlib.sha256(previous.encode() + rows_hash.encode()).hexdigest()
+
+
+def test_only_writes_are_logged_with_their_rows(tmp_path):
+    log_file = str(tmp_path / "changes.jsonl")
+    tracker = ChangeTracker(log_file)
+    db = SimpleSQLDatabase(FileStorage(str(tmp_path / "db.json")), tracker)
+    db.execute("CREATE TABLE users (id INT, name TEXT)")
+    db.execute("CREATE TABLE orders (id INT)")
+    db.execute("INSERT INTO users (id, name) VALUES (1, 'Alice')")
+    db.execute("SELECT * FROM users")
+    db.insert_many("users", [(2, "Bob"), (3, "Carol"), (4, "Dan")], batch_size=2)
+    orders_digest = tracker.digest("orders")
+    db.execute("SELECT count(*) FROM users JOIN orders ON orders.id = users.id")
+
+    changes = list(tracker.read_changes())
+    assert [(change["table"], change["row_count"]) for change in changes] == [
+        ("users", 0), ("orders", 0), ("users", 1), ("users", 2), ("users", 1)
+    ]
+    assert changes[2]["query"] == "INSERT INTO users (id, name) VALUES (1, 'Alice')"
+
+    digest = rows_digest("", [])
+    assert changes[0]["data_hash"] == digest
+    for rows in ([[1, "Alice"]], [[2, "Bob"], [3, "Carol"]], [[4, "Dan"]]):
+        digest = rows_digest(digest, rows)
+    assert tracker.digest("users") == digest == changes[-1]["data_hash"]
+    # Writes to one table leave the others' digests alone
+    assert tracker.digest("orders") == orders_digest == rows_digest("", [])
+    db.close()
+    tracker.close()
+
+    reopened = ChangeTracker(log_file)
+    assert reopened.digests == {"users": digest, "orders": orders_digest}
+    # Recreating a table starts its digest over
+    reopened.log_change("CREATE TABLE users (id INT)", "users", reset=True)
+    assert reopened.digest("users") == rows_digest("", [])
+    reopened.close()
+
+
+def test_reopening_reads_only_the_tail_of_the_log(tmp_path):
+    log_file = tmp_path / "changes.jsonl"
+    tracker = ChangeTracker(str(log_file))
+    tracker.log_change("CREATE TABLE users (id INT)", "users", reset=True)
+    tracker.log_change("INSERT INTO users (id) VALUES (1)", "users", [[1]])
+    tracker.close()
+    digests = dict(tracker.digests)
+
+    # Lines before the saved offset are not read again
+    content = log_file.read_bytes()
+    log_file.write_bytes(b" " * (len(content) - 1) + b"\n")
+    assert ChangeTracker(str(log_file)).digests == digests
+
+    # Lines appended after the digests were saved (e.g. before a crash) are
+    log_file.write_bytes(content)
+    tracker = ChangeTracker(str(log_file), fsync="never")
+    tracker.log_change("INSERT INTO users (id) VALUES (2)", "users", [[2]])
+    tracker.close()
+    (tmp_path / "changes.jsonl.digests").write_text(json.dumps({"offset": len(content), "digests": digests}))
+    assert ChangeTracker(str(log_file)).digests == tracker.digests != digests
+
+    # Without the digests file the whole log is read
+    (tmp_path / "changes.jsonl.digests").unlink()
+    assert ChangeTracker(str(log_file)).digests == tracker.digests
+
+
+def test_json_array_logs_are_converted(tmp_path):
+    log_file = tmp_path / "change_log.json"
+    log_file.write_text(json.dumps([{"query_hash": "a", "query": "SELECT 1", "data_hash": "b"}], indent=4))
+
+    tracker = ChangeTracker(str(log_file))
+    tracker.log_change("INSERT INTO users (id) VALUES (1)", "users", [[1]])
+    tracker.close()
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["query"] == "SELECT 1"
+    assert json.loads(lines[1])["table"] == "users"
+
+
+def test_default_json_log_is_migrated(tmp_path):
+    legacy_file = tmp_path / "change_log.json"
+    legacy_file.write_text(json.dumps([{"query_hash": "a", "query": "SELECT 1", "data_hash": "b"}]))
+
+    tracker = ChangeTracker(str(tmp_path / "change_log.jsonl"))
+    tracker.log_change("INSERT INTO users (id) VALUES (1)", "users", [[1]])
+    tracker.close()
+    assert [change["query"] for change in tracker.read_changes()] == [
+        "SELECT 1", "INSERT INTO users (id) VALUES (1)"
+    ]
+    # Once migrated, the old log is left alone
+    assert ChangeTracker(str(tmp_path / "change_log.jsonl")).digest("users") == tracker.digest("users")
+
+
+def test_fsync_policies(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(change_tracker_module.os, "fsync", synced.append)
+
+    tracker = ChangeTracker(str(tmp_path / "always.jsonl"), fsync="always")
+    for i in range(3):
+        tracker.log_change("INSERT INTO users (id) VALUES (?)", "users", [[i]])
+    assert len(synced) == 3
+
+    synced.clear()
+    tracker = ChangeTracker(str(tmp_path / "never.jsonl"), fsync="never")
+    for i in range(3):
+        tracker.log_change("INSERT INTO users (id) VALUES (?)", "users", [[i]])
+    tracker.close()
+    assert synced == []
+    assert len(list(tracker.read_changes())) == 3
+
+    with pytest.raises(ValueError):
+        ChangeTracker(str(tmp_path / "bad.jsonl"), fsync="sometimes")
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+
+from zerokdb import block_store
+from zerokdb import chunk_cache as chunk_cache_module
+from zerokdb.chunk_cache import ChunkCache, chunk_hash
+from zerokdb.ipfs_storage import IPFSStorage
+
+
+def encoded(data):
+    return json.dumps(data).encode("utf-8")
+
+
+def test_chunk_cache_round_trip_and_verification(tmp_path, monkeypatch):
+    cache = ChunkCache(str(tmp_path))
+    chunk = {"users": {"rows": [[1, "Alice"]]}}
+
+    assert cache.get("bafyone") is None
+    assert cache.put("bafyone", encoded(chunk), chunk_hash(chunk))
+    # Entries were verified when stored, so hits are not decoded again
+    monkeypatch.setattr(chunk_cache_module, "decode_document", None)
+    assert json.loads(cache.get("bafyone")) == chunk
+    monkeypatch.undo()
+    # Content that does not match its chunk hash is neither stored nor served
+    assert not cache.put("bafytwo", encoded({"tampered": True}), chunk_hash(chunk))
+    assert cache.get("bafytwo") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["rejected"]) == (1, 2, 1)
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.startswith(".tmp-")]
+
+
+def test_chunk_cache_evicts_least_recently_used(tmp_path):
+    cache = ChunkCache(str(tmp_path), max_bytes=350)
+    for i in range(3):
+        cache.put(f"bafy{i}", b"x" * 100)
+        past = time.time() - 100 + i
+        os.utime(cache._path(f"bafy{i}"), (past, past))
+    cache.get("bafy0")
+    cache.put("bafy3", b"x" * 100)
+
+    # The oldest entry goes; the one read since survives
+    assert cache.get("bafy1") is None
+    for cid in ("bafy0", "bafy2", "bafy3"):
+        assert cache.get(cid) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ipfs_storage_reads_through_the_cache(tmp_path, monkeypatch):
+    chunk = {"users": {"columns": ["id"], "column_types": {"id": "INT"}, "rows": [[1]]}}
+    sequence = {"default_sequence": [{"chunk_id": "bafychunk", "chunk_hash": chunk_hash(chunk)}]}
+    documents = {"bafysequence": encoded(sequence), "bafychunk": encoded(chunk)}
+    fetched = []
+
+    def read_raw(self, cid):
+        fetched.append(cid)
+        return documents[cid]
+
+    monkeypatch.setattr(IPFSStorage, "read_from_ipfs_pinata_raw", read_raw)
+    cache = ChunkCache(str(tmp_path))
+    for _ in range(2):
+        storage = IPFSStorage(pinata_api_key="key", chunk_cache=cache)
+        assert storage.download_db("bafysequence")["users"]["rows"] == [[1]]
+    assert fetched == ["bafysequence", "bafychunk"]
+    assert cache.stats()["hits"] == 2
+
+
+def test_chunks_download_in_parallel_and_stream_in_order(monkeypatch):
+    chunk_ids = [f"bafy{i}" for i in range(24)]
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, cid):
+            self.content = encoded(
+                {"users": {"columns": ["id"], "column_types": {"id": "INT"}, "rows": [[cid]]}}
+            )
+
+    def get(url, headers):
+        cid = url.rsplit("/", 1)[-1]
+        with lock:
+            in_flight.append(cid)
+            peak.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.remove(cid)
+        return Response(cid)
+
+    monkeypatch.setattr(block_store, "_gateway_slots", {})
+    storage = IPFSStorage(pinata_api_key="key", download_workers=8, gateway_concurrency=4)
+    monkeypatch.setattr(storage.transport, "get", get)
+    storage.chunk_cache = None
+
+    start = time.time()
+    table = storage.stream_table("users", chunk_ids)
+    assert [row[0] for row in table["rows"]] == chunk_ids
+    assert time.time() - start < 24 * 0.02 / 2
+    assert max(peak) <= 4
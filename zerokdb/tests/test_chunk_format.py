@@ -0,0 +1,163 @@
+import json
+
+import numpy as np
+import pytest
+
+from zerokdb.chunk_cache import ChunkCache, chunk_hash
+from zerokdb.chunk_format import (
+    ColumnarChunk,
+    compress,
+    decode_document,
+    encode_chunk,
+    is_compressed,
+    resolve_compression,
+)
+from zerokdb.ipfs_storage import IPFSStorage
+from zerokdb.local_storage import LocalStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+from zerokdb.vector_type import encode_vector_json
+
+
+def docs_chunk():
+    return {
+        "docs": {
+            "columns": ["id", "score", "title", "flag", "embedding", "extra"],
+            "column_types": {
+                "id": "INT",
+                "score": "REAL",
+                "title": "TEXT",
+                "flag": "BOOL",
+                "embedding": "VECTOR(3)",
+                "extra": "TEXT",
+            },
+            "rows": [
+                [1, 0.5, "alpha", True, encode_vector_json([1, 0, 0]), "x"],
+                [2, None, "beta", False, encode_vector_json([0, 1, 0]), 3],
+                [3, 2.25, None, None, None, None],
+            ],
+            "indexes": {"docs_idx": {"column": "embedding"}},
+        }
+    }
+
+
+def test_columnar_round_trip_keeps_logical_content():
+    chunk = docs_chunk()
+    content = encode_chunk(chunk)
+    decoded = decode_document(content)
+
+    assert chunk_hash(decoded) == chunk_hash(chunk)
+    assert decoded["docs"]["indexes"] == chunk["docs"]["indexes"]
+    assert decoded["docs"]["rows"][0][:4] == [1, 0.5, "alpha", True]
+    assert decoded["docs"]["rows"][2] == [3, 2.25, None, None, None, None]
+    # JSON documents stay readable
+    assert decode_document(json.dumps(chunk).encode("utf-8")) == chunk
+
+
+def test_columnar_chunk_views_and_stats():
+    chunk = ColumnarChunk(encode_chunk(docs_chunk()))
+
+    ids = chunk.column("docs", "id")
+    assert ids.dtype == np.dtype("<i8") and not ids.flags.owndata
+    assert ids.tolist() == [1, 2, 3]
+    embeddings = chunk.column("docs", "embedding")
+    assert embeddings.dtype == np.float32 and embeddings.shape == (3, 3)
+    assert embeddings[:2].tolist() == [[1, 0, 0], [0, 1, 0]]
+    assert chunk.nulls("docs", "embedding").tolist() == [False, False, True]
+    assert chunk.nulls("docs", "id") is None
+
+    stats = chunk.stats("docs")
+    assert stats["id"] == {"min": 1, "max": 3}
+    assert stats["score"] == {"min": 0.5, "max": 2.25}
+    assert stats["title"] == {"min": "alpha", "max": "beta"}
+    assert "embedding" not in stats
+
+    table = chunk.table("docs", columns=["id", "title"])
+    assert table["columns"] == ["id", "title"]
+    assert table["column_types"] == {"id": "INT", "title": "TEXT"}
+    assert table["rows"] == [[1, "alpha"], [2, "beta"], [3, None]]
+
+
+def test_columnar_chunk_rejects_other_content():
+    with pytest.raises(ValueError):
+        ColumnarChunk(b"ZKCC" + b"\0" * 32)
+
+
+def test_local_storage_reads_both_formats(tmp_path):
+    json_storage = LocalStorage(str(tmp_path))
+    columnar_storage = LocalStorage(str(tmp_path), chunk_format="columnar")
+    json_cid, _ = json_storage.save_chunk(docs_chunk())
+    columnar_cid, size = columnar_storage.save_chunk(docs_chunk())
+
+    assert columnar_cid != json_cid and columnar_storage.has(columnar_cid)
+    assert size == len(encode_chunk(docs_chunk()))
+    assert chunk_hash(json_storage.load(columnar_cid)) == chunk_hash(columnar_storage.load(json_cid))
+
+
+class ChunkStorage:
+    def __init__(self, chunk):
+        self.chunk = chunk
+
+    def get_table_version(self, table_name):
+        return 0
+
+    def load_changes(self, table_name):
+        if table_name not in self.chunk:
+            return None
+        return {"reset": True, "table": self.chunk.pop(table_name)}
+
+
+def test_database_loads_columnar_chunks():
+    chunk = docs_chunk()
+    chunk["docs"]["indexes"] = {}
+    db = SimpleSQLDatabase(ChunkStorage(decode_document(encode_chunk(chunk))))
+
+    assert db.execute("SELECT id, title FROM docs") == [(1, "alpha"), (2, "beta"), (3, None)]
+    query = "SELECT id FROM docs WHERE embedding IS NOT NULL LIMIT 1 COSINE SIMILARITY embedding WITH ?"
+    assert db.execute(query, params=[[0, 1, 0.1]]) == [(2,)]
+
+
+@pytest.mark.parametrize("compression", ["zlib", "lzma", "zstd"])
+def test_compressed_documents_decode_transparently(compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    chunk = docs_chunk()
+    for content in (encode_chunk(chunk), json.dumps(chunk).encode("utf-8")):
+        compressed = compress(content, compression)
+        assert is_compressed(compressed)
+        assert chunk_hash(decode_document(compressed)) == chunk_hash(chunk)
+
+    with pytest.raises(ValueError):
+        resolve_compression("snappy")
+
+
+def test_ipfs_storage_compresses_chunks_and_sequences(tmp_path, monkeypatch):
+    storage = IPFSStorage(
+        pinata_api_key="key",
+        chunk_cache=ChunkCache(str(tmp_path)),
+        chunk_format="columnar",
+        compression="zlib",
+    )
+    documents = {}
+
+    def save_bytes(content, name="table"):
+        cid = f"cid{len(documents)}"
+        documents[cid] = content
+        return cid
+
+    monkeypatch.setattr(storage, "save", lambda data: pytest.fail("JSON pinning used"))
+    monkeypatch.setattr(storage, "save_bytes", save_bytes)
+    monkeypatch.setattr(storage, "read_from_ipfs_pinata_raw", lambda cid: documents[cid])
+
+    _, sequence_cid = storage.append_data(docs_chunk(), "0x0")
+    _, sequence_cid = storage.append_data(docs_chunk(), sequence_cid)
+
+    assert all(is_compressed(content) for content in documents.values())
+    entries = storage.load_sequence(sequence_cid)["default_sequence"]
+    assert [entry["compression"] for entry in entries] == ["zlib", "zlib"]
+    assert entries[0]["chunk_hash"] == chunk_hash(docs_chunk())
+    assert entries[0]["size"] == len(documents[entries[0]["chunk_id"]])
+
+    rows = storage.download_db(sequence_cid)["docs"]["rows"]
+    assert [row[0] for row in rows] == [1, 2, 3, 1, 2, 3]
+    # The cache verifies compressed chunks against their logical hash
+    assert storage.chunk_cache.stats()["rejected"] == 0
@@ -0,0 +1,90 @@
+import hashlib
+import json
+
+import pytest
+
+from zerokdb.ipfs_storage import IPFSStorage
+
+
+def memory_storage(monkeypatch, sequence_format="paged"):
+    storage = IPFSStorage(pinata_api_key="key", sequence_format=sequence_format, sequence_fanout=2)
+    storage.chunk_cache = None
+    documents = {}
+
+    def save(data):
+        content = json.dumps(data).encode("utf-8")
+        cid = "cid" + hashlib.sha256(content).hexdigest()[:16]
+        documents[cid] = content
+        return cid
+
+    monkeypatch.setattr(storage, "save", save)
+    monkeypatch.setattr(storage, "read_from_ipfs_pinata_raw", lambda cid: documents[cid])
+    return storage
+
+
+@pytest.mark.parametrize("sequence_format", ["flat", "paged"])
+def test_compaction_folds_chunks_into_bounded_snapshots(monkeypatch, sequence_format, users_chunk):
+    storage = memory_storage(monkeypatch, sequence_format)
+    cid = "0x0"
+    for i in range(5):
+        indexes = {"idx": {"column": "id"}} if i == 2 else None
+        _, cid = storage.append_data(users_chunk(2 * i, 2 * i + 1, indexes=indexes), cid)
+
+    for sequence in (storage.load_sequence(cid), storage.load_sequence_root(cid)):
+        assert storage.needs_compaction(sequence, max_chunks=4)
+        assert not storage.needs_compaction(sequence, max_chunks=5)
+        assert storage.needs_compaction(sequence, max_chunks=5, max_delta_bytes=100)
+
+    compacted_cid, chunk_cids = storage.compact(cid, max_chunk_rows=4)
+    compacted = storage.load_sequence(compacted_cid)
+    assert len(chunk_cids) == 3
+    assert [entry["chunk_id"] for entry in compacted["default_sequence"]] == chunk_cids
+    assert all(entry["snapshot"] for entry in compacted["default_sequence"])
+    assert compacted["compacted_from"] == cid
+    if sequence_format == "flat":
+        # The folded chunks are still part of the history
+        assert len(compacted["chunk_history"]) == 5 + 3
+    assert not storage.needs_compaction(compacted, max_chunks=0)
+    assert not storage.needs_compaction(storage.load_sequence_root(compacted_cid), max_chunks=0)
+
+    assert storage.download_db(compacted_cid) == storage.download_db(cid)
+    assert storage.download_db(compacted_cid)["users"]["indexes"] == {"idx": {"column": "id"}}
+
+    # Nothing new to fold
+    assert storage.compact(compacted_cid) == (compacted_cid, [])
+
+
+@pytest.mark.parametrize("sequence_format", ["flat", "paged"])
+def test_repeated_compactions_keep_the_chunk_count_bounded(monkeypatch, sequence_format, users_chunk):
+    storage = memory_storage(monkeypatch, sequence_format)
+    cid = "0x0"
+    for i in range(10):
+        _, cid = storage.append_data(users_chunk(3 * i), cid)
+        _, cid = storage.append_data(users_chunk(3 * i + 1, 3 * i + 2), cid)
+        cid, _ = storage.compact(cid, max_chunk_rows=8)
+
+    entries = storage.sequence_entries(cid)
+    # 30 rows in three full snapshots of 8 and one partial one
+    assert len(entries) == 4
+    assert [entry["full"] for entry in entries] == [True, True, True, False]
+    assert storage.download_db(cid)["users"]["rows"] == [[i] for i in range(30)]
+
+
+@pytest.mark.parametrize("sequence_format", ["flat", "paged"])
+def test_rebase_carries_over_chunks_appended_during_compaction(monkeypatch, sequence_format, users_chunk):
+    storage = memory_storage(monkeypatch, sequence_format)
+    cid = "0x0"
+    for i in range(3):
+        _, cid = storage.append_data(users_chunk(i), cid)
+
+    compacted_cid, _ = storage.compact(cid)
+    _, latest_cid = storage.append_data(users_chunk(3), cid)
+
+    rebased_cid = storage.rebase_sequence(compacted_cid, cid, latest_cid)
+    rows = storage.download_db(rebased_cid)["users"]["rows"]
+    assert rows == [[0], [1], [2], [3]]
+    assert storage.needs_compaction(storage.load_sequence(rebased_cid), max_chunks=0)
+
+    _, unrelated_cid = storage.append_data(users_chunk(9), "0x0")
+    with pytest.raises(ValueError):
+        storage.rebase_sequence(compacted_cid, cid, unrelated_cid)
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from zerokdb.embedding_batcher import EmbeddingBatcher
+
+
+def test_concurrent_requests_are_batched():
+    calls = []
+
+    def convert_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    async def run():
+        batcher = EmbeddingBatcher(convert_batch, max_batch_size=4, window=0.05)
+        texts = ["a" * i for i in range(1, 11)]
+        results = await asyncio.gather(*(batcher.embed(text) for text in texts))
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert results == [[float(i)] for i in range(1, 11)]
+    assert [len(call) for call in calls] == [4, 4, 2]
+
+
+def test_batch_errors_reach_every_caller():
+    def convert_batch(texts):
+        raise RuntimeError("model failed")
+
+    async def run():
+        batcher = EmbeddingBatcher(convert_batch, window=0.01)
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+        await batcher.close()
+        return results
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+
+def test_convert_batch_matches_single_conversions():
+    pytest.importorskip("torch")
+    from zerokdb.text_to_embedding import TextToEmbedding
+
+    text_to_embedding = TextToEmbedding()
+    texts = ["short", "a much longer sentence that needs padding in a batch", "mid length"]
+    batched = text_to_embedding.convert_batch(texts, batch_size=2)
+    for text, embedding in zip(texts, batched):
+        assert embedding == pytest.approx(text_to_embedding.convert(text), abs=1e-5)
@@ -0,0 +1,64 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from zerokdb.enhanced_file_storage import EnhancedFileStorage
+from zerokdb.http_transport import HTTPTransport
+
+
+@pytest.fixture
+def server():
+    clients = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            clients.append(self.client_address)
+            body = b'{"sequence_cid": "bafysequence"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", clients
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_storage_reuses_pooled_connections(server):
+    url, clients = server
+    transport = HTTPTransport()
+    storage = EnhancedFileStorage("db", api_host=url, pinata_api_key="key", transport=transport)
+
+    for _ in range(5):
+        assert storage.get_table_sequence_by_name("users") == {"sequence_cid": "bafysequence"}
+    # Every request went over the same kept-alive connection
+    assert len(clients) == 5
+    assert len(set(clients)) == 1
+    assert storage.ipfs.transport is transport
+    transport.close()
+
+
+def test_transport_pools_and_timeouts(monkeypatch):
+    transport = HTTPTransport(
+        pool_maxsize=16, host_pool_sizes={"gateway.pinata.cloud": 64}, connect_timeout=2, read_timeout=30
+    )
+    session = transport.client
+    assert session.get_adapter("https://gateway.pinata.cloud/ipfs/bafy")._pool_maxsize == 64
+    assert session.get_adapter("https://api.pinata.cloud/pinning")._pool_maxsize == 16
+
+    calls = []
+    monkeypatch.setattr(session, "request", lambda method, url, **kwargs: calls.append(kwargs))
+    transport.get("https://gateway.pinata.cloud/ipfs/bafy")
+    transport.post("https://api.pinata.cloud/pinning", timeout=1)
+    assert [call["timeout"] for call in calls] == [(2, 30), 1]
@@ -0,0 +1,109 @@
+from zerokdb.enhanced_file_storage import EnhancedFileStorage
+from zerokdb.file_storage import FileStorage
+from zerokdb.ipfs_storage import IPFSStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+def test_file_storage_syncs_only_new_rows(tmp_path):
+    filename = str(tmp_path / "sync_db.json")
+    writer = SimpleSQLDatabase(FileStorage(filename))
+    writer.execute("CREATE TABLE users (id INT, name TEXT)")
+    writer.execute("INSERT INTO users (id, name) VALUES (1, 'Alice')")
+
+    reader_storage = FileStorage(filename)
+    reader = SimpleSQLDatabase(reader_storage)
+    assert reader.execute("SELECT id FROM users") == [(1,)]
+    assert reader_storage.load_changes("users") is None
+
+    writer.execute("INSERT INTO users (id, name) VALUES (2, 'Bob')")
+    assert reader.execute("SELECT id FROM users") == [(1,), (2,)]
+
+    # The reader's own writes are not loaded back a second time
+    reader.execute("INSERT INTO users (id, name) VALUES (3, 'Carol')")
+    assert reader.execute("SELECT id FROM users") == [(1,), (2,), (3,)]
+    assert writer.execute("SELECT id FROM users") == [(1,), (2,), (3,)]
+
+
+class FakeApi:
+    def __init__(self):
+        self.chunks = {}
+        self.sequence = []
+        self.sequence_requests = 0
+        self.downloads = []
+
+    def sequence_cid(self):
+        return f"seq-{len(self.sequence)}"
+
+    def append(self, table_name, data):
+        chunk_id = f"chunk-{len(self.chunks)}"
+        self.chunks[chunk_id] = data
+        self.sequence.append(chunk_id)
+        return {"data_cid": chunk_id, "sequence_cid": self.sequence_cid()}
+
+    def install(self, monkeypatch, storage):
+        def get_table_sequence_by_name(table_name):
+            self.sequence_requests += 1
+            return {"sequence_cid": self.sequence_cid()} if self.sequence else {}
+
+        def load_sequence_root(_, cid):
+            return {"default_sequence": [{"chunk_id": chunk_id} for chunk_id in self.sequence]}
+
+        def load(_, cid, expected_hash=None):
+            self.downloads.append(cid)
+            return self.chunks[cid]
+
+        monkeypatch.setattr(storage, "get_table_sequence_by_name", get_table_sequence_by_name)
+        monkeypatch.setattr(storage, "append_data_to_api", self.append)
+        monkeypatch.setattr(IPFSStorage, "load_sequence_root", load_sequence_root)
+        monkeypatch.setattr(IPFSStorage, "read_from_ipfs_pinata", load)
+
+
+def test_enhanced_storage_downloads_only_new_chunks(monkeypatch, users_chunk):
+    api = FakeApi()
+    storage = EnhancedFileStorage("db", api_host="http://api", pinata_api_key="key")
+    api.install(monkeypatch, storage)
+    api.append("users", users_chunk(1, 2))
+    db = SimpleSQLDatabase(storage)
+
+    assert db.execute("SELECT id FROM users") == [(1,), (2,)]
+    assert db.execute("SELECT id FROM users") == [(1,), (2,)]
+    assert api.downloads == ["chunk-0"]
+
+    # Another writer appends a chunk
+    api.append("users", users_chunk(3))
+    assert db.execute("SELECT id FROM users") == [(1,), (2,), (3,)]
+    assert api.downloads == ["chunk-0", "chunk-1"]
+
+    # Chunks this instance appended are not downloaded again
+    db.execute("INSERT INTO users (id) VALUES (4)")
+    assert db.execute("SELECT id FROM users") == [(1,), (2,), (3,), (4,)]
+    assert api.downloads == ["chunk-0", "chunk-1"]
+
+
+def test_enhanced_storage_staleness_window(monkeypatch, users_chunk):
+    api = FakeApi()
+    storage = EnhancedFileStorage(
+        "db", api_host="http://api", pinata_api_key="key", max_staleness=60
+    )
+    api.install(monkeypatch, storage)
+    api.append("users", users_chunk(1))
+    db = SimpleSQLDatabase(storage)
+
+    for _ in range(3):
+        assert db.execute("SELECT id FROM users") == [(1,)]
+    assert api.sequence_requests == 1
+
+
+def test_enhanced_storage_reloads_rewritten_sequences(monkeypatch, users_chunk):
+    api = FakeApi()
+    storage = EnhancedFileStorage("db", api_host="http://api", pinata_api_key="key")
+    api.install(monkeypatch, storage)
+    api.append("users", users_chunk(1))
+    api.append("users", users_chunk(2))
+    db = SimpleSQLDatabase(storage)
+    assert db.execute("SELECT id FROM users") == [(1,), (2,)]
+
+    # A compacted sequence no longer starts with the synced chunks
+    api.sequence = []
+    api.append("users", users_chunk(1, 2, 5))
+    assert db.execute("SELECT id FROM users") == [(1,), (2,), (5,)]
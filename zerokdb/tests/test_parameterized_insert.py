@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from zerokdb.file_storage import FileStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+@pytest.fixture
+def storage_path(tmp_path):
+    return str(tmp_path / "db.json")
+
+
+def stored_rows(path, table_name):
+    with open(path) as file:
+        return json.load(file)[table_name]["rows"]
+
+
+def test_literal_inserts_keep_every_row_and_its_type(storage_path):
+    db = SimpleSQLDatabase(FileStorage(storage_path))
+    db.execute("CREATE TABLE users (id INT, name TEXT, score REAL)")
+    db.execute("INSERT INTO users (id, name, score) VALUES (1, 'O''Brien, Jr.', 1.5), (2, '(two)', NULL)")
+
+    expected = [(1, "O'Brien, Jr.", 1.5), (2, "(two)", None)]
+    assert db.execute("SELECT id, name, score FROM users") == expected
+    # Chunks hold the typed values, not their text
+    assert stored_rows(storage_path, "users") == [list(row) for row in expected]
+    reader = SimpleSQLDatabase(FileStorage(storage_path))
+    assert reader.execute("SELECT id, name, score FROM users") == expected
+
+
+def test_parameters_are_bound_without_reparsing(storage_path):
+    db = SimpleSQLDatabase(FileStorage(storage_path))
+    db.execute("CREATE TABLE docs (id INT, title TEXT, embedding VECTOR(2))")
+
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    for i in range(5):
+        db.execute("INSERT INTO docs (id, title) VALUES (?, ?)", params=[i, f"a, 'quoted' title {i}"])
+    db.conn.set_trace_callback(None)
+
+    assert not [statement for statement in statements if statement.startswith("PRAGMA")]
+    assert len(db._insert_plans) == 1
+    assert db.execute("SELECT title FROM docs WHERE id = 3") == [("a, 'quoted' title 3",)]
+    assert stored_rows(storage_path, "docs")[0] == [0, "a, 'quoted' title 0", None]
+
+
+def test_executemany_binds_each_parameter_tuple(storage_path):
+    db = SimpleSQLDatabase(FileStorage(storage_path))
+    db.execute("CREATE TABLE docs (id INT, title TEXT, embedding VECTOR(2))")
+
+    assert db.executemany(
+        "INSERT INTO docs (id, embedding) VALUES (?, ?)", ([i, [1, i]] for i in range(10)), batch_size=4
+    ) == 10
+    # Literals next to placeholders are evaluated by SQLite
+    assert db.executemany("INSERT INTO docs (id, title) VALUES (?, 'fixed')", [[10], [11]]) == 2
+
+    reader = SimpleSQLDatabase(FileStorage(storage_path))
+    assert reader.execute("SELECT COUNT(*) FROM docs WHERE title = 'fixed'") == [(2,)]
+    result = reader.execute("SELECT id FROM docs LIMIT 1 COSINE SIMILARITY embedding WITH ?", params=[[1, 3]])
+    assert result[0][0] == 3
+
+    with pytest.raises(ValueError):
+        db.executemany("SELECT * FROM docs", [[1]])
+    with pytest.raises(ValueError):
+        db.execute("INSERT INTO docs (id, title) VALUES (?, ?)", params=[1])
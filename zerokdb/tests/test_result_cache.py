@@ -0,0 +1,120 @@
+from zerokdb import result_cache as result_cache_module
+from zerokdb.block_store import MemoryBlockStore
+from zerokdb.file_storage import FileStorage
+from zerokdb.local_storage import LocalSequenceService, LocalStorage
+from zerokdb.result_cache import ResultCache
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+def selects(db, query, **kwargs):
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    result = db.execute(query, **kwargs)
+    db.conn.set_trace_callback(None)
+    return result, [statement for statement in statements if statement.startswith(("SELECT", "select"))]
+
+
+def test_repeated_queries_are_served_from_the_cache(database):
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore()))
+    cache = ResultCache()
+    writer = database(service, result_cache=cache)
+    writer.execute("CREATE TABLE users (id INT, name TEXT)")
+    writer.insert_many("users", [(i, f"user {i}") for i in range(10)])
+
+    reader = database(service, result_cache=cache)
+    result, statements = selects(reader, "SELECT name FROM users WHERE id = ?", params=[3])
+    assert result == [("user 3",)] and statements
+    # Whitespace and keyword case do not change the key; parameters do
+    result, statements = selects(reader, "select name\n  from users where id = ?", params=[3])
+    assert result == [("user 3",)] and not statements
+    assert selects(reader, "SELECT name FROM users WHERE id = ?", params=[4])[0] == [("user 4",)]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+    # Another instance on the same tables shares the entries
+    assert selects(writer, "SELECT name FROM users WHERE id = ?", params=[3]) == ([("user 3",)], [])
+
+    # Volatile queries always run
+    assert selects(reader, "SELECT count(*) FROM users WHERE random() IS NOT NULL")[1]
+    assert selects(reader, "SELECT count(*) FROM users WHERE random() IS NOT NULL")[1]
+
+
+def test_entries_are_kept_apart_per_storage(tmp_path, monkeypatch):
+    cache = ResultCache()
+    databases = []
+    for name in ("a", "b"):
+        db = SimpleSQLDatabase(FileStorage(str(tmp_path / f"{name}.json")), result_cache=cache)
+        db.execute("CREATE TABLE docs (id INT, embedding VECTOR(2))")
+        db.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[len(databases), [1, 2]])
+        databases.append(db)
+    # Equal file versions must not make one file's rows answer for the other's
+    monkeypatch.setattr(FileStorage, "get_table_version", lambda self, table_name: "same")
+    assert [db.execute("SELECT id FROM docs") for db in databases] == [[(0,)], [(1,)]]
+
+    # Callers own the rows they get, vectors included
+    rows = databases[0].execute("SELECT embedding FROM docs")
+    rows[0][0].append(3.0)
+    assert databases[0].execute("SELECT embedding FROM docs") == [([1.0, 2.0],)]
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_are_dropped_when_a_table_advances(database):
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore()))
+    cache = ResultCache()
+    writer = database(service, result_cache=cache)
+    writer.execute("CREATE TABLE users (id INT)")
+    writer.execute("CREATE TABLE orders (id INT)")
+    writer.insert_many("users", [(1,), (2,)])
+
+    reader = database(service, result_cache=cache)
+    assert reader.execute("SELECT count(*) FROM users") == [(2,)]
+    assert reader.execute("SELECT count(*) FROM orders") == [(0,)]
+    assert cache.stats()["entries"] == 2
+
+    writer.execute("INSERT INTO users (id) VALUES (3)")
+    assert reader.execute("SELECT count(*) FROM users") == [(3,)]
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    # Entries of other tables are kept
+    assert stats["entries"] == 2
+    assert reader.execute("SELECT count(*) FROM orders") == [(0,)]
+    assert cache.stats()["hits"] == 1
+
+
+def test_proofs_are_cached_once_generated(database):
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore()))
+    cache = ResultCache()
+    db = database(service, result_cache=cache)
+    db.execute("CREATE TABLE users (id INT)")
+    db.execute("INSERT INTO users (id) VALUES (1)")
+
+    assert db.execute("SELECT id FROM users") == [(1,)]
+    # Rows cached without a proof do not answer proof requests
+    result, circuit, proof = db.execute("SELECT id FROM users", generate_proof=True)
+    assert result == [(1,)]
+    assert cache.stats()["misses"] == 2
+    assert db.execute("SELECT id FROM users", generate_proof=True) == (result, circuit, proof)
+    assert db.execute("SELECT id FROM users") == [(1,)]
+    assert cache.stats()["hits"] == 2
+
+
+def test_entries_expire_and_are_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_bytes=4096, ttl=60)
+    versions = [("users", "cid1")]
+
+    cache.put("db", "SELECT ID FROM USERS", (), versions, [(1,)])
+    assert cache.get("db", "SELECT ID FROM USERS", (), versions) == ([(1,)], None)
+    now[0] += 61
+    assert cache.get("db", "SELECT ID FROM USERS", (), versions) is None
+    assert cache.stats()["expirations"] == 1
+
+    for i in range(10):
+        cache.put("db", "SELECT NAME FROM USERS WHERE ID = ?", (i,), versions, [("x" * 500,)])
+    stats = cache.stats()
+    assert stats["bytes"] <= 4096
+    assert stats["evictions"] == 10 - stats["entries"]
+    # The most recent entries are kept
+    assert cache.get("db", "SELECT NAME FROM USERS WHERE ID = ?", (9,), versions) is not None
+    assert cache.get("db", "SELECT NAME FROM USERS WHERE ID = ?", (0,), versions) is None
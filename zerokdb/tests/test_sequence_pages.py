@@ -0,0 +1,115 @@
+from zerokdb.block_store import MemoryBlockStore
+from zerokdb.enhanced_file_storage import EnhancedFileStorage
+from zerokdb.local_storage import LocalSequenceService, LocalStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+
+
+def append(users_chunk, storage, count, cid="0x0", first=0):
+    chunk_ids = []
+    for i in range(first, first + count):
+        chunk_id, cid = storage.append_data(users_chunk(i), cid)
+        chunk_ids.append(chunk_id)
+    return chunk_ids, cid
+
+
+def test_paged_append_rewrites_only_the_right_spine(users_chunk):
+    blocks = MemoryBlockStore()
+    storage = LocalStorage(block_store=blocks, sequence_fanout=4)
+    chunk_ids, cid = append(users_chunk, storage, 99)
+
+    root = storage.load_sequence_root(cid)
+    assert root["count"] == 99
+    assert root["height"] == 3
+    assert [entry["chunk_id"] for entry in storage.load_sequence(cid)["default_sequence"]] == chunk_ids
+
+    # One chunk, one page per level and the root document
+    before = blocks.stats()
+    _, cid = storage.append_data(users_chunk(99), cid)
+    assert blocks.stats()["puts"] - before["puts"] <= 1 + (root["height"] + 1) + 1
+
+    flat_blocks = MemoryBlockStore()
+    flat = LocalStorage(block_store=flat_blocks, sequence_format="flat")
+    _, flat_cid = append(users_chunk, flat, 99)
+    flat_before = flat_blocks.stats()
+    flat.append_data(users_chunk(99), flat_cid)
+    paged_bytes = blocks.stats()["bytes_written"] - before["bytes_written"]
+    assert paged_bytes < (flat_blocks.stats()["bytes_written"] - flat_before["bytes_written"]) / 4
+
+    assert storage.download_db(cid)["users"]["rows"] == [[i] for i in range(100)]
+
+
+def tree_pages(storage, cid):
+    root = storage.load_sequence_root(cid)
+    pages, level = [], [root["root"]]
+    for _ in range(root["height"] + 1):
+        pages += level
+        level = [child for page in storage._read_pages(level) for child in page.get("children", [])]
+    return set(pages)
+
+
+def test_batched_appends_write_each_spine_page_once(users_chunk):
+    blocks = MemoryBlockStore()
+    storage = LocalStorage(block_store=blocks, sequence_fanout=4)
+    chunk_ids, cid = append(users_chunk, storage, 7)
+    for batch in (1, 10, 3, 40, 1, 4):
+        before = blocks.stats()["puts"]
+        new_ids, new_cid = storage.append_chunks([users_chunk(len(chunk_ids) + i) for i in range(batch)], cid)
+        puts = blocks.stats()["puts"] - before
+        # The chunks, the sequence root and only the pages of the new tree: no page is written twice
+        assert puts == batch + len(tree_pages(storage, new_cid) - tree_pages(storage, cid)) + 1
+        cid = new_cid
+        chunk_ids += new_ids
+        # The tree is the one a single build of every entry gives
+        assert storage.load_sequence_root(cid)["root"] == storage._build_pages(storage.sequence_entries(cid))["root"]
+    assert [entry["chunk_id"] for entry in storage.sequence_entries(cid)] == chunk_ids
+    assert storage.load_sequence_root(cid)["count"] == len(chunk_ids) == 66
+
+
+def test_sequence_entries_reads_only_the_tail(users_chunk):
+    blocks = MemoryBlockStore()
+    writer = LocalStorage(block_store=blocks, sequence_fanout=4)
+    chunk_ids, cid = append(users_chunk, writer, 70)
+
+    # A cold reader of the same blocks
+    reader = LocalStorage(block_store=blocks, sequence_fanout=4)
+    before = blocks.stats()["gets"]
+    assert [entry["chunk_id"] for entry in reader.sequence_entries(cid, 68)] == chunk_ids[68:]
+    # The root document and one page per level
+    assert blocks.stats()["gets"] - before == 1 + 4
+
+    for start in (0, 1, 4, 16, 63, 64, 69, 70, 100):
+        assert [entry["chunk_id"] for entry in reader.sequence_entries(cid, start)] == chunk_ids[start:]
+
+
+def test_flat_sequences_are_paged_on_their_next_append(users_chunk):
+    blocks = MemoryBlockStore()
+    flat = LocalStorage(block_store=blocks, sequence_format="flat")
+    chunk_ids, cid = append(users_chunk, flat, 5)
+    assert not flat.is_paged(flat.load_sequence_root(cid))
+
+    paged = LocalStorage(block_store=blocks, sequence_fanout=2)
+    more_ids, cid = append(users_chunk, paged, 2, cid, first=5)
+    assert paged.is_paged(paged.load_sequence_root(cid))
+    assert [entry["chunk_id"] for entry in paged.sequence_entries(cid)] == chunk_ids + more_ids
+    # Flat readers of the sequence still get the whole list
+    assert len(flat.load_sequence(cid)["default_sequence"]) == 7
+
+
+def test_readers_sync_paged_sequences():
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore(), sequence_fanout=2))
+    writer = SimpleSQLDatabase(EnhancedFileStorage("writer", api_host=None, pinata_api_key=None, service=service))
+    reader = SimpleSQLDatabase(EnhancedFileStorage("reader", api_host=None, pinata_api_key=None, service=service))
+
+    writer.execute("CREATE TABLE users (id INT)")
+    for i in range(6):
+        writer.execute(f"INSERT INTO users (id) VALUES ({i})")
+    assert reader.execute("SELECT id FROM users") == [(i,) for i in range(6)]
+
+    writer.execute("INSERT INTO users (id) VALUES (6)")
+    assert reader.execute("SELECT id FROM users") == [(i,) for i in range(7)]
+
+    storage = service.storage
+    compacted_cid, _ = storage.compact(service.get_table_sequence_by_name("users")["sequence_cid"])
+    service.update_sequence_cid("users", compacted_cid)
+    writer.execute("INSERT INTO users (id) VALUES (7)")
+    assert reader.execute("SELECT id FROM users") == [(i,) for i in range(8)]
@@ -0,0 +1,108 @@
+import pytest
+
+from zerokdb.block_store import MemoryBlockStore
+from zerokdb.local_storage import LocalSequenceService, LocalStorage
+from zerokdb.sql_parser import parse_sql
+
+
+def test_every_referenced_table_is_found():
+    parsed = parse_sql(
+        "with recent as (select user_id from orders where total > 10) "
+        "select u.name, count(*) as n from users u "
+        "left join recent r on r.user_id = u.id "
+        "where u.id in (select user_id from bans) or exists (select 1 from admins a where a.id = u.id) "
+        "group by u.name order by n desc limit 5"
+    )
+    assert parsed["kind"] == "select"
+    assert parsed["tables"] == ["orders", "users", "bans", "admins"]
+    assert parsed["table_name"] == "users"
+    assert parsed["ctes"] == ["recent"]
+    assert [(entry["table"], entry["alias"], entry["join"]) for entry in parsed["from"]] == [
+        ("users", "u", None),
+        ("recent", "r", "LEFT JOIN"),
+    ]
+    assert parsed["from"][1]["on"] == "r.user_id = u.id"
+    assert [(column["table"], column["column"], column["alias"]) for column in parsed["columns"]] == [
+        ("u", "name", None),
+        (None, None, "n"),
+    ]
+    assert parsed["group_by"] == "u.name"
+    assert parsed["order_by"] == "n desc"
+    assert parsed["limit"] == 5
+
+
+def test_similarity_clauses():
+    parsed = parse_sql("SELECT id, score FROM docs WHERE id > ? LIMIT 3 COSINE SIMILARITY embedding WITH [0, 1] MIN_SCORE -0.5 NPROBE 4")
+    assert parsed["where"] == "id > ?"
+    assert parsed["limit"] == 3
+    similarity = parsed["similarity"]
+    assert (similarity["metric"], similarity["vector_column"], similarity["target_vector"]) == (
+        "cosine_similarity", "embedding", "[0, 1]"
+    )
+    assert (similarity["min_score"], similarity["nprobe"], similarity["descending"]) == (-0.5, 4, True)
+
+    parsed = parse_sql("select id from docs order by l2_distance(embedding, ?) desc limit 2 using index idx exact")
+    assert parsed["order_by"] is None
+    assert parsed["similarity"]["metric"] == "l2_distance"
+    assert parsed["similarity"]["descending"] is True
+    assert (parsed["similarity"]["index_name"], parsed["similarity"]["exact"]) == ("idx", True)
+    assert parse_sql("SELECT id FROM docs ORDER BY abs(id - 2), l2_distance(embedding, ?)")["similarity"] is None
+
+
+def test_other_statements():
+    parsed = parse_sql("insert into docs (id, title) values (?, 'a, b')")
+    assert (parsed["kind"], parsed["table_name"], parsed["columns"], parsed["tables"]) == (
+        "insert", "docs", ["id", "title"], ["docs"]
+    )
+    assert parsed["conflict"] is None and parsed["source"] == "values (?, 'a, b')"
+    parsed = parse_sql("INSERT OR REPLACE INTO docs SELECT * FROM drafts")
+    assert (parsed["conflict"], parsed["source"], parsed["tables"]) == ("REPLACE", "SELECT * FROM drafts", ["docs", "drafts"])
+    assert parse_sql("REPLACE INTO docs DEFAULT VALUES")["source"] is None
+    assert parse_sql("CREATE TABLE IF NOT EXISTS docs (id INT, embedding VECTOR(4))")["table_name"] == "docs"
+    assert parse_sql("CREATE VECTOR INDEX idx ON docs (embedding) USING ivf WITH (nlist = 8)")["tables"] == ["docs"]
+    assert parse_sql("DELETE FROM docs")["kind"] == "delete"
+    with pytest.raises(ValueError):
+        parse_sql("SELECT id FROM docs WHERE title = 'unterminated")
+    with pytest.raises(ValueError):
+        parse_sql("SELECT id FROM docs) WHERE id = 1")
+
+
+def test_joins_load_every_table(database):
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore()))
+    writer = database(service)
+    writer.execute("create table users (id INT, name TEXT)")
+    writer.execute("create table orders (id INT, user_id INT, total REAL)")
+    writer.insert_many("users", [(1, "Alice"), (2, "Bob")])
+    writer.insert_many("orders", [(1, 1, 5.0), (2, 1, 7.5), (3, 2, 1.0)])
+
+    reader = database(service)
+    query = (
+        "with big as (select user_id, total from orders where total > 2) "
+        "select u.name, sum(b.total) from users u join big b on b.user_id = u.id group by u.name"
+    )
+    assert reader.execute(query) == [("Alice", 12.5)]
+    assert reader.execute("select name from users where id not in (select user_id from orders)") == []
+
+    parsed = parse_sql("SELECT u.*, o.total AS amount FROM users u JOIN orders o ON o.user_id = u.id")
+    assert reader._projected_columns(parsed) == ["id", "name", "total"]
+    assert reader._projected_columns(parse_sql("SELECT * FROM users")) == ["id", "name"]
+    with pytest.raises(ValueError):
+        reader.execute("UPDATE users SET name = 'Carol'")
+
+
+def test_insert_forms(database):
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore()))
+    db = database(service)
+    db.execute("create table drafts (id INT, title TEXT)")
+    db.execute("create table docs (id INT, title TEXT)")
+    db.execute("insert into drafts values (1, 'a'), (2, 'b')")
+    db.execute("INSERT INTO docs (id, title) SELECT id, upper(title) FROM drafts WHERE id > ?", params=[1])
+    assert database(service).execute("select id, title from docs") == [(2, "B")]
+
+    for query in (
+        "REPLACE INTO docs (id, title) VALUES (3, 'c')",
+        "INSERT OR REPLACE INTO docs (id, title) VALUES (3, 'c')",
+        "INSERT INTO docs DEFAULT VALUES",
+    ):
+        with pytest.raises(ValueError, match="Unsupported INSERT form"):
+            db.execute(query)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from zerokdb.embedding_cache import EmbeddingCache, embedding_cache
+from zerokdb.text_to_embedding import EmbeddingModelRegistry, TextToEmbedding
+
+
+def test_registry_loads_each_model_once():
+    registry = EmbeddingModelRegistry()
+    loads = []
+
+    def slow_load(model_name):
+        loads.append(model_name)
+        time.sleep(0.05)
+        return ("tokenizer", model_name)
+
+    registry._load = slow_load
+    threads = [threading.Thread(target=registry.get, args=("model-a",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["model-a"]
+    assert registry.get("model-a") == ("tokenizer", "model-a")
+    registry.get("model-b")
+    assert loads == ["model-a", "model-b"]
+
+
+def test_text_to_embedding_loads_lazily():
+    registry = EmbeddingModelRegistry()
+    registry._load = lambda model_name: ("tokenizer", "model")
+    text_to_embedding = TextToEmbedding("model-a", registry=registry)
+    assert not registry.is_loaded("model-a")
+    assert text_to_embedding.model == "model"
+    assert registry.is_loaded("model-a")
+
+
+def test_warm_up_runs_the_model_despite_the_cache(monkeypatch):
+    embedded = []
+
+    def embed(self, texts, batch_size):
+        self.registry.get(self.model_name)
+        embedded.extend(texts)
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(TextToEmbedding, "_embed", embed)
+    monkeypatch.setattr(embedding_cache, "get_many", lambda model_name, texts: [[1.0] for _ in texts])
+    registry = EmbeddingModelRegistry()
+    registry._load = lambda model_name: ("tokenizer", "model")
+    registry.warm_up("model-a")
+    assert embedded == ["warm up"]
+    assert registry.is_loaded("model-a")
+
+
+def test_embedding_cache_tiers(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(max_entries=2, path=path)
+    cache.put_many("model-a", ["one", "two", "three"], [[1.0], [2.0], [3.0]])
+
+    assert cache.get_many("model-a", ["three", "one", "four"]) == [[3.0], [1.0], None]
+    assert cache.get("model-b", "one") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["entries"] == 2
+
+    # A new process sees the disk tier
+    assert EmbeddingCache(path=path).get("model-a", "two") == [2.0]
+
+
+def test_embedding_cache_returns_copies_at_float32_precision(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(path=path)
+    cache.put("model-a", "one", [0.1, 0.2])
+
+    embedding = cache.get("model-a", "one")
+    assert embedding == EmbeddingCache(path=path).get("model-a", "one") != [0.1, 0.2]
+    embedding.append(1.0)
+    assert len(cache.get("model-a", "one")) == 2
+
+
+def test_convert_batch_only_embeds_cache_misses():
+    embedded = []
+
+    class CountingTextToEmbedding(TextToEmbedding):
+        def _embed(self, texts, batch_size):
+            embedded.extend(texts)
+            return [[float(len(text))] for text in texts]
+
+    text_to_embedding = CountingTextToEmbedding("model-a", cache=EmbeddingCache())
+    assert text_to_embedding.convert_batch(["ab", "abc", "ab"]) == [[2.0], [3.0], [2.0]]
+    assert text_to_embedding.convert("abc") == [3.0]
+    assert embedded == ["ab", "abc"]
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from zerokdb.file_storage import FileStorage
+from zerokdb import vector_index
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+from zerokdb.vector_index import build_index, load_index, normalize_rows
+
+
+def clustered_vectors(n=600, dimension=16, clusters=12, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    labels = rng.integers(clusters, size=n)
+    return (centers[labels] + rng.normal(scale=0.1, size=(n, dimension))).astype(np.float32)
+
+
+def recall_at_k(kind, k=10, **options):
+    vectors = clustered_vectors()
+    index = load_index(build_index(kind, "embedding", vectors, **options))
+    normalized = normalize_rows(vectors)
+    hits = 0
+    for query in normalized[:20]:
+        exact = set(np.argsort(-(normalized @ query), kind="stable")[:k].tolist())
+        candidates = index.search(query, k, vectors=normalized)
+        scores = normalized[candidates] @ query
+        found = set(candidates[np.argsort(-scores, kind="stable")[:k]].tolist())
+        hits += len(exact & found)
+    return hits / (20 * k)
+
+
+def test_ivf_recall():
+    assert recall_at_k("ivf", nlist=12, nprobe=3) >= 0.9
+
+
+def test_hnsw_recall():
+    assert recall_at_k("hnsw", m=8, ef_construction=64) >= 0.9
+
+
+def test_hnsw_over_the_row_limit_builds_ivf(monkeypatch):
+    monkeypatch.setattr(vector_index, "HNSW_MAX_ROWS", 100)
+    payload = build_index("hnsw", "embedding", clustered_vectors(), m=8)
+    assert payload["type"] == "ivf"
+    assert recall_at_k("hnsw", m=8) >= 0.9
+
+
+def test_int8_recall_and_memory():
+    index = load_index(build_index("int8", "embedding", clustered_vectors(), rerank=30))
+    assert index.memory_bytes() < clustered_vectors().nbytes / 3
+    assert recall_at_k("int8", rerank=30) >= 0.95
+
+
+def test_pq_recall_and_memory():
+    index = load_index(build_index("pq", "embedding", clustered_vectors(), m=4, nbits=6, rerank=50))
+    assert index.codes.shape == (600, 4)
+    assert index.memory_bytes() < clustered_vectors().nbytes
+    assert recall_at_k("pq", m=4, nbits=6, rerank=50) >= 0.9
+
+
+def test_ivf_skips_lists_below_min_score():
+    vectors = clustered_vectors()
+    normalized = normalize_rows(vectors)
+    index = load_index(build_index("ivf", "embedding", vectors, nlist=12, nprobe=12))
+    query = normalized[0]
+    candidates = index.search(query, 10, min_score=0.9)
+    assert len(candidates) < len(vectors)
+    # Every row that reaches the threshold is still a candidate
+    assert set(np.flatnonzero(normalized @ query >= 0.9)) <= set(candidates.tolist())
+
+
+def test_unknown_index_type():
+    with pytest.raises(ValueError):
+        build_index("lsh", "embedding", clustered_vectors(10))
+
+
+def test_vector_index_is_persisted_and_used(tmp_path):
+    filename = str(tmp_path / "index_db.json")
+    db = SimpleSQLDatabase(FileStorage(filename))
+    db.execute("CREATE TABLE docs (id INT, embedding VECTOR(16))")
+    vectors = clustered_vectors(200)
+    for i, vector in enumerate(vectors):
+        db.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[i, vector.tolist()])
+    db.execute("CREATE VECTOR INDEX docs_ivf ON docs (embedding) USING ivf WITH (nlist = 8, nprobe = 2)")
+
+    stored = FileStorage(filename).load("docs")["docs"]
+    assert stored["indexes"]["docs_ivf"]["type"] == "ivf"
+    assert stored["indexes"]["docs_ivf"]["row_count"] == 200
+
+    # A fresh database picks the index up from storage
+    db = SimpleSQLDatabase(FileStorage(filename))
+    db.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[200, vectors[0].tolist()])
+    approximate = db.execute(
+        "SELECT id FROM docs LIMIT 2 COSINE SIMILARITY embedding WITH ? NPROBE 8",
+        params=[vectors[0].tolist()],
+    )
+    exact = db.execute(
+        "SELECT id FROM docs LIMIT 2 COSINE SIMILARITY embedding WITH ? EXACT",
+        params=[vectors[0].tolist()],
+    )
+    assert approximate == exact
+    assert {row[0] for row in exact} == {0, 200}
+
+
+def test_quantized_index_reranks_exactly(tmp_path):
+    db = SimpleSQLDatabase(FileStorage(str(tmp_path / "pq_db.json")))
+    db.execute("CREATE TABLE docs (id INT, embedding VECTOR(16))")
+    vectors = clustered_vectors(300)
+    for i, vector in enumerate(vectors):
+        db.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[i, vector.tolist()])
+    db.execute("CREATE VECTOR INDEX docs_pq ON docs (embedding) USING pq WITH (m = 4, nbits = 6)")
+
+    query = "SELECT id FROM docs WHERE id < 250 LIMIT 5 COSINE SIMILARITY embedding WITH ?"
+    approximate = db.execute(query + " RERANK 60", params=[vectors[7].tolist()])
+    exact = db.execute(query + " EXACT", params=[vectors[7].tolist()])
+    assert approximate[0] == (7,)
+    assert len(set(approximate) & set(exact)) >= 4
+    # Only the quantized codes are kept in memory for this column
+    assert not db._normalized_vectors[("docs", "embedding")].keep_matrix
+
+    stats = db.vector_index_stats("docs", "docs_pq", k=5, sample_size=20)
+    assert stats["type"] == "pq"
+    assert stats["row_count"] == 300
+    assert stats["compression_ratio"] > 1
+    assert stats["recall"] >= 0.8
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+from zerokdb.file_storage import FileStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+from zerokdb.vector_search import (
+    cosine_similarity,
+    parse_vector,
+    parse_vectors,
+    score_vectors,
+    top_k_indices,
+)
+
+
+def reference_ranking(rows, target_vector, limit=None):
+    # Row-by-row implementation the vectorized engine replaced
+    target = np.fromstring(target_vector.strip("[]"), sep=",")
+    similarities = []
+    for row in rows:
+        vector = np.fromstring(row.strip("[]"), sep=",")
+        similarity = np.dot(vector, target) / (
+            np.linalg.norm(vector) * np.linalg.norm(target)
+        )
+        similarities.append((row, similarity))
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    if limit:
+        similarities = similarities[:limit]
+    return [row for row, _ in similarities]
+
+
+def test_parse_vectors():
+    matrix = parse_vectors(["[0.1, 0.2, 0.3]", "[0.4, 0.5, 0.6]"])
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (2, 3)
+    np.testing.assert_allclose(matrix[1], [0.4, 0.5, 0.6])
+
+
+def test_parse_vectors_rejects_mixed_dimensions():
+    with pytest.raises(ValueError):
+        parse_vectors(["[0.1, 0.2]", "[0.1, 0.2, 0.3]"])
+
+
+def test_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    rows = [str(rng.normal(size=8).round(4).tolist()) for _ in range(200)]
+    target = str(rng.normal(size=8).round(4).tolist())
+    scores = cosine_similarity(parse_vectors(rows), parse_vector(target))
+    for limit in (None, 1, 5, 50, 500):
+        expected = reference_ranking(rows, target, limit)
+        assert [rows[i] for i in top_k_indices(scores, limit)] == expected
+
+
+def test_top_k_keeps_input_order_for_ties():
+    scores = np.array([0.5, 0.9, 0.5, 0.9, 0.5], dtype=np.float32)
+    assert top_k_indices(scores, 3) == [1, 3, 0]
+    assert top_k_indices(scores) == [1, 3, 0, 2, 4]
+
+
+def test_normalized_vectors_are_cached_per_table_version(tmp_path, monkeypatch):
+    db = SimpleSQLDatabase(FileStorage(str(tmp_path / "cache_db.json")))
+    db.execute("CREATE TABLE docs (id INT, embedding VECTOR(3))")
+    for i, vector in enumerate([[1, 0, 0], [0, 1, 0], [0, 0, 1]]):
+        db.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[i, vector])
+
+    reads = []
+    get_column_vectors = db._get_column_vectors
+
+    def counting_get_column_vectors(*args, **kwargs):
+        reads.append(kwargs.get("after_rowid"))
+        return get_column_vectors(*args, **kwargs)
+
+    monkeypatch.setattr(db, "_get_column_vectors", counting_get_column_vectors)
+    query = "SELECT id FROM docs LIMIT 1 COSINE SIMILARITY embedding WITH ?"
+
+    assert db.execute(query, params=[[0, 1, 0.1]]) == [(1,)]
+    assert db.execute(query, params=[[0, 0.1, 1]]) == [(2,)]
+    assert reads == [None]
+
+    # Rows inserted by this instance extend the warm matrix instead of rebuilding it
+    db.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[3, [1, 1, 1]])
+    assert db.execute(query, params=[[1, 1, 0.9]]) == [(3,)]
+    assert reads == [None, 3]
+
+
+def test_similarity_search_batch_matches_single_queries(tmp_path):
+    db = SimpleSQLDatabase(FileStorage(str(tmp_path / "batch_db.json")))
+    db.execute("CREATE TABLE docs (id INT, embedding VECTOR(8))")
+    rng = np.random.default_rng(1)
+    for i in range(50):
+        db.execute(
+            "INSERT INTO docs (id, embedding) VALUES (?, ?)",
+            params=[i, rng.normal(size=8).tolist()],
+        )
+    targets = rng.normal(size=(6, 8)).tolist()
+    query = "SELECT id FROM docs WHERE id % 2 = ? LIMIT 4 COSINE SIMILARITY embedding WITH ?"
+
+    results = db.similarity_search_batch(
+        "docs", targets, 4, columns="id", where_clause="id % 2 = ?", params=[1]
+    )
+    assert results == [db.execute(query, params=[1, target]) for target in targets]
+
+    # Quantized columns score the exact vectors read back from SQLite
+    db.execute("CREATE VECTOR INDEX docs_int8 ON docs (embedding) USING int8")
+    assert db.similarity_search_batch(
+        "docs", targets, 4, columns="id", where_clause="id % 2 = ?", params=[1]
+    ) == results
+
+
+def test_metric_kernels_match_numpy():
+    rng = np.random.default_rng(2)
+    matrix = rng.normal(size=(30, 8)).astype(np.float32)
+    targets = rng.normal(size=(3, 8)).astype(np.float32)
+    cosine = (matrix @ targets.T) / np.outer(
+        np.linalg.norm(matrix, axis=1), np.linalg.norm(targets, axis=1)
+    )
+    expected = {
+        "cosine_similarity": cosine,
+        "cosine_distance": 1 - cosine,
+        "inner_product": matrix @ targets.T,
+        "l2_distance": np.linalg.norm(matrix[:, None, :] - targets[None, :, :], axis=2),
+    }
+    for metric, scores in expected.items():
+        np.testing.assert_allclose(
+            score_vectors(matrix, targets, metric), scores, rtol=1e-4, atol=1e-4
+        )
+    with pytest.raises(ValueError):
+        score_vectors(matrix, targets, "hamming")
+
+
+def test_order_by_distance_queries(tmp_path):
+    db = SimpleSQLDatabase(FileStorage(str(tmp_path / "metric_db.json")))
+    db.execute("CREATE TABLE docs (id INT, embedding VECTOR(2))")
+    points = [[1, 0], [3, 0], [0, 2], [-1, -1]]
+    for i, point in enumerate(points):
+        db.execute("INSERT INTO docs (id, embedding) VALUES (?, ?)", params=[i, point])
+
+    assert db.execute(
+        "SELECT id FROM docs ORDER BY l2_distance(embedding, ?) LIMIT 2", params=[[2, 0]]
+    ) == [(0,), (1,)]
+    assert db.execute(
+        "SELECT id FROM docs ORDER BY inner_product(embedding, [1, 0]) LIMIT 2"
+    ) == [(1,), (0,)]
+    assert db.execute(
+        "SELECT id FROM docs ORDER BY l2_distance(embedding, ?) DESC LIMIT 1", params=[[2, 0]]
+    ) == [(3,)]
+
+    # `score` selects the metric value, and thresholds filter on it
+    rows = db.execute(
+        "SELECT id, score FROM docs WHERE id > ? ORDER BY cosine_distance(embedding, ?) MAX_SCORE 0.5",
+        params=[0, [1, 0.1]],
+    )
+    assert [row[0] for row in rows] == [1]
+    assert rows[0][1] == pytest.approx(1 - 1 / np.linalg.norm([1, 0.1]), abs=1e-5)
+    assert db.execute(
+        "SELECT id FROM docs LIMIT 5 COSINE SIMILARITY embedding WITH [0, 1] MIN_SCORE 0.5"
+    ) == [(2,)]
+
+    # Result columns are expressions, commas inside them included
+    assert db.execute(
+        "SELECT substr('abc', 1, id + 1), score, id FROM docs ORDER BY l2_distance(embedding, [3, 0]) LIMIT 1"
+    ) == [("ab", 0.0, 1)]
+
+    # Ordinary ORDER BY clauses still go straight to SQLite
+    assert db.execute("SELECT id FROM docs ORDER BY abs(id - 2) LIMIT 1") == [(2,)]
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from zerokdb.file_storage import FileStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+from zerokdb.vector_type import (
+    decode_vector,
+    encode_vector,
+    encode_vector_json,
+    is_vector_type,
+    vector_dimension,
+)
+from zerokdb.zk.table_parser import hash_table_column
+
+
+def create_db(tmp_path):
+    return SimpleSQLDatabase(FileStorage(str(tmp_path / "vectors_db.json")))
+
+
+def test_vector_column_types():
+    assert is_vector_type("VECTOR(384)")
+    assert is_vector_type("vector")
+    assert is_vector_type("list[float]")
+    assert not is_vector_type("TEXT")
+    assert vector_dimension("VECTOR(384)") == 384
+    assert vector_dimension("VECTOR") is None
+
+
+def test_vector_encodings_round_trip():
+    vector = [0.5, -1.25, 3.0]
+    packed = encode_vector(vector)
+    assert len(packed) == 12
+    assert packed == np.array(vector, dtype="<f4").tobytes()
+    assert decode_vector(packed) == vector
+    assert decode_vector(encode_vector_json(vector)) == vector
+    assert decode_vector("[0.5, -1.25, 3.0]") == vector
+    with pytest.raises(ValueError):
+        encode_vector(vector, dimension=4)
+
+
+def test_hash_table_column_ignores_vector_representation():
+    vector = [0.5, -1.25, 3.0]
+    expected = hash_table_column("embedding", "VECTOR(3)", vector, 1)
+    assert hash_table_column("embedding", "VECTOR(3)", encode_vector(vector), 1) == expected
+    assert hash_table_column("embedding", "list[float]", encode_vector_json(vector), 1) == expected
+
+
+def test_vector_column_insert_and_search(tmp_path):
+    db = create_db(tmp_path)
+    db.execute("CREATE TABLE vectors (id INT, embedding VECTOR(3))")
+    db.execute("INSERT INTO vectors (id, embedding) VALUES (?, ?)", params=[1, [0.1, 0.2, 0.3]])
+    db.execute("INSERT INTO vectors (id, embedding) VALUES (2, '[0.7, 0.8, 0.9]')")
+
+    stored = FileStorage(str(tmp_path / "vectors_db.json")).load("vectors")["vectors"]
+    assert stored["rows"][0] == [1, encode_vector_json([0.1, 0.2, 0.3])]
+
+    result = db.execute(
+        "SELECT id FROM vectors LIMIT 1 COSINE SIMILARITY embedding WITH ?",
+        params=[[0.7, 0.8, 0.95]],
+    )
+    assert result == [(2,)]
+
+    result = db.execute("SELECT embedding FROM vectors WHERE id = ?", params=[1])
+    np.testing.assert_allclose(result[0][0], [0.1, 0.2, 0.3], rtol=1e-6)
+
+
+def test_vector_column_rejects_wrong_dimension(tmp_path):
+    db = create_db(tmp_path)
+    db.execute("CREATE TABLE vectors (id INT, embedding VECTOR(3))")
+    with pytest.raises(ValueError):
+        db.execute("INSERT INTO vectors (id, embedding) VALUES (?, ?)", params=[1, [0.1, 0.2]])
@@ -0,0 +1,96 @@
+from zerokdb.block_store import MemoryBlockStore
+from zerokdb.file_storage import FileStorage
+from zerokdb.local_storage import LocalSequenceService, LocalStorage
+from zerokdb.simple_sql_db import SimpleSQLDatabase
+from zerokdb.working_set import WorkingSet
+
+
+def test_restarted_database_reattaches_its_tables(tmp_path, database):
+    blocks = MemoryBlockStore()
+    service = LocalSequenceService(LocalStorage(block_store=blocks))
+    path = str(tmp_path / "working_set.db")
+
+    writer = database(service)
+    writer.execute("CREATE TABLE users (id INT, name TEXT)")
+    writer.insert_many("users", [(i, f"user {i}") for i in range(100)], batch_size=25)
+
+    working_set = WorkingSet(path)
+    db = database(service, working_set=working_set)
+    assert db.execute("SELECT COUNT(*) FROM users") == [(100,)]
+    db.close()
+    # The working set belongs to the caller and outlives the database
+    assert db.conn is working_set.conn and not working_set.closed
+    working_set.close()
+
+    writer.execute("INSERT INTO users (id, name) VALUES (100, 'new')")
+    working_set = WorkingSet(path)
+    restarted = database(service, working_set=working_set)
+    before = blocks.stats()["gets"]
+    assert restarted.execute("SELECT COUNT(*) FROM users") == [(101,)]
+    # The sequence root, its page and the one new chunk
+    assert blocks.stats()["gets"] - before <= 3
+    restarted.close()
+    working_set.close()
+
+    pragmas = WorkingSet(path, mmap_size=1 << 20, cache_size_kib=1024)
+    assert pragmas.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert pragmas.conn.execute("PRAGMA mmap_size").fetchone()[0] == 1 << 20
+    assert pragmas.conn.execute("PRAGMA cache_size").fetchone()[0] == -1024
+    pragmas.close()
+
+
+def test_own_writes_are_not_loaded_twice_after_a_restart(tmp_path, database):
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore()))
+    path = str(tmp_path / "working_set.db")
+
+    working_set = WorkingSet(path)
+    db = database(service, working_set=working_set)
+    db.execute("CREATE TABLE users (id INT)")
+    db.execute("INSERT INTO users (id) VALUES (1)")
+    db.insert_many("users", [(2,), (3,)])
+    working_set.close()
+
+    working_set = WorkingSet(path)
+    restarted = database(service, working_set=working_set)
+    assert restarted.execute("SELECT id FROM users") == [(1,), (2,), (3,)]
+    working_set.close()
+
+
+def test_least_recently_used_tables_are_evicted(tmp_path, database):
+    service = LocalSequenceService(LocalStorage(block_store=MemoryBlockStore()))
+    writer = database(service)
+    for table_name in ("a", "b"):
+        writer.execute(f"CREATE TABLE {table_name} (id INT, payload TEXT)")
+        writer.insert_many(table_name, [(i, "x" * 1000) for i in range(200)])
+
+    working_set = WorkingSet(str(tmp_path / "working_set.db"), max_bytes=300 << 10)
+    db = database(service, working_set=working_set)
+    assert db.execute("SELECT COUNT(*) FROM a") == [(200,)]
+    assert db.execute("SELECT COUNT(*) FROM b") == [(200,)]
+    assert list(working_set.last_used) == ["b"]
+    assert working_set.used_bytes() <= 300 << 10
+
+    # An evicted table is loaded again in full
+    assert db.execute("SELECT COUNT(*) FROM a") == [(200,)]
+    assert list(working_set.last_used) == ["a"]
+    working_set.close()
+
+
+def test_tables_without_state_are_dropped(tmp_path):
+    path = str(tmp_path / "working_set.db")
+    working_set = WorkingSet(path)
+    working_set.conn.execute("CREATE TABLE stray (id INT)")
+    working_set.conn.commit()
+    working_set.close()
+
+    working_set = WorkingSet(path)
+    db = SimpleSQLDatabase(FileStorage(str(tmp_path / "db.json")), working_set=working_set)
+    assert db._get_tables_data() == {}
+    db.execute("CREATE TABLE users (id INT)")
+    db.execute("INSERT INTO users (id) VALUES (1)")
+    working_set.close()
+
+    working_set = WorkingSet(path)
+    restarted = SimpleSQLDatabase(FileStorage(str(tmp_path / "db.json")), working_set=working_set)
+    assert restarted.execute("SELECT id FROM users") == [(1,)]
+    working_set.close()
@@ -1,9 +1,15 @@
+import os
 from zerokdb.change_tracker import ChangeTracker
 from zerokdb.simple_sql_db import SimpleSQLDatabase
 from zerokdb.file_storage import FileStorage
 from zerokdb.enhanced_file_storage import EnhancedFileStorage
+from zerokdb.local_storage import LocalSequenceService, LocalStorage
+from zerokdb.result_cache import ResultCache, result_cache as shared_result_cache
 from zerokdb.text_to_embedding import TextToEmbedding
-from typing import List
+from zerokdb.http_transport import HTTPTransport
+from zerokdb.working_set import WorkingSet
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
 
 
 class DatabaseAPI:
@@ -14,15 +20,45 @@ class DatabaseAPI:
         database_name="database",
         api_host="https://kumh6ogteddmj4pgtuh7p00k9c.ingress.akash-palmito.org",
         pinata_api_key="test",
+        max_staleness: float = 0.0,
+        transport: Optional[HTTPTransport] = None,
+        working_set: Optional[Union[str, WorkingSet]] = None,
+        working_set_max_bytes: Optional[int] = None,
+        result_cache: Optional[ResultCache] = shared_result_cache,
     ):
         if storage_type == "file":
             self.storage = FileStorage(storage_location)
         elif storage_type == "ipfs":
-            self.storage = EnhancedFileStorage(database_name, api_host=api_host, pinata_api_key=pinata_api_key)
+            self.storage = EnhancedFileStorage(
+                database_name,
+                api_host=api_host,
+                pinata_api_key=pinata_api_key,
+                max_staleness=max_staleness,
+                transport=transport,
+            )
+        elif storage_type == "local":
+            # Chunks and sequences in the storage_location directory, with no API, chain or network
+            self.storage = EnhancedFileStorage(
+                database_name,
+                api_host=None,
+                pinata_api_key=None,
+                max_staleness=max_staleness,
+                service=LocalSequenceService(
+                    LocalStorage(storage_location),
+                    os.path.join(storage_location, "sequences.json"),
+                ),
+            )
         else:
             raise ValueError("Unsupported storage type")
+        # Loaded tables are kept in this SQLite file across restarts instead of in memory
+        self.owned_working_set = None
+        if isinstance(working_set, str):
+            working_set = self.owned_working_set = WorkingSet(working_set, max_bytes=working_set_max_bytes)
         self.change_tracker = ChangeTracker()
-        self.db = SimpleSQLDatabase(self.storage, self.change_tracker)
+        # SELECT results (and proofs) are reused until a table they read changes; None disables this
+        self.db = SimpleSQLDatabase(
+            self.storage, self.change_tracker, working_set=working_set, result_cache=result_cache
+        )
         self.text_to_embedding = TextToEmbedding()
 
     def create_table(
@@ -41,24 +77,112 @@ class DatabaseAPI:
         table_name,
         data,
     ):
-        """Insert data into a table."""
+        """Insert data into a table. Vector values may be passed as lists of floats."""
         columns_str = ", ".join(data.keys())
-        values_str = ", ".join(
-            [f"'{v}'" if isinstance(v, str) else str(v) for v in data.values()]
+        placeholders = ", ".join(["?" for _ in data])
+        query = f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
+        self.db.execute(query, params=list(data.values()))
+
+    def insert_many(
+        self,
+        table_name,
+        rows: Iterable[Union[Dict[str, Any], Sequence]],
+        batch_size: int = 1000,
+        columns: Optional[Sequence[str]] = None,
+        proof: bool = False,
+        batches_per_request: int = 1,
+    ):
+        """Insert rows given as dicts or as value sequences in `columns` order, storing each batch as one chunk."""
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return (0, []) if proof else 0
+        if isinstance(first, dict):
+            columns = list(columns or first.keys())
+            rows = ([row[col] for col in columns] for row in chain([first], rows))
+        else:
+            rows = chain([first], rows)
+        return self.db.insert_many(
+            table_name,
+            rows,
+            columns=columns,
+            batch_size=batch_size,
+            generate_proof=proof,
+            batches_per_request=batches_per_request,
         )
-        query = f"INSERT INTO {table_name} ({columns_str}) VALUES ({values_str})"
-        self.db.execute(query)
 
     def execute_query(
         self,
         query,
         proof: bool = False,
+        params: Optional[Sequence] = None,
     ):
-        """Execute a SQL query."""
+        """Execute a SQL query, binding `params` to its `?` placeholders."""
         return self.db.execute(
-            query, generate_proof=proof
+            query, generate_proof=proof, params=params
+        )
+
+    def executemany(
+        self,
+        query,
+        seq_of_params: Iterable[Sequence],
+        proof: bool = False,
+        batch_size: int = 1000,
+    ):
+        """Run an INSERT once per parameter tuple, storing each batch of `batch_size` rows as one chunk."""
+        return self.db.executemany(query, seq_of_params, generate_proof=proof, batch_size=batch_size)
+
+    def similarity_search_batch(
+        self,
+        table_name,
+        vectors_or_texts,
+        k: int,
+        where: Optional[str] = None,
+        params: Optional[Sequence] = None,
+        columns: str = "*",
+        vector_column: Optional[str] = None,
+        proof: bool = False,
+        aggregate_proof: bool = True,
+        metric: str = "cosine_similarity",
+    ):
+        """Return the top `k` rows for each query vector or text, loading the table once."""
+        vectors = list(vectors_or_texts)
+        texts = [i for i, value in enumerate(vectors) if isinstance(value, str)]
+        embeddings = self.text_to_embedding.convert_batch([vectors[i] for i in texts])
+        for i, embedding in zip(texts, embeddings):
+            vectors[i] = embedding
+        return self.db.similarity_search_batch(
+            table_name,
+            vectors,
+            k,
+            columns=columns,
+            vector_column=vector_column,
+            where_clause=where,
+            params=params,
+            generate_proof=proof,
+            aggregate_proof=aggregate_proof,
+            metric=metric,
         )
 
+    def result_cache_stats(self) -> Dict[str, int]:
+        """Report the entries, bytes, hits and misses of the query result cache."""
+        return self.db.result_cache.stats() if self.db.result_cache is not None else {}
+
+    def vector_index_stats(self, table_name, index_name, k: int = 10):
+        """Report the memory footprint and recall@k of a vector index."""
+        return self.db.vector_index_stats(table_name, index_name, k=k)
+
     def convert_text_to_embedding(self, text) -> List[float]:
         """Convert text to embedding."""
         return self.text_to_embedding.convert(text)
+
+    def convert_texts_to_embeddings(self, texts, batch_size: int = 32) -> List[List[float]]:
+        """Convert many texts to embeddings, batching the model calls."""
+        return self.text_to_embedding.convert_batch(texts, batch_size)
+
+    def close(self):
+        """Close the database, its change log and a working set opened from a path."""
+        self.db.close()
+        self.change_tracker.close()
+        if self.owned_working_set is not None:
+            self.owned_working_set.close()
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+from zerokdb.chunk_format import json_default
+from zerokdb.http_transport import HTTPTransport, default_transport
+
+
+class BlockStore:
+    """
+    Content-addressed storage of immutable blocks: `put` returns the CID of
+    the stored bytes, and `get` returns the bytes of a CID.
+
+    IPFSStorage keeps its chunks and CID sequences in a block store, so the
+    same append, load and query pipeline runs against Pinata, a directory or
+    memory.
+    """
+
+    def put(self, content: bytes, name: str = "table") -> str:
+        raise NotImplementedError
+
+    def put_json(self, data: Any, name: str = "table") -> str:
+        return self.put(json.dumps(data, default=json_default).encode("utf-8"), name)
+
+    def get(self, cid: str) -> bytes:
+        raise NotImplementedError
+
+    def has(self, cid: str) -> bool:
+        raise NotImplementedError
+
+
+def content_cid(content: bytes) -> str:
+    """
+    Local CID of a block: the hex SHA-256 of its bytes.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+class MemoryBlockStore(BlockStore):
+    """
+    In-process stand-in for a pinning service. Blocks live in a dictionary,
+    and reads and writes are counted so tests and benchmarks can check what
+    went over the "network".
+    """
+
+    def __init__(self):
+        self.blocks: Dict[str, bytes] = {}
+        self.puts = 0
+        self.gets = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+    def put(self, content: bytes, name: str = "table") -> str:
+        cid = content_cid(content)
+        with self._lock:
+            self.blocks[cid] = bytes(content)
+            self.puts += 1
+            self.bytes_written += len(content)
+        return cid
+
+    def get(self, cid: str) -> bytes:
+        with self._lock:
+            if cid not in self.blocks:
+                raise ValueError(f"Unknown CID: {cid}")
+            self.gets += 1
+            self.bytes_read += len(self.blocks[cid])
+            return self.blocks[cid]
+
+    def has(self, cid: str) -> bool:
+        return cid in self.blocks
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "blocks": len(self.blocks),
+                "puts": self.puts,
+                "gets": self.gets,
+                "bytes_written": self.bytes_written,
+                "bytes_read": self.bytes_read,
+            }
+
+
+class DirectoryBlockStore(BlockStore):
+    """
+    Blocks stored as files named by their CID in one directory. Writes are
+    atomic, so several processes can share the directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, cid: str) -> str:
+        if not cid or os.sep in cid or cid.startswith("."):
+            raise ValueError(f"Invalid CID: {cid}")
+        return os.path.join(self.directory, cid)
+
+    def put(self, content: bytes, name: str = "table") -> str:
+        cid = content_cid(content)
+        path = self._path(cid)
+        if os.path.exists(path):
+            return cid
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return cid
+
+    def get(self, cid: str) -> bytes:
+        try:
+            with open(self._path(cid), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            raise ValueError(f"Unknown CID: {cid}")
+
+    def has(self, cid: str) -> bool:
+        return os.path.exists(self._path(cid))
+
+
+# Requests in flight per gateway host, shared by every PinataBlockStore in the process
+_gateway_slots: Dict[str, threading.BoundedSemaphore] = {}
+_gateway_slots_lock = threading.Lock()
+
+
+def _gateway_slot(url: str, limit: int) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc
+    with _gateway_slots_lock:
+        if host not in _gateway_slots:
+            _gateway_slots[host] = threading.BoundedSemaphore(limit)
+        return _gateway_slots[host]
+
+
+class PinataBlockStore(BlockStore):
+    """
+    Blocks pinned to IPFS through Pinata and read back from its gateway.
+    """
+
+    def __init__(
+        self,
+        pinata_api_key: str,
+        transport: Optional[HTTPTransport] = None,
+        gateway_concurrency: int = 8,
+    ):
+        self.pinata_api_key = pinata_api_key
+        self.transport = transport or default_transport
+        self.gateway_concurrency = gateway_concurrency
+
+    def _pinned_cid(self, response) -> str:
+        if response.status_code == 200:
+            return response.json()["IpfsHash"]
+        else:
+            response.raise_for_status()
+
+    def put(self, content: bytes, name: str = "table") -> str:
+        url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
+        headers = {"Authorization": f"Bearer {self.pinata_api_key}"}
+        form = {
+            "pinataOptions": json.dumps({"cidVersion": 1}),
+            "pinataMetadata": json.dumps({"name": name}),
+        }
+        return self._pinned_cid(
+            self.transport.post(url, headers=headers, data=form, files={"file": (name, content)})
+        )
+
+    def put_json(self, data: Any, name: str = "table") -> str:
+        url = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+        headers = {
+            "Authorization": f"Bearer {self.pinata_api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "pinataOptions": {"cidVersion": 1},
+            "pinataMetadata": {"name": name},
+            "pinataContent": data,
+        }
+        return self._pinned_cid(
+            self.transport.post(url, headers=headers, data=json.dumps(payload, default=json_default))
+        )
+
+    @retry(
+        wait=wait_exponential(multiplier=0.5, max=10),
+        stop=stop_after_attempt(6),
+        reraise=True,
+    )
+    def get(self, cid: str) -> bytes:
+        url = f"https://gateway.pinata.cloud/ipfs/{cid}"
+        headers = {
+            "Authorization": f"Bearer {self.pinata_api_key}",
+            "Content-Type": "application/json",
+        }
+        with _gateway_slot(url, self.gateway_concurrency):
+            response = self.transport.get(url, headers=headers)
+        if response.status_code == 200:
+            return response.content
+        else:
+            response.raise_for_status()
+
+    def has(self, cid: str) -> bool:
+        url = f"https://gateway.pinata.cloud/ipfs/{cid}"
+        headers = {"Authorization": f"Bearer {self.pinata_api_key}"}
+        with _gateway_slot(url, self.gateway_concurrency):
+            response = self.transport.request("HEAD", url, headers=headers)
+        return response.status_code == 200
@@ -1,33 +1,181 @@
 import hashlib
 import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from zerokdb.chunk_format import json_default
+
+FSYNC_POLICIES = ("always", "interval", "never")
 
 
 class ChangeTracker:
-    def __init__(self, log_file="change_log.json"):
+    """
+    Append-only log of the statements that change the database, one JSON line
+    per change, with a rolling digest per table.
+
+    A table's digest starts over when the table is created, and each write
+    folds in the hash of the rows it touched: `sha256(previous digest + rows
+    hash)`. Logging a change therefore costs as much as the change, however
+    large the tables are. Each line records the table's digest after it.
+
+    `fsync` decides when lines reach the disk: after every change ("always"),
+    at most every `fsync_interval` seconds ("interval"), or whenever the OS
+    writes them back ("never"). Lines are flushed to the OS either way.
+
+    The latest digests, and how far into the log they reach, are kept in a
+    small `<log_file>.digests` file rewritten with each change, so opening a
+    long log only reads the lines written after it.
+    """
+
+    def __init__(
+        self,
+        log_file: str = "change_log.jsonl",
+        fsync: str = "interval",
+        fsync_interval: float = 1.0,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
         self.log_file = log_file
-        self.changes = self._load_changes()
+        self.digests_file = f"{log_file}.digests"
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._synced_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.digests: Dict[str, str] = self._load_digests()
 
-    def _load_changes(self):
+    def _load_digests(self) -> Dict[str, str]:
+        """
+        Read back the last digest of every table: those saved in the digests
+        file, updated with the log lines written after them. Logs written as a
+        single JSON array are converted to JSON lines first, including a
+        `change_log.json` left next to a new `change_log.jsonl`.
+        """
+        legacy_file = self.log_file[:-1] if self.log_file.endswith(".jsonl") else None
+        if legacy_file and os.path.exists(legacy_file) and not os.path.exists(self.log_file):
+            with open(legacy_file, "r") as file:
+                if file.read(1) == "[":
+                    file.seek(0)
+                    self._convert_json_array(json.load(file))
+                    return {}
         try:
-            with open(self.log_file, "r") as file:
-                return json.load(file)
+            with open(self.log_file, "rb") as file:
+                if file.read(1) == b"[":
+                    file.seek(0)
+                    self._convert_json_array(json.load(file))
+                    return {}
+                offset, digests = self._read_digests_file()
+                file.seek(0, os.SEEK_END)
+                if offset > file.tell():
+                    # The log was replaced by a shorter one: read it all
+                    offset, digests = 0, {}
+                file.seek(offset)
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash
+                        continue
+                    if record.get("table"):
+                        digests[record["table"]] = record["data_hash"]
+                return digests
         except FileNotFoundError:
-            return []
+            return {}
+
+    def _read_digests_file(self):
+        try:
+            with open(self.digests_file, "r") as file:
+                saved = json.load(file)
+            return saved["offset"], saved["digests"]
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return 0, {}
 
-    def _save_changes(self):
-        with open(self.log_file, "w") as file:
-            json.dump(self.changes, file, indent=4)
+    def _write_digests_file(self, offset: int):
+        temporary = f"{self.digests_file}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"offset": offset, "digests": self.digests}, file)
+        os.replace(temporary, self.digests_file)
+
+    def _convert_json_array(self, records):
+        temporary = f"{self.log_file}.tmp"
+        with open(temporary, "w") as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+        os.replace(temporary, self.log_file)
+        if os.path.exists(self.digests_file):
+            os.remove(self.digests_file)
 
     def _hash_data(self, data):
-        return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
-
-    def log_change(self, query, data):
-        query_hash = self._hash_data(query)
-        data_hash = self._hash_data(data)
-        change_record = {
-            "query_hash": query_hash,
-            "query": query,
-            "data_hash": data_hash,
-        }
-        self.changes.append(change_record)
-        self._save_changes()
+        return hashlib.sha256(
+            json.dumps(data, separators=(",", ":"), default=json_default).encode()
+        ).hexdigest()
+
+    def log_change(
+        self,
+        query: str,
+        table_name: str,
+        rows: Sequence[Sequence[Any]] = (),
+        reset: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Append a change of `table_name` that wrote `rows`. With `reset` (for
+        CREATE TABLE) the table's digest starts over.
+        """
+        rows_hash = self._hash_data(list(rows))
+        with self._lock:
+            digest = self.digests.get(table_name, "")
+            if reset or rows:
+                digest = hashlib.sha256(("" if reset else digest).encode() + rows_hash.encode()).hexdigest()
+                self.digests[table_name] = digest
+            record = {
+                "query_hash": self._hash_data(query),
+                "query": query,
+                "table": table_name,
+                "row_count": len(rows),
+                "rows_hash": rows_hash,
+                "data_hash": digest,
+            }
+            self._append(json.dumps(record, default=json_default))
+        return record
+
+    def _append(self, line: str):
+        if self._file is None:
+            self._file = open(self.log_file, "a")
+        self._file.write(line + "\n")
+        self._file.flush()
+        self._write_digests_file(os.fstat(self._file.fileno()).st_size)
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._synced_at >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._synced_at = now
+
+    def read_changes(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the logged changes, oldest first.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+        try:
+            with open(self.log_file, "r") as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def digest(self, table_name: str) -> Optional[str]:
+        return self.digests.get(table_name)
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
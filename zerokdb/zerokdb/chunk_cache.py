@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from zerokdb.chunk_format import decode_document, json_default
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+_CID_PATTERN = re.compile(r"^[A-Za-z0-9]+$")
+# Temporary files older than this were left behind by a crashed writer
+_STALE_TEMP_SECONDS = 3600
+
+
+def chunk_hash(data: Any) -> str:
+    """
+    Hash the logical JSON content of a chunk, as recorded in CID sequences.
+    JSON and columnar encodings of the same chunk hash alike.
+    """
+    return hashlib.sha256(json.dumps(data, default=json_default).encode("utf-8")).hexdigest()
+
+
+class ChunkCache:
+    """
+    On-disk cache of immutable IPFS documents (chunks and sequences) keyed by CID.
+
+    Entries are written atomically (temporary file plus rename), so several
+    processes can share one directory. Reads refresh an entry's mtime, and
+    once the directory grows past `max_bytes` the least recently used entries
+    are evicted. Chunks stored with their expected `chunk_hash` are verified
+    before they are written; a CID's file is never rewritten, so hits are
+    served without decoding or hashing them again.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.evictions = 0
+        self.rejected = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, cid: str) -> str:
+        if not _CID_PATTERN.match(cid):
+            raise ValueError(f"Invalid CID: {cid}")
+        return os.path.join(self.directory, cid[-2:], cid)
+
+    def _verify(self, content: bytes, expected_hash: Optional[str]) -> bool:
+        if expected_hash is None:
+            return True
+        try:
+            return chunk_hash(decode_document(content)) == expected_hash
+        except ValueError:
+            return False
+
+    def get(self, cid: str) -> Optional[bytes]:
+        """
+        Return the cached content of `cid`, or None when it is missing.
+        """
+        path = self._path(cid)
+        try:
+            with open(path, "rb") as file:
+                content = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_read += len(content)
+        return content
+
+    def put(self, cid: str, content: bytes, expected_hash: Optional[str] = None) -> bool:
+        """
+        Store the content of `cid`. Content that does not match `expected_hash` is not cached.
+        """
+        if not self._verify(content, expected_hash):
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        path = self._path(cid)
+        if os.path.exists(path):
+            return True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+        with self._lock:
+            self.bytes_written += len(content)
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += len(content)
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+        return True
+
+    def _scan(self):
+        entries = []
+        total = 0
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.startswith(".tmp-"):
+                    if now - stat.st_mtime > _STALE_TEMP_SECONDS:
+                        self._remove(path)
+                    continue
+                if name == ".lock":
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache is back under 90% of `max_bytes`.
+        """
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Another process is already evicting
+                    return
+            entries, total = self._scan()
+            target = int(self.max_bytes * 0.9)
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                if self._remove(path):
+                    total -= size
+                    evicted += 1
+        with self._lock:
+            self._size = total
+            self.evictions += evicted
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+            }
+
+
+# Shared by every IPFSStorage in the process when ZEROKDB_CHUNK_CACHE_DIR is set
+chunk_cache = (
+    ChunkCache(
+        os.environ["ZEROKDB_CHUNK_CACHE_DIR"],
+        max_bytes=int(os.getenv("ZEROKDB_CHUNK_CACHE_MAX_BYTES", str(1 << 30))),
+    )
+    if os.getenv("ZEROKDB_CHUNK_CACHE_DIR")
+    else None
+)
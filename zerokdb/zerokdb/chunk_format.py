@@ -0,0 +1,366 @@
+import base64
+import binascii
+import json
+import lzma
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional
+    zstandard = None
+
+from zerokdb.vector_type import VECTOR_DTYPE, is_vector_type
+
+# Columnar chunks start with MAGIC and a format version, and end with a JSON
+# footer, its length and MAGIC again:
+#
+#   MAGIC | version (u16) | padding | column buffers | footer | footer length (u64) | MAGIC
+#
+# Every column buffer starts on an 8-byte boundary so it can be read as a
+# NumPy view of the chunk without copying.
+MAGIC = b"ZKCC"
+FORMAT_VERSION = 1
+CHUNK_FORMATS = ("json", "columnar")
+
+_HEADER = struct.Struct("<4sH2x")
+_TRAILER = struct.Struct("<Q4s")
+
+# Compressed documents (chunks in either format, or sequences) are wrapped as
+#
+#   COMPRESSED_MAGIC | codec id (u8) | padding | uncompressed length (u64) | payload
+COMPRESSED_MAGIC = b"ZKCZ"
+COMPRESSIONS = {"zlib": 1, "lzma": 2, "zstd": 3}
+# zstd when the zstandard package is installed, the standard library's zlib otherwise
+DEFAULT_COMPRESSION = "zstd" if zstandard is not None else "zlib"
+_COMPRESSED_HEADER = struct.Struct("<4sB3xQ")
+_INT64_RANGE = (-(1 << 63), (1 << 63) - 1)
+_DTYPES = {
+    "int64": np.dtype("<i8"),
+    "float64": np.dtype("<f8"),
+    "bool": np.dtype("u1"),
+}
+
+
+def json_default(value: Any) -> Any:
+    """
+    `json.dumps` fallback for decoded columnar values: binary vectors become
+    the base64 text used in JSON chunks, NumPy scalars become Python numbers.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("ascii")
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def is_columnar(content: bytes) -> bool:
+    return content[: len(MAGIC)] == MAGIC
+
+
+def resolve_compression(compression: Optional[str]) -> Optional[str]:
+    """
+    Validate a compression setting; "auto" picks DEFAULT_COMPRESSION.
+    """
+    if compression in (None, "", "none"):
+        return None
+    if compression == "auto":
+        return DEFAULT_COMPRESSION
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+    return compression
+
+
+def compress(content: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        payload = zlib.compress(content, 6)
+    elif compression == "lzma":
+        payload = lzma.compress(content)
+    elif compression == "zstd" and zstandard is not None:
+        payload = zstandard.ZstdCompressor(level=3).compress(content)
+    else:
+        raise ValueError(f"Unsupported compression: {compression}")
+    return _COMPRESSED_HEADER.pack(COMPRESSED_MAGIC, COMPRESSIONS[compression], len(content)) + payload
+
+
+def is_compressed(content: bytes) -> bool:
+    return content[: len(COMPRESSED_MAGIC)] == COMPRESSED_MAGIC
+
+
+def decompress(content: bytes) -> bytes:
+    _, codec, length = _COMPRESSED_HEADER.unpack_from(content, 0)
+    payload = memoryview(content)[_COMPRESSED_HEADER.size:]
+    if codec == COMPRESSIONS["zlib"]:
+        data = zlib.decompress(payload)
+    elif codec == COMPRESSIONS["lzma"]:
+        data = lzma.decompress(payload)
+    elif codec == COMPRESSIONS["zstd"]:
+        if zstandard is None:
+            raise ValueError("Reading zstd compressed documents requires the zstandard package")
+        data = zstandard.ZstdDecompressor().decompress(payload, max_output_size=length)
+    else:
+        raise ValueError(f"Unknown compression codec {codec}")
+    if len(data) != length:
+        raise ValueError("Compressed document is truncated")
+    return data
+
+
+def decode_document(content: bytes) -> Dict[str, Any]:
+    """
+    Decode a stored document: JSON or a columnar chunk, either possibly compressed.
+    """
+    if is_compressed(content):
+        content = decompress(content)
+    if is_columnar(content):
+        return ColumnarChunk(content).to_dict()
+    return json.loads(content)
+
+
+def _vector_bytes(value: Any) -> Optional[bytes]:
+    """
+    Return the packed float32 bytes of a vector in its canonical chunk encoding
+    (base64 text or bytes), or None when it cannot round trip through a block.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if not isinstance(value, str):
+        return None
+    try:
+        packed = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if base64.b64encode(packed).decode("ascii") != value:
+        return None
+    return packed
+
+
+def _column_encoding(values: List[Any], column_type: Optional[str]):
+    present = [value for value in values if value is not None]
+    if not present:
+        return "json", None
+    if is_vector_type(column_type):
+        packed = [_vector_bytes(value) for value in present]
+        sizes = {len(vector) if vector is not None else -1 for vector in packed}
+        if len(sizes) == 1 and sizes.pop() % VECTOR_DTYPE.itemsize == 0 and packed[0]:
+            return "vector", packed
+        return "json", None
+    kinds = {type(value) for value in present}
+    if kinds == {bool}:
+        return "bool", None
+    if kinds == {int} and _INT64_RANGE[0] <= min(present) and max(present) <= _INT64_RANGE[1]:
+        return "int64", None
+    if kinds == {float}:
+        return "float64", None
+    if kinds == {str}:
+        return "string", None
+    return "json", None
+
+
+class _Writer:
+    def __init__(self):
+        self.parts: List[bytes] = [_HEADER.pack(MAGIC, FORMAT_VERSION)]
+        self.size = _HEADER.size
+
+    def write(self, data: bytes) -> List[int]:
+        padding = -self.size % 8
+        if padding:
+            self.parts.append(b"\0" * padding)
+            self.size += padding
+        offset = self.size
+        self.parts.append(data)
+        self.size += len(data)
+        return [offset, len(data)]
+
+
+def encode_chunk(chunk: Dict[str, Any]) -> bytes:
+    """
+    Encode a chunk ({table: TableData}) in the columnar format.
+
+    Each column is stored with the narrowest lossless encoding its values
+    allow: int64, float64, bool, UTF-8 strings with offsets, a float32 block
+    for vectors of one dimension, or JSON for anything else. The footer keeps
+    the table metadata and each column's min and max.
+    """
+    writer = _Writer()
+    tables = {}
+    for table_name, table in chunk.items():
+        columns = list(table.get("columns", []))
+        column_types = table.get("column_types") or {}
+        rows = list(table.get("rows", []))
+        data = {}
+        for i, column in enumerate(columns):
+            values = [row[i] for row in rows]
+            encoding, packed = _column_encoding(values, column_types.get(column))
+            info: Dict[str, Any] = {"encoding": encoding}
+            nulls = [value is None for value in values]
+            if any(nulls) and encoding != "json":
+                info["nulls"] = writer.write(np.array(nulls, dtype="u1").tobytes())
+
+            if encoding == "vector":
+                vectors = iter(packed)
+                width = len(packed[0])
+                info["dimension"] = width // VECTOR_DTYPE.itemsize
+                info["data"] = writer.write(
+                    b"".join(b"\0" * width if value is None else next(vectors) for value in values)
+                )
+            elif encoding == "string":
+                encoded = [b"" if value is None else value.encode("utf-8") for value in values]
+                offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+                np.cumsum([len(value) for value in encoded], out=offsets[1:])
+                info["offsets"] = writer.write(offsets.tobytes())
+                info["data"] = writer.write(b"".join(encoded))
+            elif encoding in _DTYPES:
+                info["data"] = writer.write(
+                    np.array([0 if value is None else value for value in values], dtype=_DTYPES[encoding]).tobytes()
+                )
+            else:
+                info["data"] = writer.write(json.dumps(values, default=json_default).encode("utf-8"))
+
+            present = [value for value in values if value is not None]
+            if present and encoding in ("int64", "float64", "bool", "string"):
+                info["min"] = min(present)
+                info["max"] = max(present)
+            data[column] = info
+
+        tables[table_name] = {
+            "metadata": {key: value for key, value in table.items() if key != "rows"},
+            # Keeps decoded tables key-for-key identical, so their chunk_hash matches
+            "keys": list(table),
+            "row_count": len(rows),
+            "data": data,
+        }
+
+    footer = json.dumps({"version": FORMAT_VERSION, "tables": tables}, default=json_default).encode("utf-8")
+    writer.write(footer)
+    writer.parts.append(_TRAILER.pack(len(footer), MAGIC))
+    return b"".join(writer.parts)
+
+
+class ColumnarChunk:
+    """
+    Read access to a columnar chunk. Numeric and vector columns are returned
+    as read-only NumPy views of the chunk's bytes, and only the columns that
+    are asked for are decoded.
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+        magic, version = _HEADER.unpack_from(content, 0)
+        footer_length, end_magic = _TRAILER.unpack_from(content, len(content) - _TRAILER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError("Not a columnar chunk")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar chunk version {version}")
+        footer_start = len(content) - _TRAILER.size - footer_length
+        footer = json.loads(bytes(content[footer_start: footer_start + footer_length]))
+        self.version = version
+        self._tables = footer["tables"]
+        self._buffer = memoryview(content)
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self._tables)
+
+    def row_count(self, table_name: str) -> int:
+        return self._tables[table_name]["row_count"]
+
+    def metadata(self, table_name: str) -> Dict[str, Any]:
+        return self._tables[table_name]["metadata"]
+
+    def stats(self, table_name: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the min and max of each column that records them.
+        """
+        return {
+            column: {"min": info["min"], "max": info["max"]}
+            for column, info in self._tables[table_name]["data"].items()
+            if "min" in info
+        }
+
+    def _info(self, table_name: str, column: str) -> Dict[str, Any]:
+        try:
+            return self._tables[table_name]["data"][column]
+        except KeyError:
+            raise ValueError(f"Unknown column {table_name}.{column}")
+
+    def _array(self, span: Sequence[int], dtype: np.dtype) -> np.ndarray:
+        offset, length = span
+        return np.frombuffer(self.content, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    def nulls(self, table_name: str, column: str) -> Optional[np.ndarray]:
+        """
+        Return a boolean mask of the null values of a column, or None when it has none.
+        """
+        info = self._info(table_name, column)
+        if "nulls" not in info:
+            return None
+        return self._array(info["nulls"], np.dtype("u1")).view(bool)
+
+    def column(self, table_name: str, column: str):
+        """
+        Return a column as a NumPy view (a 2-D float32 array for vectors), or
+        as a list for string and JSON columns. Null entries of numeric and
+        vector columns hold zeros; see `nulls`.
+        """
+        info = self._info(table_name, column)
+        encoding = info["encoding"]
+        if encoding == "vector":
+            return self._array(info["data"], VECTOR_DTYPE).reshape(-1, info["dimension"])
+        if encoding in _DTYPES:
+            array = self._array(info["data"], _DTYPES[encoding])
+            return array.view(bool) if encoding == "bool" else array
+        return self.values(table_name, column)
+
+    def values(self, table_name: str, column: str) -> List[Any]:
+        """
+        Return a column as Python values, with None for nulls. Vectors are
+        memoryview slices of the chunk holding their packed float32 bytes.
+        """
+        info = self._info(table_name, column)
+        encoding = info["encoding"]
+        offset, length = info["data"]
+        if encoding == "json":
+            return json.loads(bytes(self._buffer[offset: offset + length]))
+
+        if encoding == "vector":
+            width = info["dimension"] * VECTOR_DTYPE.itemsize
+            values = [
+                self._buffer[start: start + width] for start in range(offset, offset + length, width)
+            ]
+        elif encoding == "string":
+            bounds = self._array(info["offsets"], np.dtype("<i8")).tolist()
+            data = self._buffer[offset: offset + length]
+            values = [str(data[start:end], "utf-8") for start, end in zip(bounds, bounds[1:])]
+        else:
+            values = self.column(table_name, column).tolist()
+
+        nulls = self.nulls(table_name, column)
+        if nulls is not None:
+            for i in np.flatnonzero(nulls).tolist():
+                values[i] = None
+        return values
+
+    def table(self, table_name: str, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Return a table as TableData, optionally with only some of its columns.
+        """
+        entry = self._tables[table_name]
+        metadata = dict(entry["metadata"])
+        selected = list(metadata.get("columns", [])) if columns is None else list(columns)
+        if columns is not None:
+            column_types = metadata.get("column_types") or {}
+            metadata["columns"] = selected
+            metadata["column_types"] = {column: column_types[column] for column in selected if column in column_types}
+        values = [self.values(table_name, column) for column in selected]
+        metadata["rows"] = [list(row) for row in zip(*values)] if values else [
+            [] for _ in range(self.row_count(table_name))
+        ]
+        return {key: metadata[key] for key in entry.get("keys", metadata) if key in metadata}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {table_name: self.table(table_name) for table_name in self._tables}
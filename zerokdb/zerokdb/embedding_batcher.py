@@ -0,0 +1,76 @@
+import asyncio
+from typing import Callable, List, Optional, Sequence
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into micro-batches.
+
+    The first queued text opens a window of `window` seconds. Texts that
+    arrive within it, up to `max_batch_size`, are embedded together with one
+    `convert_batch` call, which runs in the default executor.
+    """
+
+    def __init__(
+        self,
+        convert_batch: Callable[[Sequence[str]], List[List[float]]],
+        max_batch_size: int = 32,
+        window: float = 0.005,
+    ):
+        self.convert_batch = convert_batch
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.batches = 0
+        self.texts = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def embed(self, text: str) -> List[float]:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                embeddings = await loop.run_in_executor(
+                    None, self.convert_batch, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(batch)
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
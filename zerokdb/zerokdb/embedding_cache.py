@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from zerokdb.vector_type import decode_vector, encode_vector, to_vector
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model name, text hash).
+
+    A bounded LRU dictionary keeps the hot entries in memory. With `path`, a
+    SQLite file keeps every entry on disk, so embeddings survive restarts and
+    are shared between processes on the same host.
+
+    Both tiers hold float32 values, the precision of a stored VECTOR, and every
+    lookup returns new lists, so callers may change them.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(model TEXT, text_hash TEXT, vector BLOB, PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+            )
+        return self._conn
+
+    def _remember(self, key: Tuple[str, str], embedding: List[float]):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Return the cached embedding of every text, or None where there is none.
+        """
+        keys = [(model_name, self.text_hash(text)) for text in texts]
+        with self._lock:
+            found: Dict[Tuple[str, str], List[float]] = {}
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            self.memory_hits += sum(key in found for key in keys)
+
+            missing = list({key[1] for key in keys if key not in found})
+            if missing and self.path:
+                rows = self._connect().execute(
+                    "SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    "AND text_hash IN (SELECT value FROM json_each(?))",
+                    (model_name, json.dumps(missing)),
+                ).fetchall()
+                for text_hash, vector in rows:
+                    key = (model_name, text_hash)
+                    found[key] = decode_vector(vector)
+                    self._remember(key, found[key])
+                on_disk = {text_hash for text_hash, _ in rows}
+                self.disk_hits += sum(key[1] in on_disk for key in keys)
+
+            results = [found.get(key) for key in keys]
+            self.misses += sum(result is None for result in results)
+            return [None if result is None else list(result) for result in results]
+
+    def put_many(self, model_name: str, texts: Sequence[str], embeddings: Sequence[List[float]]):
+        entries = {
+            (model_name, self.text_hash(text)): to_vector(embedding).tolist()
+            for text, embedding in zip(texts, embeddings)
+        }
+        with self._lock:
+            for key, embedding in entries.items():
+                self._remember(key, embedding)
+            if self.path:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                    [(key[0], key[1], encode_vector(embedding)) for key, embedding in entries.items()],
+                )
+                conn.commit()
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model_name, [text])[0]
+
+    def put(self, model_name: str, text: str, embedding: List[float]):
+        self.put_many(model_name, [text], [embedding])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.memory_hits + self.disk_hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                self._connect().execute("DELETE FROM embeddings")
+                self._connect().commit()
+
+
+# Shared by every TextToEmbedding in the process; set ZEROKDB_EMBEDDING_CACHE_PATH
+# to also keep embeddings on disk
+embedding_cache = EmbeddingCache(
+    max_entries=int(os.getenv("ZEROKDB_EMBEDDING_CACHE_SIZE", "10000")),
+    path=os.getenv("ZEROKDB_EMBEDDING_CACHE_PATH") or None,
+)
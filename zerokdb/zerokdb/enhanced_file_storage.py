@@ -1,26 +1,80 @@
-import requests
+import time
+from zerokdb.http_transport import HTTPTransport, default_transport
 from zerokdb.ipfs_storage import IPFSStorage
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 
 class EnhancedFileStorage:
-    def __init__(self, filename, api_host, pinata_api_key):
+    def __init__(
+        self,
+        filename,
+        api_host,
+        pinata_api_key,
+        max_staleness: float = 0.0,
+        transport: Optional[HTTPTransport] = None,
+        service=None,
+    ):
         self.filename = filename
         self.api_host = api_host
         self.pinata_api_key = pinata_api_key
+        # One pooled transport for the API and the gateway, and one IPFS client reused by every load
+        self.transport = transport or default_transport
+        # An in-process stand-in for the API (e.g. LocalSequenceService), which brings its own storage
+        self.service = service
+        self.ipfs = service.storage if service else IPFSStorage(pinata_api_key=pinata_api_key, transport=self.transport)
+        # Seconds during which a synced table is served without asking the API for its sequence
+        self.max_staleness = max_staleness
+        # Latest known CID sequence per table, used as the table's version
+        self.sequence_cids: Dict[str, str] = {}
+        # Sequence CID and chunk ids last synced per table, and when the API was last asked
+        self.table_states: Dict[str, Dict[str, Any]] = {}
+        # Chunks appended by this instance whose rows the database already holds
+        self.own_chunks: Dict[str, List[str]] = {}
 
     def save(self, data, table_name):
         """
         Save data by appending it to the REST API at zerokdbapi.
         """
-        return self.append_data_to_api(table_name, data)
+        result = self.append_data_to_api(table_name, data)
+        if result and result.get("sequence_cid"):
+            self.sequence_cids[table_name] = result["sequence_cid"]
+        if result and result.get("data_cid") and table_name in self.table_states:
+            self.own_chunks.setdefault(table_name, []).append(result["data_cid"])
+        return result
+
+    def save_many(self, chunks, table_name):
+        """
+        Append several chunks through one call to the REST API at zerokdbapi,
+        which updates the table's sequence once for all of them.
+        """
+        result = self.append_chunks_to_api(table_name, chunks)
+        if result and result.get("sequence_cid"):
+            self.sequence_cids[table_name] = result["sequence_cid"]
+        if result and result.get("data_cids") and table_name in self.table_states:
+            self.own_chunks.setdefault(table_name, []).extend(result["data_cids"])
+        return result
+
+    def get_table_version(self, table_name: str):
+        """
+        Return the CID sequence of the table as last seen by this instance.
+        """
+        return self.sequence_cids.get(table_name)
+
+    def get_storage_id(self):
+        """
+        Return what tells this storage apart from others sharing a cache: the
+        API (or in-process service) naming its sequences, and the database.
+        """
+        return ("ipfs", self.api_host if self.service is None else id(self.service), self.filename)
 
     def get_table_sequence_by_name(self, table_name):
         """
         Get the CID sequence by querying the REST API at zerokdbapi.
         """
+        if self.service:
+            return self.service.get_table_sequence_by_name(table_name)
         url = f"{self.api_host}/sequence/name"
-        response = requests.post(url, json={"entity_name": table_name})
+        response = self.transport.post(url, json={"entity_name": table_name})
         if response.status_code == 200:
             return response.json()
         else:
@@ -30,19 +84,28 @@ class EnhancedFileStorage:
         """
         Call the POST /entity endpoint to create a new table.
         """
-        url = f"{self.api_host}/entity"
-        response = requests.post(url, json={"entity_name": entity_name, "data": data})
-        if response.status_code == 200:
-            return response.json()
+        if self.service:
+            result = self.service.create_entity(entity_name, data)
         else:
-            response.raise_for_status()
+            url = f"{self.api_host}/entity"
+            response = self.transport.post(url, json={"entity_name": entity_name, "data": data})
+            if response.status_code != 200:
+                response.raise_for_status()
+            result = response.json()
+        if result.get("sequence_cid"):
+            self.sequence_cids[entity_name] = result["sequence_cid"]
+            self.table_states[entity_name] = {
+                "sequence_cid": result["sequence_cid"],
+                "chunk_ids": [result["data_cid"]],
+                "checked_at": time.monotonic(),
+            }
+        return result
 
     def load_by_id(self, cid: str) -> Dict[str, Any]:
         """
         Load data by querying the Pinata API using a CID.
         """
-        storage = IPFSStorage(pinata_api_key=self.pinata_api_key)
-        return storage.download_db(cid)
+        return self.ipfs.download_db(cid)
 
     def load(self, table_name: str) -> Dict[str, Any]:
         """
@@ -50,23 +113,137 @@ class EnhancedFileStorage:
         """
         try:
             print(f"Loading data for table {table_name}")
-            storage = IPFSStorage(pinata_api_key=self.pinata_api_key)
             sequence = self.get_table_sequence_by_name(table_name)
             if not sequence:
                 print(f"No sequence found for table {table_name}")
                 return {}
             cid = sequence["sequence_cid"]
-            return storage.download_db(cid)
+            self.sequence_cids[table_name] = cid
+            return self.ipfs.download_db(cid)
         except Exception as e:
             print(f"Error getting table sequence or downloading data for {table_name}: {e}")
             raise e
 
+    def load_changes(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the rows appended to a table since it was last synced, or None when
+        nothing changed.
+
+        Only chunks added after the last synced sequence are downloaded, and of
+        a paged sequence only the pages listing them are read. A sequence whose
+        entry at the last synced position is no longer the last synced chunk
+        (e.g. after compaction) is downloaded in full and flagged with `reset`.
+        """
+        state = self.table_states.get(table_name)
+        now = time.monotonic()
+        if state and now - state["checked_at"] < self.max_staleness:
+            return None
+
+        sequence = self.get_table_sequence_by_name(table_name)
+        if not sequence:
+            return None
+        cid = sequence["sequence_cid"]
+        if state:
+            state["checked_at"] = now
+            if state["sequence_cid"] == cid:
+                return None
+
+        known = state["chunk_ids"] if state else []
+        # Sequences only grow by appends, so the last synced chunk still being in
+        # place means everything before it is too
+        entries = self.ipfs.sequence_entries(cid, max(len(known) - 1, 0))
+        reset = bool(known) and (not entries or entries[0]["chunk_id"] != known[-1])
+        if reset:
+            entries = self.ipfs.sequence_entries(cid)
+        elif known:
+            entries = entries[1:]
+        new_chunk_ids = [chunk_entry["chunk_id"] for chunk_entry in entries]
+        chunk_ids = new_chunk_ids if reset else known + new_chunk_ids
+        own_chunks = self.own_chunks.pop(table_name, [])
+        if not reset:
+            # Rows of chunks this instance appended are already in the database
+            for chunk_id in own_chunks:
+                if chunk_id in new_chunk_ids:
+                    new_chunk_ids.remove(chunk_id)
+
+        # Rows stream in while the remaining chunks download in parallel
+        table = self.ipfs.stream_table(
+            table_name,
+            new_chunk_ids,
+            {chunk_entry["chunk_id"]: chunk_entry.get("chunk_hash") for chunk_entry in entries},
+        )
+        self.table_states[table_name] = {
+            "sequence_cid": cid,
+            "chunk_ids": chunk_ids,
+            "checked_at": now,
+        }
+        self.sequence_cids[table_name] = cid
+        if not reset and table is None:
+            return None
+        if table is not None:
+            table["rows"] = self._forget_on_failure(table_name, table["rows"])
+        return {"reset": reset, "table": table}
+
+    def export_table_state(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return what a restarted instance needs to continue syncing a table from
+        where this one is: the synced sequence and the chunks appended since.
+        """
+        state = self.table_states.get(table_name)
+        if state is None:
+            return None
+        return {
+            "sequence_cid": state["sequence_cid"],
+            "chunk_ids": state["chunk_ids"],
+            "own_chunks": self.own_chunks.get(table_name, []),
+        }
+
+    def restore_table_state(self, table_name: str, state: Dict[str, Any]):
+        self.table_states[table_name] = {
+            "sequence_cid": state["sequence_cid"],
+            "chunk_ids": state["chunk_ids"],
+            # Checked with the API on first use
+            "checked_at": float("-inf"),
+        }
+        self.sequence_cids[table_name] = state["sequence_cid"]
+        if state.get("own_chunks"):
+            self.own_chunks[table_name] = list(state["own_chunks"])
+
+    def forget_table_state(self, table_name: str):
+        self.table_states.pop(table_name, None)
+        self.sequence_cids.pop(table_name, None)
+        self.own_chunks.pop(table_name, None)
+
+    def _forget_on_failure(self, table_name: str, rows):
+        # A download that fails mid-stream leaves the table to be reloaded in full
+        try:
+            yield from rows
+        except BaseException:
+            self.table_states.pop(table_name, None)
+            self.sequence_cids.pop(table_name, None)
+            raise
+
     def append_data_to_api(self, table_name, data) -> Dict[str, Any]:
         """
         Call the REST API at zerokdbapi to append data.
         """
+        if self.service:
+            return self.service.append_data(table_name, data)
         url = f"{self.api_host}/append-data"
-        response = requests.post(url, json={"data": data, "table_name": table_name})
+        response = self.transport.post(url, json={"data": data, "table_name": table_name})
+        if response.status_code == 200:
+            return response.json()
+        else:
+            response.raise_for_status()
+
+    def append_chunks_to_api(self, table_name, chunks) -> Dict[str, Any]:
+        """
+        Call the REST API at zerokdbapi to append several chunks at once.
+        """
+        if self.service:
+            return self.service.append_chunks(table_name, chunks)
+        url = f"{self.api_host}/append-data/batch"
+        response = self.transport.post(url, json={"chunks": chunks, "table_name": table_name})
         if response.status_code == 200:
             return response.json()
         else:
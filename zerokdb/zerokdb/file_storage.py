@@ -1,20 +1,116 @@
 import json
+import os
 
 
 class FileStorage:
     def __init__(self, filename):
         self.filename = filename
+        # File version and row count last synced per table
+        self.table_states = {}
 
     def save(self, data, entity_id):
+        # Append the chunk's rows to what is already stored, like a new IPFS chunk would
+        previous_version = self.get_table_version(entity_id)
+        stored = self.load(entity_id)
+        for table_name, table in data.items():
+            if table_name in stored:
+                stored[table_name]["rows"].extend(table.get("rows", []))
+                stored[table_name].setdefault("indexes", {}).update(
+                    table.get("indexes") or {}
+                )
+            else:
+                stored[table_name] = table
         with open(self.filename, "w") as file:
-            json.dump(data, file)
+            json.dump(stored, file)
+        self._advance_table_states(previous_version, stored)
         return {}
 
+    def save_many(self, chunks, entity_id):
+        # The chunks' rows are appended with a single rewrite of the file
+        merged = {}
+        for data in chunks:
+            for table_name, table in data.items():
+                if table_name in merged:
+                    merged[table_name]["rows"].extend(table.get("rows", []))
+                    merged[table_name]["indexes"].update(table.get("indexes") or {})
+                else:
+                    merged[table_name] = dict(
+                        table, rows=list(table.get("rows", [])), indexes=dict(table.get("indexes") or {})
+                    )
+        return self.save(merged, entity_id)
+
     def create_table(self, entity_name, data):
         with open(self.filename, "w") as file:
             json.dump(data, file)
+        self.table_states = {}
+        self._advance_table_states(None, data)
         return {}
 
+    def _advance_table_states(self, previous_version, stored):
+        # The caller's database already holds what it just wrote; tables that
+        # were in sync before the write stay in sync after it
+        version = self.get_table_version(None)
+        for table_name, table in stored.items():
+            state = self.table_states.get(table_name)
+            if state is None:
+                in_sync = previous_version is None
+            else:
+                in_sync = state["version"] == previous_version
+            if in_sync:
+                self.table_states[table_name] = {
+                    "version": version,
+                    "row_count": len(table.get("rows", [])),
+                }
+            else:
+                self.table_states.pop(table_name, None)
+
+    def load_changes(self, table_name: str):
+        """
+        Return the rows appended to a table since it was last synced, or None when
+        nothing changed.
+        """
+        version = self.get_table_version(table_name)
+        state = self.table_states.get(table_name)
+        if version is None or (state is not None and state["version"] == version):
+            return None
+        table = self.load(table_name).get(table_name)
+        if table is None:
+            self.table_states.pop(table_name, None)
+            return None
+        rows = table.get("rows", [])
+        # A file that lost rows was rewritten and has to be reloaded in full
+        reset = state is None or len(rows) < state["row_count"]
+        self.table_states[table_name] = {"version": version, "row_count": len(rows)}
+        if not reset:
+            table = dict(table, rows=rows[state["row_count"]:])
+        return {"reset": reset, "table": table}
+
+    def export_table_state(self, table_name: str):
+        state = self.table_states.get(table_name)
+        return dict(state) if state is not None else None
+
+    def restore_table_state(self, table_name: str, state):
+        self.table_states[table_name] = dict(state)
+
+    def forget_table_state(self, table_name: str):
+        self.table_states.pop(table_name, None)
+
+    def get_table_version(self, table_name: str):
+        """
+        Return a token that changes whenever the stored file is rewritten.
+        """
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def get_storage_id(self):
+        """
+        Return what tells this storage apart from others sharing a cache.
+        """
+        return ("file", os.path.abspath(self.filename))
+
     def load(self, cid: str):
         try:
             with open(self.filename, "r") as file:
@@ -0,0 +1,109 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HTTPTransport:
+    """
+    Pooled HTTP client shared by the storage classes.
+
+    Connections are kept alive per host, up to `pool_maxsize` each unless
+    `host_pool_sizes` says otherwise (e.g. {"gateway.pinata.cloud": 64}).
+    Every request gets a (connect, read) timeout. With `http2`, requests go
+    through an httpx client that multiplexes them over HTTP/2 connections.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 32,
+        host_pool_sizes: Optional[Dict[str, int]] = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        http2: bool = False,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_sizes = dict(host_pool_sizes or {})
+        self.timeout = (connect_timeout, read_timeout)
+        self.http2 = http2
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_http2_client() if self.http2 else self._create_session()
+        return self._client
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # requests picks the adapter with the longest matching prefix
+        for host, size in self.host_pool_sizes.items():
+            host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount(f"https://{host}/", host_adapter)
+            session.mount(f"http://{host}/", host_adapter)
+        return session
+
+    def _create_http2_client(self):
+        try:
+            import httpx
+        except ImportError:
+            raise ValueError("HTTP/2 transport requires the httpx package with its http2 extra")
+        connect_timeout, read_timeout = self.timeout
+        max_connections = max([self.pool_maxsize, *self.host_pool_sizes.values()])
+        return httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    def request(self, method: str, url: str, **kwargs: Any):
+        if self.http2:
+            kwargs.pop("timeout", None)
+            # httpx takes raw request bodies as `content`
+            if isinstance(kwargs.get("data"), (str, bytes)):
+                kwargs["content"] = kwargs.pop("data")
+            return self.client.request(method, url, **kwargs)
+        kwargs.setdefault("timeout", self.timeout)
+        return self.client.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+def _host_pool_sizes(value: Optional[str]) -> Dict[str, int]:
+    # "gateway.pinata.cloud=64,api.pinata.cloud=8"
+    sizes = {}
+    for item in (value or "").split(","):
+        if item.strip():
+            host, size = item.split("=")
+            sizes[host.strip()] = int(size)
+    return sizes
+
+
+# Shared by every storage client in the process that is not given its own transport
+default_transport = HTTPTransport(
+    pool_maxsize=int(os.getenv("ZEROKDB_HTTP_POOL_SIZE", "32")),
+    host_pool_sizes=_host_pool_sizes(os.getenv("ZEROKDB_HTTP_HOST_POOL_SIZES")),
+    connect_timeout=float(os.getenv("ZEROKDB_HTTP_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("ZEROKDB_HTTP_READ_TIMEOUT", "60")),
+    http2=os.getenv("ZEROKDB_HTTP2", "").lower() in ("1", "true", "yes"),
+)
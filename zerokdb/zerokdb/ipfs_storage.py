@@ -1,16 +1,32 @@
 import json
-from typing import Optional, Dict, Any, TypedDict, Union, List, Literal
-import hashlib
-import requests
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, TypedDict, Union, List, Literal, Iterator, Tuple
 from tenacity import retry, wait_exponential
 import time
 
+from zerokdb.block_store import BlockStore, PinataBlockStore
+from zerokdb.chunk_cache import ChunkCache, chunk_hash
+from zerokdb.chunk_cache import chunk_cache as shared_chunk_cache
+from zerokdb.http_transport import HTTPTransport, default_transport
+from zerokdb.chunk_format import (
+    CHUNK_FORMATS,
+    compress,
+    decode_document,
+    encode_chunk,
+    json_default,
+    resolve_compression,
+)
+
 
 class TableData(TypedDict):
     columns: List[str]
     column_types: Dict[
-        str, Literal["int", "float", "bool", "string", "datetime", "list[float]"]
+        str,
+        Literal["int", "float", "bool", "string", "datetime", "list[float]", "vector"],
     ]
+    # Vector values are stored as base64 of their packed little-endian float32 bytes
     rows: List[List[Union[int, str]]]
     indexes: Dict[str, Any]
 
@@ -21,46 +37,147 @@ class CIDSequence(TypedDict):
     latest_chunk: Optional[str]
 
 
+# Upper bounds for the snapshot chunks written by compaction
+DEFAULT_SNAPSHOT_ROWS = 50000
+DEFAULT_SNAPSHOT_BYTES = 8 << 20
+
+# "flat" sequences list every chunk in one document; "paged" sequences keep
+# the chunk entries in a tree of small pages so an append rewrites O(log n) of them
+SEQUENCE_FORMATS = ("flat", "paged")
+DEFAULT_SEQUENCE_FANOUT = 64
+# Keys of a paged sequence's root document that describe the page tree
+PAGE_TREE_KEYS = ("sequence_format", "fanout", "height", "root", "count", "delta_count", "delta_bytes")
+
+
+def _snapshot_chunks(
+    table_name: str, table: TableData, max_rows: int, max_bytes: int
+) -> Iterator[Tuple[Dict[str, TableData], bool]]:
+    """
+    Split a merged table into single-table chunks of at most `max_rows` rows
+    and roughly `max_bytes` bytes of JSON, each with whether it is full (every
+    chunk but the last). Only the first chunk carries the table's indexes.
+    """
+    metadata = {key: value for key, value in table.items() if key not in ("rows", "indexes")}
+    indexes = table.get("indexes") or {}
+    rows: List[Any] = []
+    size = 0
+    for row in table.get("rows", []):
+        row_size = len(json.dumps(row, default=json_default))
+        if rows and (len(rows) >= max_rows or size + row_size > max_bytes):
+            yield {table_name: {**metadata, "rows": rows, "indexes": indexes}}, True
+            indexes = {}
+            rows, size = [], 0
+        rows.append(row)
+        size += row_size
+    if rows or indexes:
+        yield {table_name: {**metadata, "rows": rows, "indexes": indexes}}, False
+
+
 class IPFSStorage:
-    def __init__(self, pinata_api_key):
+    def __init__(
+        self,
+        pinata_api_key,
+        chunk_cache: Optional[ChunkCache] = None,
+        download_workers: int = 16,
+        gateway_concurrency: int = 8,
+        chunk_format: str = "json",
+        compression: Optional[str] = None,
+        transport: Optional[HTTPTransport] = None,
+        block_store: Optional[BlockStore] = None,
+        sequence_format: str = "paged",
+        sequence_fanout: int = DEFAULT_SEQUENCE_FANOUT,
+        page_cache_size: int = 4096,
+    ):
+        if chunk_format not in CHUNK_FORMATS:
+            raise ValueError(f"Unknown chunk format: {chunk_format}")
+        if sequence_format not in SEQUENCE_FORMATS:
+            raise ValueError(f"Unknown sequence format: {sequence_format}")
+        if sequence_fanout < 2:
+            raise ValueError("Sequence fanout must be at least 2")
         self.pinata_api_key = pinata_api_key
+        # Pooled connections to Pinata and the gateway, shared process-wide by default
+        self.transport = transport or default_transport
+        # Where chunks and sequences are kept; Pinata unless another block store is given
+        self.block_store = block_store or PinataBlockStore(
+            pinata_api_key, transport=self.transport, gateway_concurrency=gateway_concurrency
+        )
         self.cid: Optional[str] = None  # This will hold the latest data chunk CID
+        # CIDs are immutable, so documents read once can be served from disk
+        self.chunk_cache = chunk_cache if chunk_cache is not None else shared_chunk_cache
+        # Chunks fetched concurrently by downloads, and requests allowed per gateway host
+        self.download_workers = download_workers
+        self.gateway_concurrency = gateway_concurrency
+        # Format of the data chunks written by this instance; both formats are always readable
+        self.chunk_format = chunk_format
+        # Codec for the chunks and sequences written by this instance (None, "zstd", "zlib", "lzma" or "auto")
+        self.compression = resolve_compression(compression)
+        # Format of new sequences; sequences already paged stay paged, and flat ones
+        # are paged on their next append when this is "paged"
+        self.sequence_format = sequence_format
+        self.sequence_fanout = sequence_fanout
+        # Decoded sequence pages by CID; the right spine of a sequence is reread on every append
+        self.page_cache_size = page_cache_size
+        self._pages: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pages_lock = threading.Lock()
 
     def save(self, data: Dict[str, TableData]) -> str:
         """
-        Save data to IPFS using Pinata SDK and return the CID.
+        Save data as JSON to the block store and return the CID.
         """
-        url = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
-        headers = {
-            "Authorization": f"Bearer {self.pinata_api_key}",
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "pinataOptions": {"cidVersion": 1},
-            "pinataMetadata": {"name": "table"},
-            "pinataContent": data,
-        }
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code == 200:
-            return response.json()["IpfsHash"]
-        else:
-            response.raise_for_status()
+        return self.block_store.put_json(data)
 
-    @retry(wait=wait_exponential(min=4, max=10))
-    def read_from_ipfs_pinata(self, cid: str) -> Dict[str, Any]:
+    def save_bytes(self, content: bytes, name: str = "table") -> str:
         """
-        Utility function to read data from IPFS using Pinata.
+        Save raw bytes to the block store and return the CID.
         """
-        url = f"https://gateway.pinata.cloud/ipfs/{cid}"
-        headers = {
-            "Authorization": f"Bearer {self.pinata_api_key}",
-            "Content-Type": "application/json",
-        }
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            return response.json()
+        return self.block_store.put(content, name)
+
+    def has(self, cid: str) -> bool:
+        return self.block_store.has(cid)
+
+    def save_chunk(self, chunk: Dict[str, TableData]) -> Tuple[str, int]:
+        """
+        Save a data chunk in this storage's chunk format and compression, and
+        return its CID and stored size in bytes.
+        """
+        if self.chunk_format == "columnar":
+            content = encode_chunk(chunk)
         else:
-            response.raise_for_status()
+            content = json.dumps(chunk, default=json_default).encode("utf-8")
+        if self.compression:
+            content = compress(content, self.compression)
+        elif self.chunk_format == "json":
+            return self.save(chunk), len(content)
+        return self.save_bytes(content), len(content)
+
+    def save_sequence(self, sequence: CIDSequence) -> str:
+        """
+        Save a CID sequence, compressed when this instance compresses its writes.
+        """
+        if self.compression:
+            content = json.dumps(sequence).encode("utf-8")
+            return self.save_bytes(compress(content, self.compression), name="sequence")
+        return self.save(sequence)
+
+    def read_from_ipfs_pinata(self, cid: str, expected_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Utility function to read data from IPFS using Pinata, through the local chunk cache.
+        """
+        if self.chunk_cache is not None:
+            content = self.chunk_cache.get(cid)
+            if content is not None:
+                return decode_document(content)
+        content = self.read_from_ipfs_pinata_raw(cid)
+        if self.chunk_cache is not None:
+            if not self.chunk_cache.put(cid, content, expected_hash):
+                print(f"Chunk {cid} does not match its chunk hash, not caching it")
+        return decode_document(content)
+
+    def read_from_ipfs_pinata_raw(self, cid: str) -> bytes:
+        """
+        Read the raw bytes of a CID from the block store.
+        """
+        return self.block_store.get(cid)
 
     @retry(wait=wait_exponential(min=4, max=10))
     def read_from_ipfs_raw(self, cid: str) -> bytes:
@@ -71,13 +188,13 @@ class IPFSStorage:
         gateway_url = f"https://ipfs.io/ipfs/{cid}"
 
         # Fetch the file
-        response = requests.get(gateway_url)
+        response = self.transport.get(gateway_url)
         if response.status_code == 200:
             return response.json()
         else:
             response.raise_for_status()
 
-    def load(self, cid: Optional[str] = None) -> Dict[str, TableData]:
+    def load(self, cid: Optional[str] = None, expected_hash: Optional[str] = None) -> Dict[str, TableData]:
         """
         Load data from IPFS using a given CID or the stored CID.
         """
@@ -86,67 +203,107 @@ class IPFSStorage:
         if not self.cid:
             return {}
         # Use Pinata to retrieve data from IPFS using CID
-        return self.read_from_ipfs_pinata(self.cid)
+        return self.read_from_ipfs_pinata(self.cid, expected_hash)
 
     def append_data(self, new_data: Dict[str, TableData], cid_sequence: str) -> str:
         """
         Append new data to IPFS and update the CID sequence.
         """
+        chunk_cids, cid_sequence_cid = self.append_chunks([new_data], cid_sequence)
+        return chunk_cids[0], cid_sequence_cid
+
+    def append_chunks(
+        self, chunks: List[Dict[str, TableData]], cid_sequence: str
+    ) -> Tuple[List[str], str]:
+        """
+        Append several chunks to IPFS, in order, with a single update of the CID
+        sequence. The chunks are pinned concurrently.
+
+        Returns the chunk CIDs and the CID of the updated sequence.
+        """
         start = time.time()
-        # Step 1: Retrieve the current CID sequence from IPFS
-        current_sequence = self.load_sequence(cid_sequence)
+        if not chunks:
+            raise ValueError("No chunks to append")
+        # Step 1: Retrieve the current CID sequence from IPFS (only its root for paged sequences)
+        current_sequence = self.load_sequence_root(cid_sequence)
         print(f"Loaded CID sequence in {time.time() - start} seconds")
-        # Step 2: Create a new chunk with the new data and a reference to the previous chunk
-        chunk = new_data
-
-        # Step 3: Compute the hash of the chunk's data (excluding the next reference)
-        chunk_hash_data = json.dumps(new_data).encode(
-            "utf-8"
-        )  # Hash only the 'data' part
-        chunk_hash = hashlib.sha256(chunk_hash_data).hexdigest()
-        print(f"Computed chunk hash in {time.time() - start} seconds")
-        # Step 4: Save the new chunk to IPFS using Pinata and get the new CID
-        new_cid = self.save(chunk)
-        print(f"Saved new chunk in {time.time() - start} seconds")
-        # Step 5: Update the sequence with the new chunk details
-        chunk_entry = {"chunk_id": new_cid, "chunk_hash": chunk_hash}
-        current_sequence["default_sequence"].append(chunk_entry)
-
-        # Step 5: Track the chunk history (versions of this chunk)
-        existing_chunk = next(
-            (
-                item
-                for item in current_sequence["chunk_history"]
-                if item["chunk_id"] == new_cid
-            ),
-            None,
-        )
 
-        if existing_chunk:
-            # Update existing chunk history with the new version
-            existing_chunk["versions"].append(new_cid)
+        # Step 2: Compute the hash of each chunk's data
+        chunk_hashes = [chunk_hash(chunk) for chunk in chunks]
+        print(f"Computed chunk hashes in {time.time() - start} seconds")
+        # Step 3: Save the new chunks to IPFS using Pinata and get their CIDs
+        if len(chunks) > 1 and self.download_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.download_workers, len(chunks))) as executor:
+                saved = list(executor.map(self.save_chunk, chunks))
         else:
-            # Create new entry in the chunk history
-            current_sequence["chunk_history"].append(
-                {"chunk_id": new_cid, "versions": [new_cid]}
-            )
-
-        # Step 6: Update the latest chunk CID
-        current_sequence["latest_chunk"] = new_cid
-
-        # Step 7: Save the updated CID sequence to IPFS and store its CID
-        cid_sequence_cid = self.save(current_sequence)
+            saved = [self.save_chunk(chunk) for chunk in chunks]
+        print(f"Saved {len(chunks)} new chunks in {time.time() - start} seconds")
+
+        # Step 4: Update the sequence with the new chunk details
+        # The size lets compaction thresholds be checked without downloading chunks
+        chunk_entries = []
+        for (new_cid, chunk_size), new_chunk_hash in zip(saved, chunk_hashes):
+            chunk_entry = {"chunk_id": new_cid, "chunk_hash": new_chunk_hash, "size": chunk_size}
+            if self.compression:
+                chunk_entry["compression"] = self.compression
+            chunk_entries.append(chunk_entry)
+        chunk_cids = [chunk_entry["chunk_id"] for chunk_entry in chunk_entries]
+
+        if self.is_paged(current_sequence) or self.sequence_format == "paged":
+            if not self.is_paged(current_sequence):
+                current_sequence = self._build_pages(
+                    current_sequence["default_sequence"], current_sequence.get("compacted_from")
+                )
+            # Only the pages on the path to the last entry are rewritten
+            updated_sequence = self._append_to_pages(current_sequence, chunk_entries)
+        else:
+            updated_sequence = current_sequence
+            updated_sequence["default_sequence"].extend(chunk_entries)
+            # Track the chunk history (versions of each chunk)
+            history = {item["chunk_id"]: item for item in updated_sequence["chunk_history"]}
+            for new_cid in chunk_cids:
+                if new_cid in history:
+                    # Update existing chunk history with the new version
+                    history[new_cid]["versions"].append(new_cid)
+                else:
+                    # Create new entry in the chunk history
+                    history[new_cid] = {"chunk_id": new_cid, "versions": [new_cid]}
+                    updated_sequence["chunk_history"].append(history[new_cid])
+            # Update the latest chunk CID
+            updated_sequence["latest_chunk"] = chunk_cids[-1]
+
+        # Step 5: Save the updated CID sequence to IPFS and store its CID
+        cid_sequence_cid = self.save_sequence(updated_sequence)
         print(f"Saved updated CID sequence in {time.time() - start} seconds")
-        print(f"New chunk CID: {new_cid}")
+        print(f"New chunk CIDs: {chunk_cids}")
         print(f"Updated CID sequence CID: {cid_sequence_cid}")
 
-        return new_cid, cid_sequence_cid
+        return chunk_cids, cid_sequence_cid
 
     def load_sequence(self, cid_sequence: str) -> CIDSequence:
         """
         Load the CID sequence from IPFS. If no sequence exists, return a default structure.
+
+        Paged sequences are returned as the flat structure, with every page read.
+        """
+        sequence = self.load_sequence_root(cid_sequence)
+        if not self.is_paged(sequence):
+            return sequence
+        flat = {key: value for key, value in sequence.items() if key not in PAGE_TREE_KEYS}
+        flat["default_sequence"] = self._sequence_entries(sequence)
+        flat["chunk_history"] = [
+            {"chunk_id": entry["chunk_id"], "versions": [entry["chunk_id"]]} for entry in flat["default_sequence"]
+        ]
+        return flat
+
+    def load_sequence_root(self, cid_sequence: str) -> Dict[str, Any]:
+        """
+        Load the document a sequence CID points to: the whole sequence when it is
+        flat, or the root of its page tree when it is paged.
         """
         if cid_sequence == "0x0":
+            if self.sequence_format == "paged":
+                return self._build_pages([])
             # Return a default CID sequence structure
             return {
                 "default_sequence": [],
@@ -154,8 +311,283 @@ class IPFSStorage:
                 "latest_chunk": None,
             }
         # Load the current CID sequence using the utility function
-        sequence_data: CIDSequence = self.read_from_ipfs_pinata(cid_sequence)
-        return sequence_data
+        return self.read_from_ipfs_pinata(cid_sequence)
+
+    def sequence_entries(self, cid_sequence: str, start: int = 0) -> List[Dict[str, Any]]:
+        """
+        Return the chunk entries of a sequence from position `start` on. Pages
+        holding only earlier entries are not read.
+        """
+        return self._sequence_entries(self.load_sequence_root(cid_sequence), start)
+
+    @staticmethod
+    def is_paged(sequence: Dict[str, Any]) -> bool:
+        return sequence.get("sequence_format") == "paged"
+
+    def _sequence_entries(self, sequence: Dict[str, Any], start: int = 0) -> List[Dict[str, Any]]:
+        if not self.is_paged(sequence):
+            return sequence.get("default_sequence", [])[start:]
+        if sequence["root"] is None or start >= sequence["count"]:
+            return []
+        fanout = sequence["fanout"]
+        # Walk down one level at a time, reading each level's pages in parallel
+        nodes = [(sequence["root"], 0)]
+        for level in range(sequence["height"], 0, -1):
+            span = fanout ** level
+            pages = self._read_pages([cid for cid, _ in nodes])
+            nodes = [
+                (child, first + i * span)
+                for (_, first), page in zip(nodes, pages)
+                for i, child in enumerate(page["children"])
+                if first + (i + 1) * span > start
+            ]
+        leaves = self._read_pages([cid for cid, _ in nodes])
+        entries = [entry for leaf in leaves for entry in leaf["entries"]]
+        return entries[max(start - nodes[0][1], 0):]
+
+    def _read_pages(self, cids: List[str]) -> List[Dict[str, Any]]:
+        with self._pages_lock:
+            pages = {cid: self._pages[cid] for cid in cids if cid in self._pages}
+        missing = list(dict.fromkeys(cid for cid in cids if cid not in pages))
+        if len(missing) > 1 and self.download_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.download_workers, len(missing))) as executor:
+                fetched = list(executor.map(self.read_from_ipfs_pinata, missing))
+        else:
+            fetched = [self.read_from_ipfs_pinata(cid) for cid in missing]
+        for cid, page in zip(missing, fetched):
+            self._cache_page(cid, page)
+            pages[cid] = page
+        return [pages[cid] for cid in cids]
+
+    def _cache_page(self, cid: str, page: Dict[str, Any]):
+        with self._pages_lock:
+            self._pages[cid] = page
+            self._pages.move_to_end(cid)
+            while len(self._pages) > self.page_cache_size:
+                self._pages.popitem(last=False)
+
+    def _save_page(self, page: Dict[str, Any]) -> str:
+        cid = self.save_sequence(page)
+        self._cache_page(cid, page)
+        return cid
+
+    def _build_pages(self, entries: List[Dict[str, Any]], compacted_from: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Write the page tree of a sequence with the given entries bottom-up and
+        return its (unsaved) root document.
+
+        Leaves hold up to `fanout` entries and every other page up to `fanout`
+        children. All subtrees but the last are full, so a page at height h
+        covers fanout ** (h + 1) entries and positions need no stored counts.
+        """
+        fanout = self.sequence_fanout
+        delta = self._delta_entries({"default_sequence": entries})
+        sequence = {
+            "sequence_format": "paged",
+            "fanout": fanout,
+            "height": 0,
+            "root": None,
+            "count": len(entries),
+            "latest_chunk": entries[-1]["chunk_id"] if entries else None,
+            "delta_count": len(delta),
+            "delta_bytes": sum(entry.get("size", 0) for entry in delta),
+        }
+        if compacted_from:
+            sequence["compacted_from"] = compacted_from
+        if not entries:
+            return sequence
+        cids = [self._save_page({"entries": entries[i:i + fanout]}) for i in range(0, len(entries), fanout)]
+        while len(cids) > 1:
+            cids = [self._save_page({"children": cids[i:i + fanout]}) for i in range(0, len(cids), fanout)]
+            sequence["height"] += 1
+        sequence["root"] = cids[0]
+        return sequence
+
+    def _append_to_pages(self, sequence: Dict[str, Any], entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Append entries to a paged sequence by rewriting the pages on its right
+        spine, each once however many entries are appended, and return the new
+        (unsaved) root document.
+        """
+        if not entries:
+            return sequence
+        sequence = dict(sequence)
+        fanout = sequence["fanout"]
+        for entry in entries:
+            if not (entry.get("snapshot") and sequence["delta_count"] == 0):
+                sequence["delta_count"] += 1
+                sequence["delta_bytes"] += entry.get("size", 0)
+        sequence["count"] += len(entries)
+        sequence["latest_chunk"] = entries[-1]["chunk_id"]
+
+        if sequence["root"] is None:
+            spine = []
+            items = list(entries)
+        else:
+            # The last page of every level, from the root down to the last leaf
+            spine = self._read_pages([sequence["root"]])
+            for _ in range(sequence["height"]):
+                spine += self._read_pages([spine[-1]["children"][-1]])
+            spine.reverse()
+            leaf = spine[0]["entries"]
+            # A full last leaf is kept, and the entries start a new one
+            replaces_last = len(leaf) < fanout
+            items = (leaf if replaces_last else []) + list(entries)
+
+        # Fill the open page of each level first, then new pages, bottom-up
+        cids = [self._save_page({"entries": items[i:i + fanout]}) for i in range(0, len(items), fanout)]
+        for page in spine[1:]:
+            children = page["children"][:-1] if replaces_last else page["children"]
+            replaces_last = len(children) < fanout
+            items = (children if replaces_last else []) + cids
+            cids = [self._save_page({"children": items[i:i + fanout]}) for i in range(0, len(items), fanout)]
+        height = len(spine) - 1 if spine else 0
+        if spine and not replaces_last:
+            # The old root was full: it becomes the first child of a new one
+            cids = [sequence["root"]] + cids
+            cids = [self._save_page({"children": cids[i:i + fanout]}) for i in range(0, len(cids), fanout)]
+            height += 1
+        while len(cids) > 1:
+            cids = [self._save_page({"children": cids[i:i + fanout]}) for i in range(0, len(cids), fanout)]
+            height += 1
+        sequence["root"] = cids[0]
+        sequence["height"] = height
+        return sequence
+
+    @staticmethod
+    def _delta_entries(sequence: CIDSequence) -> List[Dict[str, Any]]:
+        entries = sequence.get("default_sequence", [])
+        snapshots = 0
+        while snapshots < len(entries) and entries[snapshots].get("snapshot"):
+            snapshots += 1
+        return entries[snapshots:]
+
+    @staticmethod
+    def _refold_start(entries: List[Dict[str, Any]], snapshots: int) -> int:
+        """
+        Return where the snapshots folded again with the delta start: at the
+        first under-full one, so that a table keeps a single partial snapshot.
+        Snapshots written before fullness was recorded count as full, except
+        the last one.
+        """
+        for i in range(snapshots):
+            if not entries[i].get("full", i < snapshots - 1):
+                return i
+        return snapshots
+
+    def needs_compaction(
+        self, sequence: CIDSequence, max_chunks: int, max_delta_bytes: Optional[int] = None
+    ) -> bool:
+        """
+        Whether the chunks appended since the last compaction exceed either threshold.
+
+        The root of a paged sequence keeps these totals, so no pages are read.
+        """
+        if self.is_paged(sequence):
+            delta_count, delta_bytes = sequence["delta_count"], sequence["delta_bytes"]
+        else:
+            delta = self._delta_entries(sequence)
+            delta_count, delta_bytes = len(delta), sum(entry.get("size", 0) for entry in delta)
+        if delta_count > max_chunks:
+            return True
+        if max_delta_bytes is not None and delta_count > 1:
+            return delta_bytes > max_delta_bytes
+        return False
+
+    def compact(
+        self,
+        cid_sequence: str,
+        max_chunk_rows: int = DEFAULT_SNAPSHOT_ROWS,
+        max_chunk_bytes: int = DEFAULT_SNAPSHOT_BYTES,
+        sequence: Optional[CIDSequence] = None,
+    ) -> Tuple[str, List[str]]:
+        """
+        Fold the chunks appended since the last compaction, together with the
+        under-full snapshots before them, into size-bounded snapshot chunks and
+        save a new CID sequence that lists them in their place. A sequence so
+        stays at its full snapshots plus one partial one per table. The folded
+        chunks stay pinned and in `chunk_history`, and the new sequence
+        records the one it was compacted from.
+
+        Returns the new sequence CID and the snapshot chunk CIDs; when there is
+        nothing to fold the sequence is returned unchanged.
+
+        A paged sequence is compacted into a new page tree; the folded chunks
+        stay reachable through `compacted_from`.
+        """
+        if sequence is None:
+            sequence = self.load_sequence_root(cid_sequence)
+        if self.is_paged(sequence) and sequence["delta_count"] <= 1:
+            return cid_sequence, []
+        entries = self._sequence_entries(sequence)
+        delta = self._delta_entries({"default_sequence": entries})
+        if len(delta) <= 1:
+            return cid_sequence, []
+        kept = self._refold_start(entries, len(entries) - len(delta))
+        folded = entries[kept:]
+
+        merged = self.download_chunks(
+            [entry["chunk_id"] for entry in folded],
+            {entry["chunk_id"]: entry.get("chunk_hash") for entry in folded},
+        )
+        snapshot_entries = []
+        for table_name, table in merged.items():
+            for chunk, full in _snapshot_chunks(table_name, table, max_chunk_rows, max_chunk_bytes):
+                chunk_cid, size = self.save_chunk(chunk)
+                entry = {
+                    "chunk_id": chunk_cid,
+                    "chunk_hash": chunk_hash(chunk),
+                    "size": size,
+                    "snapshot": True,
+                    "full": full,
+                }
+                if self.compression:
+                    entry["compression"] = self.compression
+                snapshot_entries.append(entry)
+
+        chunk_cids = [entry["chunk_id"] for entry in snapshot_entries]
+        if self.is_paged(sequence):
+            compacted = self._build_pages(entries[:kept] + snapshot_entries, cid_sequence)
+            new_sequence_cid = self.save_sequence(compacted)
+            print(f"Compacted {len(folded)} chunks into {len(chunk_cids)} snapshot chunks")
+            return new_sequence_cid, chunk_cids
+
+        compacted = dict(sequence)
+        compacted["default_sequence"] = entries[:kept] + snapshot_entries
+        compacted["chunk_history"] = list(sequence.get("chunk_history", [])) + [
+            {"chunk_id": chunk_cid, "versions": [chunk_cid]} for chunk_cid in chunk_cids
+        ]
+        if chunk_cids:
+            compacted["latest_chunk"] = chunk_cids[-1]
+        compacted["compacted_from"] = cid_sequence
+        new_sequence_cid = self.save_sequence(compacted)
+        print(f"Compacted {len(folded)} chunks into {len(chunk_cids)} snapshot chunks")
+        return new_sequence_cid, chunk_cids
+
+    def rebase_sequence(self, compacted_cid: str, base_cid: str, latest_cid: str) -> str:
+        """
+        Carry chunks appended to `base_cid` while it was being compacted over to
+        the compacted sequence, and return the CID of the result.
+        """
+        base = self.sequence_entries(base_cid)
+        latest_entries = self.sequence_entries(latest_cid)
+        if [entry["chunk_id"] for entry in latest_entries[: len(base)]] != [
+            entry["chunk_id"] for entry in base
+        ]:
+            raise ValueError(f"Sequence {latest_cid} does not extend {base_cid}")
+        appended = latest_entries[len(base):]
+        if not appended:
+            return compacted_cid
+
+        rebased = self.load_sequence_root(compacted_cid)
+        if self.is_paged(rebased):
+            return self.save_sequence(self._append_to_pages(rebased, appended))
+        rebased["default_sequence"] = rebased["default_sequence"] + appended
+        rebased["chunk_history"] = rebased["chunk_history"] + [
+            {"chunk_id": entry["chunk_id"], "versions": [entry["chunk_id"]]} for entry in appended
+        ]
+        rebased["latest_chunk"] = appended[-1]["chunk_id"]
+        return self.save_sequence(rebased)
 
     def get_cid_sequence(self, cid_sequence: str) -> CIDSequence:
         """
@@ -190,11 +622,91 @@ class IPFSStorage:
         """
         Download all chunks into a single JSON where the rows are the union of all rows.
         """
-        sequence: CIDSequence = self.load_sequence(cid_sequence)
+        entries = self.sequence_entries(cid_sequence)
+        return self.download_chunks(
+            [chunk_entry["chunk_id"] for chunk_entry in entries],
+            {chunk_entry["chunk_id"]: chunk_entry.get("chunk_hash") for chunk_entry in entries},
+        )
+
+    def stream_chunks(
+        self, chunk_ids: List[str], chunk_hashes: Optional[Dict[str, str]] = None
+    ) -> Iterator[Dict[str, TableData]]:
+        """
+        Yield the given chunks in order while up to `download_workers` of the
+        following chunks download in the background.
+        """
+        chunk_hashes = chunk_hashes or {}
+        if len(chunk_ids) <= 1 or self.download_workers <= 1:
+            for chunk_id in chunk_ids:
+                yield self.read_from_ipfs_pinata(chunk_id, chunk_hashes.get(chunk_id))
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.download_workers)
+        pending = deque()
+        remaining = iter(chunk_ids)
+        try:
+            # Keep a bounded window of downloads ahead of the consumer
+            for chunk_id in remaining:
+                pending.append(
+                    executor.submit(self.read_from_ipfs_pinata, chunk_id, chunk_hashes.get(chunk_id))
+                )
+                if len(pending) >= 2 * self.download_workers:
+                    break
+            while pending:
+                chunk = pending.popleft().result()
+                next_chunk_id = next(remaining, None)
+                if next_chunk_id is not None:
+                    pending.append(
+                        executor.submit(
+                            self.read_from_ipfs_pinata, next_chunk_id, chunk_hashes.get(next_chunk_id)
+                        )
+                    )
+                yield chunk
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def stream_table(
+        self, table_name: str, chunk_ids: List[str], chunk_hashes: Optional[Dict[str, str]] = None
+    ) -> Optional[TableData]:
+        """
+        Return a table's metadata with `rows` as an iterator over the merged rows
+        of the given chunks, in sequence order, so callers can consume rows while
+        later chunks are still downloading. Indexes published by later chunks are
+        merged into `indexes` as the rows are consumed.
+        """
+        chunks = self.stream_chunks(chunk_ids, chunk_hashes)
+        for chunk in chunks:
+            if table_name in chunk:
+                first = chunk[table_name]
+                break
+        else:
+            return None
+
+        table = {key: value for key, value in first.items() if key != "rows"}
+        table["indexes"] = dict(first.get("indexes") or {})
+
+        def rows():
+            yield from first.get("rows", [])
+            for chunk in chunks:
+                chunk_table = chunk.get(table_name)
+                if chunk_table:
+                    table["indexes"].update(chunk_table.get("indexes") or {})
+                    yield from chunk_table.get("rows", [])
+
+        table["rows"] = rows()
+        return table
+
+    def download_chunks(
+        self, chunk_ids: List[str], chunk_hashes: Optional[Dict[str, str]] = None
+    ) -> Dict[str, TableData]:
+        """
+        Download the given chunks into a single JSON where the rows are the union of their rows.
+        """
         merged_data: Dict[str, TableData] = {}
 
-        for chunk_entry in sequence.get("default_sequence", []):
-            chunk = self.load(chunk_entry["chunk_id"])
+        for chunk in self.stream_chunks(chunk_ids, chunk_hashes):
             for table_key in chunk.keys():
                 table = chunk.get(table_key, {})
                 if merged_data.get(table_key, None) is None:
@@ -206,6 +718,10 @@ class IPFSStorage:
 
                 # Extend the rows with the current chunk's rows
                 merged_data[table_key]["rows"].extend(table.get("rows", []))
+                # Later chunks may publish new or rebuilt indexes for the table
+                merged_data[table_key].setdefault("indexes", {}).update(
+                    table.get("indexes") or {}
+                )
 
         return merged_data
 
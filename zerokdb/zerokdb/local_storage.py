@@ -1,46 +1,67 @@
 import json
 import hashlib
 import os
-
-
-class LocalStorage:
-    def __init__(self, storage_dir="storage"):
-        # Create a directory to store the data locally
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from zerokdb.block_store import BlockStore, DirectoryBlockStore
+from zerokdb.chunk_format import json_default
+from zerokdb.ipfs_storage import DEFAULT_SEQUENCE_FANOUT, CIDSequence, IPFSStorage
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class LocalStorage(IPFSStorage):
+    """
+    IPFSStorage chunks and CID sequences (appends, streaming downloads,
+    compaction, formats and compression) kept in a local directory, or in
+    any other block store such as a MemoryBlockStore.
+    """
+
+    def __init__(
+        self,
+        storage_dir="storage",
+        chunk_format="json",
+        compression: Optional[str] = None,
+        block_store: Optional[BlockStore] = None,
+        download_workers: int = 1,
+        sequence_format: str = "paged",
+        sequence_fanout: int = DEFAULT_SEQUENCE_FANOUT,
+    ):
+        super().__init__(
+            pinata_api_key=None,
+            download_workers=download_workers,
+            chunk_format=chunk_format,
+            compression=compression,
+            block_store=block_store or DirectoryBlockStore(storage_dir),
+            sequence_format=sequence_format,
+            sequence_fanout=sequence_fanout,
+        )
         self.storage_dir = storage_dir
-        os.makedirs(self.storage_dir, exist_ok=True)
-        self.cid = None  # This will hold the latest data chunk CID
+        # Blocks are already local, so they are not cached a second time
+        self.chunk_cache = None
         self.cid_sequence_cid = None  # This will hold the CID of the sequence list
 
-    def save(self, data):
+    def append_data(self, new_data, cid_sequence: Optional[str] = None):
         """
-        Save data locally to a file and return the file name as the "CID".
+        Append new data to a CID sequence, by default the one last used by this instance.
         """
-        # Compute a file name based on the hash of the data
-        json_data = json.dumps(data)
-        data_hash = hashlib.sha256(json_data.encode("utf-8")).hexdigest()
-        file_name = f"{data_hash}.json"
-        file_path = os.path.join(self.storage_dir, file_name)
-
-        # Save the JSON data to the file
-        with open(file_path, "w") as file:
-            file.write(json_data)
+        return super().append_data(new_data, cid_sequence)
 
-        return file_name  # Return the file name as the "CID"
-
-    def load(self, cid=None):
+    def append_chunks(self, chunks, cid_sequence: Optional[str] = None):
         """
-        Load data from a local file using a given "CID" (file name) or the stored CID.
+        Append several chunks to a CID sequence with a single sequence update, by
+        default to the one last used by this instance.
         """
-        if cid:
-            self.cid = cid
-        if not self.cid:
-            return {}
-        # Load data from the file
-        file_path = os.path.join(self.storage_dir, self.cid)
-        if os.path.exists(file_path):
-            with open(file_path, "r") as file:
-                return json.load(file)
-        return {}
+        chunk_cids, cid_sequence_cid = super().append_chunks(chunks, cid_sequence or self.cid_sequence_cid or "0x0")
+        self.cid = chunk_cids[-1]
+        self.cid_sequence_cid = cid_sequence_cid
+        return chunk_cids, cid_sequence_cid
 
     def append_linked_data(self, new_data):
         """
@@ -54,14 +75,17 @@ class LocalStorage:
             "data": new_data,
             "next": self.cid,  # Point to the previous chunk (the last saved one)
         }
+        if self.chunk_format != "json":
+            # The data is stored in its own block; the link only references it
+            chunk = {"data_cid": self.save_chunk(new_data)[0], "next": self.cid}
 
         # Step 3: Compute the hash of the chunk's data (excluding the next reference)
-        chunk_hash_data = json.dumps(new_data).encode(
+        chunk_hash_data = json.dumps(new_data, default=json_default).encode(
             "utf-8"
         )  # Hash only the 'data' part
         chunk_hash = hashlib.sha256(chunk_hash_data).hexdigest()
 
-        # Step 4: Save the new chunk to local storage and get the new CID (file name)
+        # Step 4: Save the new chunk to local storage and get the new CID
         new_cid = self.save(chunk)
 
         # Step 5: Update the sequence with the new chunk details
@@ -90,7 +114,7 @@ class LocalStorage:
         # Step 7: Update the latest chunk CID
         current_sequence["latest_chunk"] = new_cid
 
-        # Step 8: Save the updated CID sequence locally as a new file and get its CID
+        # Step 8: Save the updated CID sequence locally and get its CID
         self.cid_sequence_cid = self.save_sequence(current_sequence)
 
         print(f"New chunk CID: {new_cid}")
@@ -98,40 +122,16 @@ class LocalStorage:
 
         return new_cid
 
-    def load_sequence(self, cid=None):
+    def load_sequence(self, cid_sequence: Optional[str] = None) -> CIDSequence:
         """
-        Load the CID sequence from a local file. If no sequence exists, return a default structure.
+        Load a CID sequence, by default the one last used by this instance. If no
+        sequence exists, return a default structure.
         """
-        if cid:
-            self.cid_sequence_cid = cid
-
-        if not self.cid_sequence_cid or not os.path.exists(
-            os.path.join(self.storage_dir, self.cid_sequence_cid)
-        ):
-            # Return default structure if no sequence exists
+        if cid_sequence:
+            self.cid_sequence_cid = cid_sequence
+        if not self.cid_sequence_cid:
             return {"default_sequence": [], "chunk_history": [], "latest_chunk": None}
-
-        # Load the current CID sequence from the local file
-        with open(os.path.join(self.storage_dir, self.cid_sequence_cid), "r") as file:
-            return json.load(file)
-
-    def save_sequence(self, sequence):
-        """
-        Save the CID sequence to a new local file and return the new file name as the CID.
-        """
-        # Convert sequence to JSON
-        json_sequence = json.dumps(sequence)
-
-        # Hash the sequence to create a unique file name
-        sequence_hash = hashlib.sha256(json_sequence.encode("utf-8")).hexdigest()
-        sequence_file_name = f"{sequence_hash}.json"
-        sequence_file_path = os.path.join(self.storage_dir, sequence_file_name)
-
-        # Save the sequence to the new file
-        with open(sequence_file_path, "w") as file:
-            file.write(json_sequence)
-
-        return sequence_file_name
+        return super().load_sequence(self.cid_sequence_cid)
 
     def traverse_linked_data(self, start_cid=None):
         """
@@ -148,18 +148,115 @@ class LocalStorage:
             chunk = self.load(current_cid)
 
             # Add the current chunk's data to the list
-            all_data.append(chunk["data"])
+            all_data.append(chunk["data"] if "data" in chunk else self.load(chunk["data_cid"]))
 
             # Move to the next chunk
             current_cid = chunk.get("next")
 
         return all_data
 
-    def get_cid_sequence(self):
+    def get_cid_sequence(self, cid_sequence: Optional[str] = None) -> CIDSequence:
         """
-        Return the stored sequence of CIDs from the local file.
+        Return the stored sequence of CIDs.
         """
-        return self.load_sequence()
+        return self.load_sequence(cid_sequence)
+
+
+class LocalSequenceService:
+    """
+    In-process stand-in for zerokdbapi and the table sequence contract.
+
+    Keeps the sequence CID of each table (in `path` when given, so it survives
+    restarts) and appends chunks through `storage`, answering with the same
+    payloads as the API endpoints. EnhancedFileStorage uses it in place of
+    the API to run the whole pipeline without a network.
+
+    Several services (in one or more processes) may share `path`: every
+    lookup re-reads it, and every change re-reads and rewrites it under a
+    file lock, so none of them overwrites the tables of another.
+    """
+
+    def __init__(self, storage: IPFSStorage, path: Optional[str] = None):
+        self.storage = storage
+        self.path = path
+        self.sequences: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _reload(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                self.sequences = json.load(file)
+
+    @contextmanager
+    def _changing(self):
+        """
+        Hold the sequences while they are changed: with the latest ones from
+        `path` loaded, and no other service changing them in the meantime.
+        """
+        with self._lock:
+            if not self.path:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._reload()
+                yield
+
+    def _persist(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as file:
+            json.dump(self.sequences, file)
+        os.replace(temp_path, self.path)
+
+    def get_table_sequence_by_name(self, table_name: str) -> Dict[str, Any]:
+        with self._lock:
+            # The file is replaced atomically, so it is read without the file lock
+            self._reload()
+        cid = self.sequences.get(table_name)
+        if cid is None:
+            return {}
+        return {
+            "id": list(self.sequences).index(table_name),
+            "table_name": table_name,
+            "sequence_cid": cid,
+        }
+
+    def create_entity(self, entity_name: str, data) -> Dict[str, Any]:
+        with self._changing():
+            if entity_name in self.sequences:
+                raise ValueError("Invalid entity name. Entity already exists.")
+            data_cid, sequence_cid = self.storage.append_data(data, "0x0")
+            self.sequences[entity_name] = sequence_cid
+            self._persist()
+        return {"data_cid": data_cid, "sequence_cid": sequence_cid}
+
+    def append_data(self, table_name: str, data) -> Dict[str, Any]:
+        with self._changing():
+            if table_name not in self.sequences:
+                raise ValueError("Entity not found.")
+            data_cid, sequence_cid = self.storage.append_data(data, self.sequences[table_name])
+            self.sequences[table_name] = sequence_cid
+            self._persist()
+        return {"data_cid": data_cid, "sequence_cid": sequence_cid}
+
+    def append_chunks(self, table_name: str, chunks) -> Dict[str, Any]:
+        with self._changing():
+            if table_name not in self.sequences:
+                raise ValueError("Entity not found.")
+            data_cids, sequence_cid = self.storage.append_chunks(chunks, self.sequences[table_name])
+            self.sequences[table_name] = sequence_cid
+            self._persist()
+        return {"data_cids": data_cids, "sequence_cid": sequence_cid}
+
+    def update_sequence_cid(self, table_name: str, sequence_cid: str):
+        with self._changing():
+            self.sequences[table_name] = sequence_cid
+            self._persist()
 
 
 # Example Usage
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# Rough per-entry and per-row bookkeeping cost, in bytes, on top of the values
+_ENTRY_OVERHEAD = 512
+_ROW_OVERHEAD = 64
+
+
+def _result_size(rows: Sequence[Sequence[Any]], proof: Optional[Tuple[Any, Any]]) -> int:
+    size = _ENTRY_OVERHEAD
+    for row in rows:
+        size += _ROW_OVERHEAD
+        for value in row:
+            size += len(value) if isinstance(value, (str, bytes)) else 8
+    if proof is not None and isinstance(proof[1], (bytes, bytearray)):
+        size += len(proof[1])
+    return size
+
+
+def _copy_rows(rows: Sequence[Sequence[Any]]) -> List[tuple]:
+    # Vectors are lists: each caller gets its own, so changing one leaves the entry intact
+    return [tuple(list(value) if isinstance(value, list) else value for value in row) for row in rows]
+
+
+class ResultCache:
+    """
+    In-memory cache of SELECT results, keyed by the storage they were read
+    from, the normalized query, its bound parameters and the version (for
+    IPFS storage the sequence CID) of every table it reads. An entry holds
+    the rows and, once a proof was asked for, the circuit and proof bytes.
+
+    Entries expire `ttl` seconds after they are stored, and the least recently
+    used ones are evicted once the cached rows and proofs take more than
+    `max_bytes` (circuits are not counted). When a table of a storage is seen
+    at a new version, every entry computed from an older one is dropped.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, ttl: Optional[float] = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        # Latest version seen per (storage, table), and the keys of the entries reading it
+        self._versions: Dict[tuple, Hashable] = {}
+        self._keys_by_table: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        storage: Hashable,
+        query: str,
+        params: Sequence[Hashable],
+        versions: Sequence[Tuple[str, Hashable]],
+        with_proof: bool = False,
+    ) -> Optional[Tuple[List[tuple], Optional[Tuple[Any, Any]]]]:
+        """
+        Return the cached (rows, (circuit, proof)) of a query, or None. With
+        `with_proof`, entries stored without a proof are misses.
+        """
+        key = (storage, query, tuple(params), tuple(versions))
+        with self._lock:
+            self._observe(storage, versions)
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] is not None and entry["expires_at"] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None or (with_proof and entry["proof"] is None):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy_rows(entry["rows"]), entry["proof"]
+
+    def put(
+        self,
+        storage: Hashable,
+        query: str,
+        params: Sequence[Hashable],
+        versions: Sequence[Tuple[str, Hashable]],
+        rows: Sequence[tuple],
+        proof: Optional[Tuple[Any, Any]] = None,
+    ):
+        """
+        Store the rows of a query and, if it was generated, its (circuit, proof).
+        A stored proof is kept when the same result is stored again without one.
+        """
+        key = (storage, query, tuple(params), tuple(versions))
+        with self._lock:
+            self._observe(storage, versions)
+            previous = self._entries.get(key)
+            if proof is None and previous is not None:
+                proof = previous["proof"]
+            size = _result_size(rows, proof)
+            if size > self.max_bytes:
+                return
+            if previous is not None:
+                self._remove(key)
+            self._entries[key] = {
+                "rows": _copy_rows(rows),
+                "proof": proof,
+                "size": size,
+                "expires_at": None if self.ttl is None else time.monotonic() + self.ttl,
+            }
+            self._bytes += size
+            for table_name, _ in versions:
+                self._keys_by_table.setdefault((storage, table_name), set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, table_name: Optional[str] = None):
+        """
+        Drop the entries reading a table (of any storage), or every entry.
+        """
+        with self._lock:
+            if table_name is None:
+                keys = list(self._entries)
+            else:
+                keys = {key for (_, table), table_keys in self._keys_by_table.items() if table == table_name for key in table_keys}
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def _observe(self, storage: Hashable, versions: Sequence[Tuple[str, Hashable]]):
+        for table_name, version in versions:
+            table = (storage, table_name)
+            if self._versions.get(table, version) != version:
+                keys = [key for key in self._keys_by_table.get(table, ()) if (table_name, version) not in key[3]]
+                for key in keys:
+                    self._remove(key)
+                self.invalidations += len(keys)
+            self._versions[table] = version
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        for table_name, _ in key[3]:
+            table = (key[0], table_name)
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+            self._versions.clear()
+            self._bytes = 0
+
+
+# Shared by every DatabaseAPI in the process, so repeated requests hit it even
+# when each one opens its own API; ZEROKDB_RESULT_CACHE_MAX_BYTES=0 disables it
+result_cache = ResultCache(
+    max_bytes=int(os.getenv("ZEROKDB_RESULT_CACHE_MAX_BYTES", str(64 << 20))),
+    ttl=float(os.getenv("ZEROKDB_RESULT_CACHE_TTL", "300")) or None,
+)
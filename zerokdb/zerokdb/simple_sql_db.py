@@ -1,15 +1,69 @@
+import base64
+import json
 import re
 import sqlite3
 import time
-from typing import Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
 
 import numpy as np
 
 from zerokdb.change_tracker import ChangeTracker
 from zerokdb.enhanced_file_storage import EnhancedFileStorage
 from zerokdb.file_storage import FileStorage
+from zerokdb.result_cache import ResultCache
+from zerokdb.sql_parser import parse_sql
+from zerokdb.vector_index import (
+    QUANTIZED_INDEX_TYPES,
+    build_index,
+    load_index,
+    normalize_rows,
+)
+from zerokdb.vector_search import (
+    METRICS,
+    NormalizedVectors,
+    parse_vector,
+    parse_vectors,
+    score_vectors,
+    top_k_indices,
+)
+from zerokdb.vector_type import (
+    encode_vector,
+    is_vector_type,
+    to_vector,
+    vector_dimension,
+    vectors_from_blobs,
+)
+from zerokdb.working_set import METADATA_TABLE, WorkingSet
 from zerokdb.zk.table_parser import generate_proof_of_membership
 
+# Tables of one query whose changes are fetched from storage at the same time
+MAX_LOAD_WORKERS = 8
+
+_PLACEHOLDER_ROW_PATTERN = re.compile(r"VALUES\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def _parse_insert(query: str):
+    """
+    Split an INSERT statement into its table, column list (None for all
+    columns) and the VALUES or SELECT statement giving its rows, and tell
+    whether that is a single row of `?` placeholders.
+    """
+    parsed = parse_sql(query)
+    if parsed["kind"] != "insert":
+        raise ValueError("Could not extract data from INSERT INTO query")
+    # Rows are only ever appended, so there is nothing to replace or ignore
+    if parsed["conflict"] is not None:
+        raise ValueError(f"Unsupported INSERT form: {parsed['conflict']} on conflict")
+    if parsed["source"] is None:
+        raise ValueError("Unsupported INSERT form: DEFAULT VALUES")
+    source = parsed["source"]
+    columns = tuple(parsed["columns"]) if parsed["columns"] is not None else None
+    return parsed["table_name"], columns, source, bool(_PLACEHOLDER_ROW_PATTERN.fullmatch(source))
+
 
 class SimpleSQLDatabase:
     selected_columns = []
@@ -18,51 +72,135 @@ class SimpleSQLDatabase:
         self,
         storage: Union[EnhancedFileStorage, FileStorage],
         change_tracker: Optional[ChangeTracker] = None,
+        working_set: Optional[WorkingSet] = None,
+        result_cache: Optional[ResultCache] = None,
     ):
         self.storage = storage
         self.change_tracker = change_tracker
-        self.conn = sqlite3.connect(":memory:")
+        self.result_cache = result_cache
+        # Tables live in memory, or in a working set file that outlives the process
+        self.working_set = working_set
+        if working_set is not None:
+            self.conn = working_set.conn
+        else:
+            self.conn = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
         self.cursor = self.conn.cursor()
+        # Stored vector index payloads per table, and their deserialized objects
+        self.vector_indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._loaded_indexes: Dict[tuple, Any] = {}
+        # Pre-normalized vector matrices per (table, column), tagged with the table version
+        self._normalized_vectors: Dict[tuple, NormalizedVectors] = {}
+        # Column types per table and INSERT plans per (table, columns), until the table is recreated
+        self._column_types: Dict[str, Dict[str, str]] = {}
+        self._insert_plans: Dict[tuple, Dict[str, Any]] = {}
+        if working_set is not None:
+            # Tables kept from a previous run only fetch the chunks appended since
+            for table_name, entry in working_set.tables().items():
+                self.storage.restore_table_state(table_name, entry["state"])
+                self.vector_indexes[table_name] = entry["indexes"]
 
     def _load_data_from_storage(self, table_name: str):
-        data = self.storage.load(table_name)
+        """
+        Bring the in-memory table up to date with storage, inserting only the rows
+        appended since the last sync.
+        """
+        self._load_tables([table_name])
 
-        if not data or table_name not in data:
+    def _load_tables(self, table_names: Sequence[str]):
+        """
+        Bring every table a query references up to date with storage. Their
+        changes are fetched concurrently and inserted one table at a time.
+        """
+        def fetch(table_name):
+            return self.storage.get_table_version(table_name), self.storage.load_changes(table_name)
+
+        if len(table_names) <= 1:
+            for table_name in table_names:
+                self._apply_changes(table_name, *fetch(table_name))
             return
 
-        table_data = data[table_name]
+        with ThreadPoolExecutor(max_workers=min(len(table_names), MAX_LOAD_WORKERS)) as executor:
+            futures = [executor.submit(fetch, table_name) for table_name in table_names]
+            # Every fetched table is applied, so none is left marked as synced
+            # without its rows, before the first error is raised
+            error = None
+            for table_name, future in zip(table_names, futures):
+                try:
+                    self._apply_changes(table_name, *future.result())
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            raise error
+
+    def _apply_changes(self, table_name: str, previous_version, changes):
+        if not changes or not changes["table"]:
+            return
+
+        table_data = changes["table"]
         columns = ", ".join(
             [f"{col} {dtype}" for col, dtype in table_data["column_types"].items()]
         )
         self.cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
-
-        print(table_data)
-
-        if table_data["rows"]:
-            placeholders = ", ".join(["?" for _ in table_data["columns"]])
+        self._forget_table_shape(table_name)
+        if changes["reset"]:
             self.cursor.execute(f"DELETE FROM {table_name}")
+
+        # Rows may be a stream that is still downloading
+        placeholders = ", ".join(["?" for _ in table_data["columns"]])
+        try:
             self.cursor.executemany(
-                f"INSERT INTO {table_name} VALUES ({placeholders})", table_data["rows"]
+                f"INSERT INTO {table_name} VALUES ({placeholders})",
+                self._encode_vector_rows(
+                    table_data["columns"], table_data["column_types"], table_data["rows"]
+                ),
             )
+        except BaseException:
+            self.conn.rollback()
+            raise
 
+        # Streamed tables only know every index once all their rows are read
+        if changes["reset"]:
+            self.vector_indexes[table_name] = dict(table_data.get("indexes") or {})
+        else:
+            self.vector_indexes.setdefault(table_name, {}).update(
+                table_data.get("indexes") or {}
+            )
+        self._remember_table(table_name)
         self.conn.commit()
+        if not changes["reset"]:
+            self._extend_normalized_vectors(table_name, previous_version)
 
     def execute(
         self,
         query: str,
         generate_proof: bool = False,
+        params: Optional[Sequence] = None,
     ):
         query = query.strip()
+        parsed = parse_sql(query)
+        if parsed["kind"] not in ("select", "insert", "create_table", "create_vector_index"):
+            raise ValueError("Unsupported SQL command")
 
-        table_name = self._extract_table_name(query)
-        self._load_data_from_storage(table_name)
+        self._load_tables(parsed["tables"])
+        if self.working_set is not None:
+            for table_name in parsed["tables"]:
+                self.working_set.touch(table_name)
+            self._evict_tables(keep=parsed["tables"])
 
-        if self.change_tracker:
-            self.change_tracker.log_change(query, self._get_tables_data())
+        if parsed["kind"] == "create_vector_index":
+            self._create_vector_index(query)
+            self._log_change(query, parsed["table_name"])
+            if generate_proof:
+                return [], None, None
+            return []
 
-        if query.startswith("CREATE TABLE"):
-            table_name = self._create_table(query)
+        elif parsed["kind"] == "create_table":
+            table_name = parsed["table_name"]
+            self._create_table(query, table_name)
             self.storage.create_table(table_name, self._get_tables_data())
+            self._remember_table(table_name)
+            self.conn.commit()
+            self._log_change(query, table_name, reset=True)
             rows = self._get_table_rows(table_name)
             circuit, proof = generate_proof_of_membership(
                 self._get_table_data(table_name), [], []
@@ -71,66 +209,321 @@ class SimpleSQLDatabase:
                 return rows, circuit, proof
             return rows
 
-        elif query.startswith("INSERT INTO"):
+        elif parsed["kind"] == "insert":
             start = time.time()
-            table_name = self._extract_table_name(query)
-            self.cursor.execute(query)
-            self.conn.commit()
-            print(f"Inserted data locally in {time.time() - start} seconds")
-
-            new_table_chunk = self._get_newly_inserted_data(table_name, query)
-            self.storage.save(new_table_chunk, table_name)
+            table_name, columns, _, _ = _parse_insert(query)
+            plan = self._insert_plan(table_name, columns)
+            # The row is committed locally once storage has it
+            try:
+                new_table_chunk = self._insert_rows(table_name, plan, self._insert_values(query, params))
+                print(f"Inserted data locally in {time.time() - start} seconds")
+                self._save_chunks(table_name, [new_table_chunk], query)
+            except BaseException:
+                self.conn.rollback()
+                raise
 
             print(f"Saved updated data on IPFS in {time.time() - start} seconds")
             rows = self._get_table_rows(table_name)
-            circuit, proof = generate_proof_of_membership(
-                self._get_table_data(table_name), new_table_chunk[table_name], []
-            )
             if generate_proof:
+                circuit, proof = generate_proof_of_membership(
+                    self._get_table_data(table_name), new_table_chunk[table_name], []
+                )
                 return rows, circuit, proof
             return rows
 
-        elif query.startswith("SELECT"):
-            if "COSINE SIMILARITY" in query.upper():
-                return self._handle_cosine_similarity_query(query, generate_proof)
+        else:
+            cache_key = self._result_cache_key(parsed, params)
+            if cache_key is not None:
+                cached = self.result_cache.get(*cache_key, with_proof=generate_proof)
+                if cached is not None:
+                    result, proof = cached
+                    return (result, *proof) if generate_proof else result
+
+            if parsed["similarity"]:
+                result = self._handle_vector_search_query(query, generate_proof, params)
             else:
-                self.cursor.execute(query)
+                self.cursor.execute(query, self._bind_params(params))
                 result = self.cursor.fetchall()
-                table_name = self._extract_table_name(query)
-                query_columns = self._get_query_columns(query)
-                circuit, proof = generate_proof_of_membership(
-                    self._get_table_data(table_name), {"rows": result}, query_columns
-                )
                 if generate_proof:
-                    return result, circuit, proof
-                return result
+                    table_name = parsed["table_name"]
+                    circuit, proof = generate_proof_of_membership(
+                        self._get_table_data(table_name) if table_name else {},
+                        {"rows": result},
+                        self._projected_columns(parsed),
+                    )
+                    result = (result, circuit, proof)
+
+            if cache_key is not None:
+                if generate_proof:
+                    self.result_cache.put(*cache_key, result[0], result[1:])
+                else:
+                    self.result_cache.put(*cache_key, result)
+            return result
+
+    def _result_cache_key(self, parsed: Dict[str, Any], params: Optional[Sequence]):
+        """
+        Return the (storage, query, params, table versions) a SELECT's result
+        is cached under, or None when it is not cached: without a cache, for volatile
+        queries and for queries reading tables storage does not know.
+        """
+        if self.result_cache is None or parsed["volatile"] or not parsed["tables"]:
+            return None
+        # Tables were just synced, so their versions name the rows the query reads
+        versions = tuple((table_name, self.storage.get_table_version(table_name)) for table_name in parsed["tables"])
+        if any(version is None for _, version in versions):
+            return None
+        key = (self.storage.get_storage_id(), parsed["normalized"], self._bind_params(params), versions)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def executemany(
+        self,
+        query: str,
+        seq_of_params: Iterable[Sequence],
+        generate_proof: bool = False,
+        batch_size: int = 1000,
+    ):
+        """
+        Run an INSERT once per parameter tuple. The rows are inserted and stored
+        like `insert_many`, one chunk per `batch_size` rows.
+        """
+        query = query.strip()
+        if parse_sql(query)["kind"] != "insert":
+            raise ValueError("executemany only supports INSERT INTO")
+        table_name, columns, _, _ = _parse_insert(query)
+        rows = (row for params in seq_of_params for row in self._insert_values(query, params))
+        return self.insert_many(
+            table_name, rows, columns=columns, batch_size=batch_size, generate_proof=generate_proof
+        )
+
+    def _insert_values(self, query: str, params: Optional[Sequence]):
+        """
+        Return the typed rows an INSERT statement inserts. Parameters of a plain
+        `(?, ...)` row are used as they are; any other VALUES clause (literals,
+        several rows) or SELECT is evaluated by SQLite.
+        """
+        _, _, source, placeholders_only = _parse_insert(query)
+        if placeholders_only and params is not None:
+            return [tuple(params)]
+        cursor = self.conn.execute(source, self._bind_params(params))
+        return cursor.fetchall()
+
+    def insert_many(
+        self,
+        table_name: str,
+        rows: Iterable[Sequence],
+        columns: Optional[Sequence[str]] = None,
+        batch_size: int = 1000,
+        generate_proof: bool = False,
+        batches_per_request: int = 1,
+    ):
+        """
+        Insert rows of values in `columns` order (all of the table's columns by
+        default) in batches of `batch_size`. Each batch is inserted with one
+        executemany and stored as one chunk, and up to `batches_per_request`
+        chunks are appended to storage together with one sequence update.
+
+        Returns the number of rows inserted, and with `generate_proof` also the
+        (circuit, proof) of each batch.
+        """
+        if batch_size < 1 or batches_per_request < 1:
+            raise ValueError("batch_size and batches_per_request must be positive")
+        self._load_data_from_storage(table_name)
+        plan = self._insert_plan(table_name, columns)
+
+        rows = iter(rows)
+        inserted = 0
+        proofs = []
+        pending = []
+        # Batches are committed locally once storage has their chunks; on failure
+        # the ones not stored yet are rolled back and earlier ones are kept
+        try:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                chunk = self._insert_rows(table_name, plan, batch)
+                inserted += len(batch)
+                pending.append(chunk)
+                if generate_proof:
+                    proofs.append(
+                        generate_proof_of_membership(self._get_table_data(table_name), chunk[table_name], [])
+                    )
+                if len(pending) >= batches_per_request:
+                    self._save_chunks(table_name, pending, plan["statement"])
+                    pending = []
+            if pending:
+                self._save_chunks(table_name, pending, plan["statement"])
+        except BaseException:
+            self.conn.rollback()
+            raise
+        print(f"Inserted {inserted} rows into {table_name}")
+        if generate_proof:
+            return inserted, proofs
+        return inserted
 
+    def _insert_plan(self, table_name: str, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Return the cached statement and column layout for inserting the given
+        columns (all by default) into a table.
+        """
+        key = (table_name, tuple(columns) if columns else None)
+        plan = self._insert_plans.get(key)
+        if plan is not None:
+            return plan
+        column_types = self._get_column_types(table_name)
+        if not column_types:
+            raise ValueError(f"Unknown table: {table_name}")
+        given_columns = list(columns or column_types)
+        unknown = [col for col in given_columns if col not in column_types]
+        if unknown:
+            raise ValueError(f"Unknown columns in {table_name}: {', '.join(unknown)}")
+        # Chunks of a table are merged by position, so every chunk carries all of
+        # its columns and the ones not given are NULL
+        all_columns = list(column_types)
+        plan = {
+            "given_columns": given_columns,
+            "columns": all_columns,
+            "column_types": dict(column_types),
+            "positions": None if given_columns == all_columns else [
+                given_columns.index(col) if col in given_columns else None for col in all_columns
+            ],
+            "vector_columns": [
+                (i, vector_dimension(column_types[col]))
+                for i, col in enumerate(all_columns)
+                if is_vector_type(column_types[col])
+            ],
+            "statement": (
+                f"INSERT INTO {table_name} ({', '.join(all_columns)}) VALUES ({', '.join('?' for _ in all_columns)})"
+            ),
+        }
+        self._insert_plans[key] = plan
+        return plan
+
+    def _insert_rows(self, table_name: str, plan: Dict[str, Any], rows: Sequence[Sequence]):
+        """
+        Insert typed rows in the plan's column order, without committing, and
+        return the chunk holding them.
+        """
+        width = len(plan["given_columns"])
+        if any(len(row) != width for row in rows):
+            raise ValueError("Number of parameters does not match number of columns")
+        positions = plan["positions"]
+        if positions is None:
+            rows = [tuple(row) for row in rows]
         else:
-            raise ValueError("Unsupported SQL command")
+            rows = [tuple(None if i is None else row[i] for i in positions) for row in rows]
 
-    def _create_table(self, query: str):
-        self.cursor.execute(query)
+        # Vectors are packed once, for SQLite and (as base64) for the chunk
+        chunk_rows = rows
+        vector_columns = plan["vector_columns"]
+        if vector_columns:
+            rows = [self._pack_vector_row(row, vector_columns) for row in rows]
+            chunk_rows = [self._base64_vector_row(row, vector_columns) for row in rows]
+        self.cursor.executemany(plan["statement"], rows)
+        return {
+            table_name: {
+                "columns": plan["columns"],
+                "column_types": plan["column_types"],
+                "rows": chunk_rows,
+                "indexes": {},
+            }
+        }
+
+    def _forget_table_shape(self, table_name: str):
+        self._column_types.pop(table_name, None)
+        for key in [key for key in self._insert_plans if key[0] == table_name]:
+            del self._insert_plans[key]
+
+    def _pack_vector_row(self, row, vector_columns):
+        row = list(row)
+        for i, dimension in vector_columns:
+            if row[i] is not None:
+                row[i] = encode_vector(row[i], dimension)
+        return tuple(row)
+
+    def _base64_vector_row(self, row, vector_columns):
+        row = list(row)
+        for i, _ in vector_columns:
+            if row[i] is not None:
+                row[i] = base64.b64encode(row[i]).decode("ascii")
+        return tuple(row)
+
+    def _save_chunks(self, table_name: str, chunks, query: str):
+        previous_version = self.storage.get_table_version(table_name)
+        if len(chunks) == 1:
+            self.storage.save(chunks[0], table_name)
+        else:
+            self.storage.save_many(chunks, table_name)
+        self._remember_table(table_name)
         self.conn.commit()
-        return self._extract_table_name(query)
+        for chunk in chunks:
+            self._log_change(query, table_name, chunk[table_name]["rows"])
+        self._extend_normalized_vectors(table_name, previous_version)
 
-    def _extract_table_name(self, query: str):
-        match = re.search(
-            r"(?:CREATE TABLE|INSERT INTO|FROM)\s+(\w+)", query, re.IGNORECASE
-        )
-        if match:
-            return match.group(1)
-        raise ValueError("Could not extract table name from query")
+    def _log_change(self, query: str, table_name: str, rows=(), reset: bool = False):
+        # Only writes are logged, with the rows they touched
+        if self.change_tracker:
+            self.change_tracker.log_change(query, table_name, rows, reset=reset)
+
+    def _remember_table(self, table_name: str):
+        # Record the rows' sync state in the working set, in their transaction
+        if self.working_set is None:
+            return
+        state = self.storage.export_table_state(table_name)
+        if state is None:
+            self.working_set.forget(table_name)
+        else:
+            self.working_set.remember(table_name, state, self.vector_indexes.get(table_name, {}))
+
+    def _evict_tables(self, keep: Iterable[str]):
+        """
+        Drop the least recently used tables of the working set while it is over
+        its size budget. They are loaded again in full when next used.
+        """
+        evicted = False
+        for table_name in self.working_set.eviction_candidates(keep):
+            if not self.working_set.over_budget():
+                break
+            self.working_set.forget(table_name)
+            self.conn.commit()
+            self._forget_table_shape(table_name)
+            self.storage.forget_table_state(table_name)
+            self.vector_indexes.pop(table_name, None)
+            for key in [key for key in self._loaded_indexes if key[0] == table_name]:
+                del self._loaded_indexes[key]
+            for key in [key for key in self._normalized_vectors if key[0] == table_name]:
+                del self._normalized_vectors[key]
+            print(f"Evicted {table_name} from the working set")
+            evicted = True
+        if evicted:
+            self.working_set.vacuum()
+
+    def _create_table(self, query: str, table_name: str):
+        self.cursor.execute(query)
+        self._forget_table_shape(table_name)
 
     def _get_tables_data(self):
         self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         tables = self.cursor.fetchall()
-        return {table[0]: self._get_table_data(table[0]) for table in tables}
+        return {table[0]: self._get_table_data(table[0]) for table in tables if table[0] != METADATA_TABLE}
+
+    def _get_column_types(self, table_name: str):
+        if table_name not in self._column_types:
+            self.cursor.execute(f"PRAGMA table_info({table_name})")
+            column_types = {col[1]: col[2] for col in self.cursor.fetchall()}
+            if not column_types:
+                # Not created yet
+                return column_types
+            self._column_types[table_name] = column_types
+        return self._column_types[table_name]
 
     def _get_table_data(self, table_name: str):
-        self.cursor.execute(f"PRAGMA table_info({table_name})")
-        columns_info = self.cursor.fetchall()
-        columns = [col[1] for col in columns_info]
-        column_types = {col[1]: col[2] for col in columns_info}
+        column_types = dict(self._get_column_types(table_name))
+        columns = list(column_types)
         rows = self._get_table_rows(table_name)
         return {
             "columns": columns,
@@ -143,105 +536,546 @@ class SimpleSQLDatabase:
         self.cursor.execute(f"SELECT * FROM {table_name}")
         return self.cursor.fetchall()
 
-    def _get_query_columns(self, query: str):
-        match = re.match(r"SELECT\s+(.+?)\s+FROM", query, re.IGNORECASE)
-        if match:
-            columns = match.group(1).split(",")
-            return [col.strip() for col in columns]
-        return []
-
-    def _get_newly_inserted_data(self, table_name: str, query: str):
-        # Extract the columns and values from the INSERT INTO query
-        match = re.search(r"INSERT INTO\s+\w+\s*\((.+?)\)\s*VALUES\s*\((.+?)\)", query, re.IGNORECASE)
-        if not match:
-            raise ValueError("Could not extract data from INSERT INTO query")
-
-        columns = [col.strip() for col in match.group(1).split(",")]
-        values_str = match.group(2)
-
-        # Handle the case where a value might contain commas (e.g., in a vector or text)
-        values = []
-        in_brackets = False
-        in_quotes = False
-        current_value = ""
-        for char in values_str:
-            if char == '[':
-                in_brackets = True
-            elif char == ']':
-                in_brackets = False
-            elif char == "'":
-                in_quotes = not in_quotes
-
-            if char == ',' and not (in_brackets or in_quotes):
-                values.append(current_value.strip().strip("'"))
-                current_value = ""
+    def _projected_columns(self, parsed: Dict[str, Any]):
+        """
+        Return the columns a parsed SELECT returns, in order, with `*` and
+        `table.*` expanded to the table columns. Plain column references are
+        named by their column; other expressions by their SQL.
+        """
+        tables = {}
+        for entry in parsed["from"]:
+            if entry["table"]:
+                tables[entry["alias"] or entry["table"]] = entry["table"]
+        columns = []
+        for column in parsed["columns"]:
+            if column["column"] == "*":
+                expanded = [tables.get(column["table"], column["table"])] if column["table"] else tables.values()
+                for table_name in expanded:
+                    columns.extend(self._get_column_types(table_name))
             else:
-                current_value += char
+                columns.append(column["column"] or column["expression"])
+        return columns
 
-        if current_value:
-            values.append(current_value.strip().strip("'"))
+    def _bind_params(self, params: Optional[Sequence]):
+        # Vector parameters are bound in their packed binary encoding
+        return tuple(
+            encode_vector(param) if isinstance(param, (list, tuple, np.ndarray)) else param
+            for param in params or ()
+        )
 
-        # Get the column types
-        self.cursor.execute(f"PRAGMA table_info({table_name})")
-        columns_info = self.cursor.fetchall()
-        column_types = {col[1]: col[2] for col in columns_info}
+    def _encode_vector_rows(self, columns, column_types, rows):
+        vector_indexes = [
+            i for i, col in enumerate(columns) if is_vector_type(column_types.get(col))
+        ]
+        if not vector_indexes:
+            return rows
+        return (self._encode_vector_row(row, vector_indexes) for row in rows)
 
-        # Create the new_table_chunk with only the newly inserted data
-        new_table_chunk = {
-            table_name: {
-                "columns": columns,
-                "column_types": {col: column_types.get(col, 'TEXT') for col in columns},
-                "rows": [tuple(values)],
-                "indexes": {},
-            }
-        }
+    def _encode_vector_row(self, row, vector_indexes):
+        row = list(row)
+        for i in vector_indexes:
+            # Columnar chunks already hold the packed bytes, which are inserted without a copy
+            if row[i] is not None and not isinstance(row[i], memoryview):
+                row[i] = encode_vector(row[i])
+        return tuple(row)
+
+    def _vector_sql(self, table_name: str, vector_column: str):
+        column_types = self._get_column_types(table_name)
+        if vector_column not in column_types:
+            raise ValueError(f"Unknown vector column: {vector_column}")
+        # Read packed vectors as raw blobs so they skip the per-row list conversion
+        if is_vector_type(column_types[vector_column]):
+            return f"CAST({vector_column} AS BLOB)", True
+        return vector_column, False
+
+    def _get_column_vectors(
+        self,
+        table_name: str,
+        vector_column: str,
+        after_rowid: Optional[int] = None,
+        with_vectors: bool = True,
+    ):
+        """
+        Return rowids and a float32 matrix of the non-NULL `vector_column` values, in rowid order.
+        """
+        vector_sql, binary_vectors = self._vector_sql(table_name, vector_column)
+        after_sql = "" if after_rowid is None else f"AND rowid > {int(after_rowid)}"
+        self.cursor.execute(
+            f"SELECT rowid{f', {vector_sql}' if with_vectors else ''} FROM {table_name} "
+            f"WHERE {vector_column} IS NOT NULL {after_sql} ORDER BY rowid"
+        )
+        rows = self.cursor.fetchall()
+        rowids = np.array([row[0] for row in rows], dtype=np.int64)
+        if not with_vectors:
+            return rowids, None
+        if binary_vectors:
+            return rowids, vectors_from_blobs([row[1] for row in rows])
+        return rowids, parse_vectors([row[1] for row in rows])
 
-        print(new_table_chunk)
+    def _read_vectors(self, table_name: str, vector_column: str, rowids, where_clause, params):
+        """
+        Read the exact vectors of the given rowids (all rows by default) that pass the WHERE clause.
+        """
+        vector_sql, binary_vectors = self._vector_sql(table_name, vector_column)
+        conditions = [f"{vector_column} IS NOT NULL"]
+        params = list(params)
+        if rowids is not None:
+            conditions.append("rowid IN (SELECT value FROM json_each(?))")
+            params = [json.dumps(rowids.tolist())] + params
+        if where_clause:
+            conditions.append(f"({where_clause})")
+        self.cursor.execute(
+            f"SELECT rowid, {vector_sql} FROM {table_name} "
+            f"WHERE {' AND '.join(conditions)} ORDER BY rowid",
+            self._bind_params(params),
+        )
+        rows = self.cursor.fetchall()
+        rowids = np.array([row[0] for row in rows], dtype=np.int64)
+        if binary_vectors:
+            return rowids, vectors_from_blobs([row[1] for row in rows])
+        return rowids, parse_vectors([row[1] for row in rows])
 
-        return new_table_chunk
+    def _get_table_shape(self, table_name: str):
+        self.cursor.execute(f"SELECT count(*), max(rowid) FROM {table_name}")
+        return self.cursor.fetchone()
+
+    def _get_normalized_vectors(self, table_name: str, vector_column: str):
+        """
+        Return the cached normalized matrix of a vector column, rebuilding it when
+        the table's storage version or shape no longer matches.
+        """
+        version = self.storage.get_table_version(table_name)
+        # Columns with a quantized index keep only their codes in memory
+        keep_matrix = not any(
+            index["column"] == vector_column and index["type"] in QUANTIZED_INDEX_TYPES
+            for index in self.vector_indexes.get(table_name, {}).values()
+        )
+        key = (table_name, vector_column)
+        vectors = self._normalized_vectors.get(key)
+        if (
+            vectors is None
+            or version is None
+            or vectors.version != version
+            or vectors.keep_matrix != keep_matrix
+            or (vectors.table_rows, vectors.table_max_rowid)
+            != self._get_table_shape(table_name)
+        ):
+            vectors = NormalizedVectors(version, keep_matrix)
+            vectors.extend(
+                *self._get_column_vectors(
+                    table_name, vector_column, with_vectors=keep_matrix
+                )
+            )
+            vectors.table_rows, vectors.table_max_rowid = self._get_table_shape(
+                table_name
+            )
+            if version is not None:
+                self._normalized_vectors[key] = vectors
+        return vectors
 
-    def _handle_cosine_similarity_query(self, query: str, generate_proof: bool):
+    def _extend_normalized_vectors(self, table_name: str, previous_version: Optional[str]):
+        """
+        Append rows this instance just inserted to the warm matrices of the table.
+        """
+        version = self.storage.get_table_version(table_name)
+        for (cached_table, vector_column), vectors in list(
+            self._normalized_vectors.items()
+        ):
+            if cached_table != table_name:
+                continue
+            if previous_version is None or vectors.version != previous_version:
+                del self._normalized_vectors[(cached_table, vector_column)]
+                continue
+            vectors.extend(
+                *self._get_column_vectors(
+                    table_name,
+                    vector_column,
+                    after_rowid=vectors.table_max_rowid,
+                    with_vectors=vectors.keep_matrix,
+                )
+            )
+            vectors.version = version
+            vectors.table_rows, vectors.table_max_rowid = self._get_table_shape(
+                table_name
+            )
+
+    def _create_vector_index(self, query: str):
         match = re.match(
-            r"SELECT (.+) FROM (\w+)(?: WHERE (.+))?(?: LIMIT (\d+))? COSINE SIMILARITY (.+) WITH (.+)$",
+            r"CREATE VECTOR INDEX (\w+) ON (\w+)\s*\(\s*(\w+)\s*\)\s*USING (\w+)(?:\s+WITH\s*\((.*)\))?$",
             query,
             re.IGNORECASE,
         )
         if not match:
-            raise ValueError("Invalid COSINE SIMILARITY query syntax")
+            raise ValueError("Invalid CREATE VECTOR INDEX syntax")
+
+        index_name, table_name, vector_column, kind, options_str = match.groups()
+        options = {}
+        for option in filter(None, (o.strip() for o in (options_str or "").split(","))):
+            key, _, value = option.partition("=")
+            options[key.strip().lower()] = int(value)
 
-        columns, table_name, where_clause, limit, vector_column, target_vector = (
-            match.groups()
+        _, vectors = self._get_column_vectors(table_name, vector_column)
+        index = build_index(kind, vector_column, vectors, **options)
+
+        # Publish the index as a chunk without rows so it is stored alongside the data
+        table_data = self._get_table_data(table_name)
+        self.storage.save(
+            {
+                table_name: {
+                    "columns": table_data["columns"],
+                    "column_types": table_data["column_types"],
+                    "rows": [],
+                    "indexes": {index_name: index},
+                }
+            },
+            table_name,
         )
-        target_vector = np.fromstring(target_vector.strip("[]"), sep=",")
+        self.vector_indexes.setdefault(table_name, {})[index_name] = index
+        self._remember_table(table_name)
+        self.conn.commit()
+        return index_name
+
+    def _get_vector_index(
+        self, table_name: str, vector_column: str, index_name: Optional[str] = None
+    ):
+        indexes = self.vector_indexes.get(table_name, {})
+        if index_name:
+            if index_name not in indexes:
+                raise ValueError(f"Unknown vector index: {index_name}")
+            names = [index_name]
+        else:
+            names = [
+                name for name, index in indexes.items() if index["column"] == vector_column
+            ]
+        if not names:
+            return None
+
+        payload = indexes[names[-1]]
+        key = (table_name, names[-1])
+        cached = self._loaded_indexes.get(key)
+        if cached is None or cached[0] != payload:
+            cached = (payload, load_index(payload))
+            self._loaded_indexes[key] = cached
+        return cached[1]
+
+    def vector_index_stats(
+        self, table_name: str, index_name: str, k: int = 10, sample_size: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Report the memory footprint of a vector index and its recall@k against an exact scan.
 
-        # Fetch all rows
-        where_sql = f"WHERE {where_clause}" if where_clause else ""
+        Recall is measured by querying the index with `sample_size` of the indexed
+        vectors and re-ranking its candidates exactly, as the query engine does.
+        """
+        self._load_data_from_storage(table_name)
+        payload = self.vector_indexes.get(table_name, {}).get(index_name)
+        if payload is None:
+            raise ValueError(f"Unknown vector index: {index_name}")
+        index = self._get_vector_index(table_name, payload["column"], index_name)
+        _, matrix = self._get_column_vectors(table_name, payload["column"])
+        vectors = normalize_rows(matrix[: index.row_count])
+
+        hits = 0
+        expected = 0
+        rng = np.random.default_rng(0)
+        sample = rng.choice(index.row_count, min(sample_size, index.row_count), replace=False)
+        for position in sample:
+            query = vectors[position]
+            exact = top_k_indices(vectors @ query, k)
+            found = index.search(query, k, vectors=None if index.quantized else vectors)
+            reranked = found[top_k_indices(vectors[found] @ query, k)]
+            hits += len(set(exact) & set(reranked.tolist()))
+            expected += len(exact)
+
+        float32_bytes = vectors.nbytes
+        memory_bytes = index.memory_bytes()
+        return {
+            "type": payload["type"],
+            "column": payload["column"],
+            "row_count": index.row_count,
+            "memory_bytes": memory_bytes,
+            "float32_bytes": float32_bytes,
+            "compression_ratio": float32_bytes / memory_bytes if memory_bytes else None,
+            "recall": hits / expected if expected else None,
+        }
+
+    def _score_candidates(
+        self,
+        table_name,
+        vector_column,
+        vectors,
+        target_vector,
+        metric,
+        where_clause,
+        params,
+        positions=None,
+    ):
+        """
+        Score the cached rows at `positions` (all rows by default) that pass the WHERE clause.
+        """
+        if not vectors.keep_matrix:
+            # No float matrix is kept for quantized columns: read the exact vectors
+            rowids = None if positions is None else vectors.rowids[positions]
+            rowids, matrix = self._read_vectors(
+                table_name, vector_column, rowids, where_clause, params
+            )
+            return vectors.positions(rowids), score_vectors(matrix, target_vector[None, :], metric)[:, 0]
+
+        positions = self._filter_positions(table_name, vectors, where_clause, params, positions)
+        if positions is None:
+            return np.arange(vectors.size), vectors.score(target_vector, metric)
+        return positions, vectors.score(target_vector, metric, positions)
+
+    def _filter_positions(self, table_name, vectors, where_clause, params, positions=None):
+        """
+        Keep the cached rows at `positions` (all rows by default) that pass the WHERE clause.
+        """
+        if not where_clause:
+            return positions
+        conditions = [f"({where_clause})"]
+        if positions is not None:
+            # Restrict the filter to the index candidates, bound as one JSON array
+            conditions.insert(0, "rowid IN (SELECT value FROM json_each(?))")
+            params = [json.dumps(vectors.rowids[positions].tolist())] + list(params)
         self.cursor.execute(
-            f"SELECT {columns}, {vector_column} FROM {table_name} {where_sql}"
+            f"SELECT rowid FROM {table_name} WHERE {' AND '.join(conditions)} ORDER BY rowid",
+            self._bind_params(params),
         )
-        rows = self.cursor.fetchall()
+        rowids = np.array([row[0] for row in self.cursor.fetchall()], dtype=np.int64)
+        return vectors.positions(rowids)
+
+    def _fetch_rows_by_rowid(self, columns: str, table_name: str, rowids: np.ndarray):
+        self.cursor.execute(
+            f"SELECT rowid, {columns} FROM {table_name} "
+            f"WHERE rowid IN (SELECT value FROM json_each(?))",
+            (json.dumps(rowids.tolist()),),
+        )
+        rows = {row[0]: row[1:] for row in self.cursor.fetchall()}
+        return [rows[rowid] for rowid in rowids.tolist()]
+
+    def similarity_search_batch(
+        self,
+        table_name: str,
+        target_vectors: Sequence,
+        k: int,
+        columns: str = "*",
+        vector_column: Optional[str] = None,
+        where_clause: Optional[str] = None,
+        params: Optional[Sequence] = None,
+        generate_proof: bool = False,
+        aggregate_proof: bool = True,
+        metric: str = "cosine_similarity",
+    ):
+        """
+        Return the top `k` rows for each target vector, best first under `metric`.
+
+        The table is loaded and filtered once, and all targets are scored with a
+        single matrix-matrix product. With `generate_proof`, one proof of
+        membership covers every returned row when `aggregate_proof` is set;
+        otherwise one circuit and proof is returned per target.
+        """
+        self._load_data_from_storage(table_name)
+        if vector_column is None:
+            vector_columns = [
+                col for col, dtype in self._get_column_types(table_name).items()
+                if is_vector_type(dtype)
+            ]
+            if len(vector_columns) != 1:
+                raise ValueError(
+                    f"Table {table_name} has {len(vector_columns)} vector columns, pass vector_column"
+                )
+            vector_column = vector_columns[0]
+
+        if not len(target_vectors):
+            raise ValueError("At least one target vector is required")
+        targets = np.stack([to_vector(target) for target in target_vectors])
+        params = list(params or [])
+        vectors = self._get_normalized_vectors(table_name, vector_column)
+        if vectors.keep_matrix:
+            positions = self._filter_positions(table_name, vectors, where_clause, params)
+            scores = vectors.score_many(targets, metric, positions)
+            if positions is None:
+                positions = np.arange(vectors.size)
+        else:
+            # Quantized columns keep no float matrix: score the exact vectors once
+            rowids, matrix = self._read_vectors(
+                table_name, vector_column, None, where_clause, params
+            )
+            positions = vectors.positions(rowids)
+            scores = score_vectors(matrix, targets, metric)
+
+        if not METRICS[metric]:
+            # Smaller distances rank first
+            scores = -scores
+        top_rowids = [
+            vectors.rowids[positions[top_k_indices(scores[:, i], k)]]
+            for i in range(len(targets))
+        ]
+        # Rows shared between queries are read back once
+        unique_rowids = np.unique(np.concatenate(top_rowids))
+        rows = dict(
+            zip(
+                unique_rowids.tolist(),
+                self._fetch_rows_by_rowid(columns, table_name, unique_rowids),
+            )
+        )
+        results = [[rows[rowid] for rowid in rowids.tolist()] for rowids in top_rowids]
 
-        # Calculate cosine similarities
-        similarities = []
-        for row in rows:
-            vector = np.fromstring(row[-1].strip("[]"), sep=",")
-            similarity = np.dot(vector, target_vector) / (
-                np.linalg.norm(vector) * np.linalg.norm(target_vector)
+        if not generate_proof:
+            return results
+        table_data = self._get_table_data(table_name)
+        query_columns = self._projected_columns(parse_sql(f"SELECT {columns} FROM {table_name}"))
+        if aggregate_proof:
+            circuit, proof = generate_proof_of_membership(
+                table_data, {"rows": list(rows.values())}, query_columns
             )
-            similarities.append((row[:-1], similarity))
+            return results, circuit, proof
+        proofs = [
+            generate_proof_of_membership(table_data, {"rows": result}, query_columns)
+            for result in results
+        ]
+        return results, [circuit for circuit, _ in proofs], [proof for _, proof in proofs]
+
+    def _parse_vector_query(self, query: str):
+        """
+        Parse a vector search query into its clauses.
+
+        Two forms are accepted: the original `... LIMIT n COSINE SIMILARITY col WITH v`
+        and `... ORDER BY <metric>(col, v) [ASC|DESC] LIMIT n`, where the metric is
+        one of `cosine_distance`, `l2_distance`, `inner_product` or `cosine_similarity`.
+        """
+        parsed = parse_sql(query)
+        # Vector searches read one table and are ordered by their metric alone
+        if (
+            parsed["kind"] != "select"
+            or not parsed["similarity"]
+            or len(parsed["from"]) != 1
+            or not parsed["table_name"]
+            or parsed["group_by"]
+            or parsed["having"]
+            or parsed["order_by"]
+            or parsed["offset"] is not None
+        ):
+            raise ValueError("Invalid vector search query syntax")
+        if isinstance(parsed["limit"], str):
+            raise ValueError("Vector search LIMIT must be a number")
+        return dict(
+            parsed["similarity"],
+            columns=[column["text"] for column in parsed["columns"]],
+            table_name=parsed["table_name"],
+            where_clause=parsed["where"],
+            limit=parsed["limit"],
+        )
+
+    def _handle_vector_search_query(
+        self, query: str, generate_proof: bool, params: Optional[Sequence] = None
+    ):
+        parsed = self._parse_vector_query(query)
+        table_name = parsed["table_name"]
+        vector_column = parsed["vector_column"]
+        where_clause = parsed["where_clause"]
+        metric = parsed["metric"]
+        k = parsed["limit"]
+
+        params = list(params or [])
+        if parsed["target_vector"] == "?":
+            # The target vector is the last bound parameter, after any WHERE parameters
+            if not params:
+                raise ValueError("Missing parameter for the target vector")
+            target_vector = to_vector(params.pop())
+        else:
+            target_vector = parse_vector(parsed["target_vector"])
 
-        # Sort by similarity and apply limit
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        if limit:
-            similarities = similarities[: int(limit)]
+        # `score` selects the metric value unless the table has a real column of that name
+        columns = parsed["columns"]
+        score_positions = []
+        if "score" not in self._get_column_types(table_name):
+            score_positions = [i for i, col in enumerate(columns) if col.lower() == "score"]
+        table_columns = [col for i, col in enumerate(columns) if i not in score_positions]
 
-        result = [row for row, _ in similarities]
+        vectors = self._get_normalized_vectors(table_name, vector_column)
+
+        # Indexes are built for cosine similarity, so they only serve best-first cosine searches
+        scored = None
+        index = None
+        best_first = parsed["descending"] == METRICS[metric]
+        if k and not parsed["exact"] and metric.startswith("cosine") and best_first:
+            index = self._get_vector_index(table_name, vector_column, parsed["index_name"])
+        if index is not None and index.row_count <= vectors.size:
+            min_similarity = None
+            if metric == "cosine_similarity" and parsed["min_score"] is not None:
+                min_similarity = parsed["min_score"]
+            elif metric == "cosine_distance" and parsed["max_score"] is not None:
+                min_similarity = 1 - parsed["max_score"]
+            found = index.search(
+                target_vector,
+                k,
+                vectors=vectors.matrix if vectors.keep_matrix else None,
+                nprobe=parsed["nprobe"],
+                ef=parsed["ef"],
+                rerank=parsed["rerank"],
+                min_score=min_similarity,
+            )
+            # Rows appended after the index was built are always scanned
+            positions = np.concatenate([found, np.arange(index.row_count, vectors.size)])
+            scored = self._score_candidates(
+                table_name,
+                vector_column,
+                vectors,
+                target_vector,
+                metric,
+                where_clause,
+                params,
+                positions,
+            )
+            if len(scored[0]) < k and min_similarity is None:
+                # Not enough candidates survived the probe and filters
+                scored = None
+
+        if scored is None:
+            # Exact search over every row
+            scored = self._score_candidates(
+                table_name, vector_column, vectors, target_vector, metric, where_clause, params
+            )
+
+        positions, scores = scored
+        with np.errstate(invalid="ignore"):
+            keep = np.ones(len(scores), dtype=bool)
+            if parsed["min_score"] is not None:
+                keep &= scores >= parsed["min_score"]
+            if parsed["max_score"] is not None:
+                keep &= scores <= parsed["max_score"]
+        if not keep.all():
+            positions, scores = positions[keep], scores[keep]
+
+        # Keep only the top `limit` rows, then read just those rows back
+        top_indices = top_k_indices(scores if parsed["descending"] else -scores, k)
+        rowids = vectors.rowids[positions[top_indices]]
+        if table_columns:
+            result = self._fetch_rows_by_rowid(", ".join(table_columns), table_name, rowids)
+        else:
+            result = [() for _ in top_indices]
+        if score_positions:
+            top_scores = scores[top_indices].tolist()
+            for i, row in enumerate(result):
+                row = list(row)
+                for position in score_positions:
+                    row.insert(position, top_scores[i])
+                result[i] = tuple(row)
 
         if generate_proof:
             circuit, proof = generate_proof_of_membership(False, False, [])
             return result, circuit, proof
         return result
 
+    def close(self):
+        """
+        Close the in-memory database. A change tracker or working set passed in
+        belongs to the caller, who closes it.
+        """
+        if self.working_set is None:
+            self.conn.close()
+
     def __del__(self):
         if hasattr(self, "conn"):
-            self.conn.close()
+            self.close()
@@ -0,0 +1,554 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from zerokdb.vector_search import METRICS
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<quoted>"(?:[^"]|"")*"|`[^`]*`)
+    |(?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    |(?P<name>[A-Za-z_][A-Za-z0-9_$]*)
+    |(?P<param>\?\d*|[:@$][A-Za-z0-9_]+)
+    |(?P<op>->>|->|\|\||<<|>>|<=|>=|<>|!=|==|[-+*/%<>=(),.;\[\]~&|])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Keywords that end an expression at parenthesis depth 0
+_CLAUSE_KEYWORDS = {
+    "FROM", "WHERE", "GROUP", "HAVING", "WINDOW", "ORDER", "LIMIT", "OFFSET", "UNION", "INTERSECT", "EXCEPT",
+}
+_JOIN_MODIFIERS = {"NATURAL", "LEFT", "RIGHT", "FULL", "OUTER", "INNER", "CROSS"}
+_JOIN_KEYWORDS = _JOIN_MODIFIERS | {"JOIN", "ON", "USING"}
+# Options of a vector search, accepted after its similarity clause
+_VECTOR_OPTIONS = {"MIN_SCORE", "MAX_SCORE", "USING", "EXACT", "NPROBE", "EF", "RERANK"}
+_SUBQUERY_KEYWORDS = {"SELECT", "WITH", "VALUES"}
+# Functions whose result is not fixed by the query and the table contents
+_VOLATILE_FUNCTIONS = {
+    "RANDOM", "RANDOMBLOB", "CHANGES", "TOTAL_CHANGES", "LAST_INSERT_ROWID",
+    "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP",
+}
+_RESERVED = _CLAUSE_KEYWORDS | _JOIN_KEYWORDS | {
+    "AND", "OR", "NOT", "IS", "IN", "LIKE", "GLOB", "REGEXP", "MATCH", "BETWEEN", "CASE", "WHEN", "THEN",
+    "ELSE", "END", "NULL", "TRUE", "FALSE", "DISTINCT", "ALL", "COLLATE", "ESCAPE", "AS", "EXISTS", "CAST",
+    "ISNULL", "NOTNULL", "COSINE", "INDEXED",
+}
+
+
+def _tokenize(query: str) -> List[tuple]:
+    """
+    Split a query into (kind, value, start, end) tokens. Quoted identifiers are
+    unquoted and never taken for keywords.
+    """
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if not match:
+            raise ValueError(f"Unexpected character {query[position]!r} in query")
+        kind, value = match.lastgroup, match.group()
+        if kind == "quoted":
+            value = value[1:-1].replace('""', '"')
+        if kind != "space":
+            tokens.append((kind, value, match.start(), match.end()))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = _tokenize(query)
+        self.pos = 0
+        # Every table named anywhere in the statement, and the CTEs it defines
+        self.tables: List[str] = []
+        self.ctes: List[str] = []
+
+    def peek(self, offset: int = 0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def keyword(self, offset: int = 0) -> Optional[str]:
+        token = self.peek(offset)
+        return token[1].upper() if token and token[0] == "name" else None
+
+    def at(self, *words: str) -> bool:
+        return all(self.keyword(i) == word for i, word in enumerate(words))
+
+    def accept(self, *words: str) -> bool:
+        if not self.at(*words):
+            return False
+        self.pos += len(words)
+        return True
+
+    def expect(self, *words: str):
+        if not self.accept(*words):
+            raise self.error(f"Expected {' '.join(words)}")
+
+    def at_op(self, op: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token is not None and token[0] == "op" and token[1] == op
+
+    def accept_op(self, op: str) -> bool:
+        if not self.at_op(op):
+            return False
+        self.pos += 1
+        return True
+
+    def expect_op(self, op: str):
+        if not self.accept_op(op):
+            raise self.error(f"Expected {op!r}")
+
+    def error(self, message: str = "Invalid SQL syntax") -> ValueError:
+        token = self.peek()
+        return ValueError(f"{message} near {token[1]!r}" if token else f"{message} at end of query")
+
+    def text(self, start: int, end: int) -> str:
+        if end <= start:
+            return ""
+        return self.query[self.tokens[start][2]:self.tokens[end - 1][3]]
+
+    def name(self) -> str:
+        token = self.peek()
+        if token is None or token[0] not in ("name", "quoted"):
+            raise self.error("Expected a name")
+        self.pos += 1
+        return token[1]
+
+    def qualified_name(self) -> str:
+        # Tables live in the main schema, so `schema.table` names `table`
+        name = self.name()
+        if self.accept_op("."):
+            name = self.name()
+        return name
+
+    def integer(self) -> int:
+        token = self.peek()
+        if token is None or token[0] != "number" or not token[1].isdigit():
+            raise self.error("Expected an integer")
+        self.pos += 1
+        return int(token[1])
+
+    def alias(self) -> Optional[str]:
+        if self.accept("AS"):
+            return self.name()
+        token = self.peek()
+        if token and (token[0] == "quoted" or (token[0] == "name" and token[1].upper() not in _RESERVED)):
+            self.pos += 1
+            return token[1]
+        return None
+
+    def expression(self, stop=()) -> str:
+        """
+        Skip one expression and return its text. It ends at a comma, closing
+        parenthesis or clause keyword outside any parentheses; subqueries in it
+        are parsed for their tables.
+        """
+        start = self.pos
+        depth = 0
+        while self.pos < len(self.tokens):
+            kind, value = self.tokens[self.pos][:2]
+            if kind == "op":
+                if value == "(" and self.keyword(1) in _SUBQUERY_KEYWORDS:
+                    self.pos += 1
+                    self.statement()
+                    self.expect_op(")")
+                    continue
+                if value in ("(", "["):
+                    depth += 1
+                elif value in (")", "]"):
+                    if depth == 0:
+                        break
+                    depth -= 1
+                elif depth == 0 and value in (",", ";"):
+                    break
+            elif depth == 0 and kind == "name":
+                word = value.upper()
+                if word in _CLAUSE_KEYWORDS or word in stop or (word == "COSINE" and self.at("COSINE", "SIMILARITY")):
+                    break
+            self.pos += 1
+        return self.text(start, self.pos)
+
+    def expression_list(self, stop=()) -> str:
+        start = self.pos
+        self.expression(stop)
+        while self.accept_op(","):
+            self.expression(stop)
+        return self.text(start, self.pos)
+
+    def parenthesized(self) -> List[str]:
+        self.expect_op("(")
+        items = [self.expression()]
+        while self.accept_op(","):
+            items.append(self.expression())
+        self.expect_op(")")
+        return items
+
+    def statement(self) -> Dict[str, Any]:
+        """
+        Parse a SELECT or VALUES statement with its CTEs and compound parts,
+        and return the clauses of its first part.
+        """
+        if self.accept("WITH"):
+            self.accept("RECURSIVE")
+            while True:
+                self.ctes.append(self.name())
+                if self.at_op("("):
+                    self.parenthesized()
+                self.expect("AS")
+                self.accept("NOT")
+                self.accept("MATERIALIZED")
+                self.expect_op("(")
+                self.statement()
+                self.expect_op(")")
+                if not self.accept_op(","):
+                    break
+        select = self.select_core()
+        while self.keyword() in ("UNION", "INTERSECT", "EXCEPT"):
+            self.pos += 1
+            self.accept("ALL")
+            part = self.select_core()
+            # ORDER BY and LIMIT of a compound select follow its last part
+            for key in ("order_by", "limit", "offset", "similarity"):
+                if part[key] is not None:
+                    select[key] = part[key]
+        return select
+
+    def select_core(self) -> Dict[str, Any]:
+        select = {
+            "columns": [],
+            "from": [],
+            "where": None,
+            "group_by": None,
+            "having": None,
+            "order_by": None,
+            "limit": None,
+            "offset": None,
+            "similarity": None,
+        }
+        if self.accept("VALUES"):
+            self.parenthesized()
+            while self.accept_op(","):
+                self.parenthesized()
+        else:
+            self.expect("SELECT")
+            if not self.accept("DISTINCT"):
+                self.accept("ALL")
+            select["columns"] = self.result_columns()
+            if self.accept("FROM"):
+                select["from"] = self.from_list()
+        self.clauses(select)
+        return select
+
+    def result_columns(self) -> List[Dict[str, Optional[str]]]:
+        columns = []
+        while True:
+            start = self.pos
+            if not self.expression():
+                raise self.error("Expected a result column")
+            columns.append(self.result_column(start, self.pos))
+            if not self.accept_op(","):
+                return columns
+
+    def result_column(self, start: int, end: int) -> Dict[str, Optional[str]]:
+        """
+        Describe one result column: its text, expression and alias, and for a
+        plain column reference (or `*`) the column and its table qualifier.
+        """
+        tokens = self.tokens[start:end]
+        alias = None
+        if len(tokens) >= 3 and tokens[-2][0] == "name" and tokens[-2][1].upper() == "AS":
+            alias = tokens[-1][1]
+            tokens = tokens[:-2]
+        elif len(tokens) >= 2 and _is_alias(tokens[-1]) and _ends_operand(tokens[-2]):
+            alias = tokens[-1][1]
+            tokens = tokens[:-1]
+
+        table, column = None, None
+        kinds = [token[0] for token in tokens]
+        if len(tokens) == 1 and (tokens[0][1] == "*" or kinds[0] in ("name", "quoted")):
+            column = tokens[0][1]
+        elif len(tokens) == 3 and kinds[0] in ("name", "quoted") and tokens[1][1] == ".":
+            if tokens[2][1] == "*" or kinds[2] in ("name", "quoted"):
+                table, column = tokens[0][1], tokens[2][1]
+        return {
+            "text": self.text(start, end),
+            "expression": self.text(start, start + len(tokens)),
+            "alias": alias,
+            "table": table,
+            "column": column,
+        }
+
+    def from_list(self) -> List[Dict[str, Any]]:
+        entries = self.table_or_subquery(None)
+        while True:
+            if self.accept_op(","):
+                join = ","
+            else:
+                start = self.pos
+                while self.keyword() in _JOIN_MODIFIERS:
+                    self.pos += 1
+                if not self.accept("JOIN"):
+                    self.pos = start
+                    return entries
+                join = " ".join(token[1].upper() for token in self.tokens[start:self.pos])
+            joined = self.table_or_subquery(join)
+            if self.accept("ON"):
+                joined[-1]["on"] = self.expression(_JOIN_KEYWORDS)
+            elif self.accept("USING"):
+                joined[-1]["using"] = [column.strip() for column in self.parenthesized()]
+            entries.extend(joined)
+
+    def table_or_subquery(self, join: Optional[str]) -> List[Dict[str, Any]]:
+        if self.accept_op("("):
+            if self.keyword() in _SUBQUERY_KEYWORDS:
+                self.statement()
+                self.expect_op(")")
+                entries = [{"table": None, "alias": self.alias()}]
+            else:
+                entries = self.from_list()
+                self.expect_op(")")
+                self.alias()
+        else:
+            table = self.qualified_name()
+            if self.at_op("("):
+                # Table-valued function
+                self.parenthesized()
+                entries = [{"table": None, "alias": self.alias()}]
+            else:
+                self.tables.append(table)
+                entries = [{"table": table, "alias": self.alias()}]
+                if self.accept("INDEXED", "BY"):
+                    self.name()
+                else:
+                    self.accept("NOT", "INDEXED")
+        entries[0]["join"] = join
+        for entry in entries:
+            entry.setdefault("join", None)
+            entry.setdefault("on", None)
+            entry.setdefault("using", None)
+        return entries
+
+    def clauses(self, select: Dict[str, Any]):
+        while True:
+            stop = _VECTOR_OPTIONS if select["similarity"] else ()
+            if self.accept("WHERE"):
+                select["where"] = self.expression(stop)
+            elif self.accept("GROUP", "BY"):
+                select["group_by"] = self.expression_list(stop)
+            elif self.accept("HAVING"):
+                select["having"] = self.expression(stop)
+            elif self.accept("ORDER", "BY"):
+                self.order_by(select)
+            elif self.accept("LIMIT"):
+                select["limit"] = _limit(self.expression(stop))
+                if self.accept_op(","):
+                    # LIMIT offset, count
+                    select["offset"], select["limit"] = select["limit"], _limit(self.expression(stop))
+                elif self.accept("OFFSET"):
+                    select["offset"] = _limit(self.expression(stop))
+            elif self.accept("OFFSET"):
+                select["offset"] = _limit(self.expression(stop))
+            elif self.accept("COSINE", "SIMILARITY"):
+                vector_column = self.name()
+                self.expect("WITH")
+                target_vector = self.expression(_VECTOR_OPTIONS)
+                select["similarity"] = _similarity("cosine_similarity", vector_column, target_vector, None)
+            elif select["similarity"] and self.keyword() in _VECTOR_OPTIONS:
+                self.vector_option(select["similarity"])
+            else:
+                return
+
+    def order_by(self, select: Dict[str, Any]):
+        """
+        Parse ORDER BY. A single `<metric>(column, vector) [ASC|DESC]` term is
+        a similarity clause; anything else is kept as SQL.
+        """
+        start = self.pos
+        metric = (self.keyword() or "").lower()
+        if metric in METRICS and self.at_op("(", 1):
+            self.pos += 2
+            vector_column = self.name()
+            if self.accept_op(","):
+                target_vector = self.expression()
+                if self.accept_op(")"):
+                    direction = self.keyword() if self.keyword() in ("ASC", "DESC") else None
+                    if direction:
+                        self.pos += 1
+                    if not self.at_op(","):
+                        select["similarity"] = _similarity(metric, vector_column, target_vector, direction)
+                        return
+            self.pos = start
+        select["order_by"] = self.expression_list()
+
+    def vector_option(self, similarity: Dict[str, Any]):
+        option = self.keyword()
+        self.pos += 1
+        if option in ("MIN_SCORE", "MAX_SCORE"):
+            start = self.pos
+            if not self.accept_op("-"):
+                self.accept_op("+")
+            token = self.peek()
+            if token is None or token[0] != "number":
+                raise self.error(f"Expected a number after {option}")
+            self.pos += 1
+            similarity[option.lower()] = float(self.text(start, self.pos).replace(" ", ""))
+        elif option == "USING":
+            self.expect("INDEX")
+            similarity["index_name"] = self.name()
+        elif option == "EXACT":
+            similarity["exact"] = True
+        else:
+            similarity[option.lower()] = self.integer()
+
+    def insert(self) -> Dict[str, Any]:
+        """
+        Parse INSERT and REPLACE. The statement carries its `conflict` action
+        (REPLACE, IGNORE, ... or None) and the `source` SQL of its rows, a VALUES
+        or SELECT statement (None for DEFAULT VALUES).
+        """
+        conflict = None
+        if self.accept("REPLACE"):
+            conflict = "REPLACE"
+        else:
+            self.expect("INSERT")
+            if self.accept("OR"):
+                conflict = self.name().upper()
+        self.expect("INTO")
+        table = self.qualified_name()
+        self.tables.append(table)
+        # Only AS introduces an alias here, or VALUES would be taken for one
+        if self.accept("AS"):
+            self.name()
+        columns = None
+        if self.at_op("("):
+            columns = [column.strip() for column in self.parenthesized()]
+        source = None
+        if not self.accept("DEFAULT", "VALUES"):
+            start = self.pos
+            self.statement()
+            source = self.text(start, self.pos)
+        return {"kind": "insert", "table_name": table, "columns": columns, "conflict": conflict, "source": source}
+
+    def create(self) -> Dict[str, Any]:
+        self.expect("CREATE")
+        if self.accept("VECTOR", "INDEX"):
+            index_name = self.name()
+            self.expect("ON")
+            table = self.qualified_name()
+            self.tables.append(table)
+            self.parenthesized()
+            self.expect("USING")
+            self.name()
+            if self.accept("WITH"):
+                self.parenthesized()
+            return {"kind": "create_vector_index", "table_name": table, "index_name": index_name}
+
+        if not self.accept("TEMP"):
+            self.accept("TEMPORARY")
+        self.expect("TABLE")
+        self.accept("IF", "NOT", "EXISTS")
+        table = self.qualified_name()
+        self.tables.append(table)
+        if self.accept("AS"):
+            self.statement()
+        else:
+            self.parenthesized()
+            # Table options such as WITHOUT ROWID and STRICT
+            while self.peek() is not None and not self.at_op(";"):
+                self.pos += 1
+        return {"kind": "create_table", "table_name": table}
+
+
+def _is_alias(token) -> bool:
+    return token[0] == "quoted" or (token[0] == "name" and token[1].upper() not in _RESERVED)
+
+
+def _ends_operand(token) -> bool:
+    kind, value = token[:2]
+    if kind == "name":
+        return value.upper() not in _RESERVED or value.upper() in ("END", "NULL", "TRUE", "FALSE")
+    return kind in ("quoted", "string", "number") or value == ")"
+
+
+def _limit(text: str):
+    # Literal limits are ints; anything else (e.g. a parameter) stays SQL
+    return int(text) if text.isdigit() else text
+
+
+def _similarity(metric: str, vector_column: str, target_vector: str, direction: Optional[str]) -> Dict[str, Any]:
+    return {
+        "metric": metric,
+        "vector_column": vector_column,
+        "target_vector": target_vector,
+        "descending": METRICS[metric] if direction is None else direction == "DESC",
+        "min_score": None,
+        "max_score": None,
+        "index_name": None,
+        "exact": False,
+        "nprobe": None,
+        "ef": None,
+        "rerank": None,
+    }
+
+
+@lru_cache(maxsize=256)
+def parse_sql(query: str) -> Dict[str, Any]:
+    """
+    Parse a statement into a dict describing it. Every statement has a `kind`
+    ("select", "insert", "create_table", "create_vector_index", or the
+    lowercased first keyword of statements that are not supported), the
+    `table_name` it targets and `tables`, every table it reads or writes
+    (including those of joins and subqueries, excluding CTEs).
+
+    Supported statements also carry their `normalized` text (keywords and
+    names uppercased, whitespace and comments collapsed) and whether they are
+    `volatile`, i.e. call a function such as random() or read the clock.
+
+    INSERT statements also carry their target `columns` (None for all of
+    them), `conflict` action and the `source` SQL of their rows.
+
+    SELECT statements also carry their result `columns`, `from` entries, the
+    SQL of their `where`, `group_by`, `having` and `order_by` clauses, `limit`
+    and `offset`, and the vector search `similarity` clause if they have one.
+
+    Results are cached and shared: treat them as read-only.
+    """
+    parser = _Parser(query)
+    keyword = parser.keyword()
+    if keyword in _SUBQUERY_KEYWORDS:
+        parsed = parser.statement()
+        ctes = {cte.lower() for cte in parser.ctes}
+        parsed["kind"] = "select"
+        parsed["table_name"] = next(
+            (entry["table"] for entry in parsed["from"] if entry["table"] and entry["table"].lower() not in ctes),
+            None,
+        )
+    elif keyword in ("INSERT", "REPLACE"):
+        parsed = parser.insert()
+    elif keyword == "CREATE":
+        parsed = parser.create()
+    else:
+        return {"kind": (keyword or "").lower(), "table_name": None, "tables": []}
+
+    parser.accept_op(";")
+    if parser.peek() is not None:
+        raise parser.error()
+    ctes = {cte.lower() for cte in parser.ctes}
+    tables = []
+    for table in parser.tables:
+        if table.lower() not in ctes and table.lower() not in (seen.lower() for seen in tables):
+            tables.append(table)
+    parsed["tables"] = tables
+    parsed["ctes"] = parser.ctes
+    parsed["normalized"] = " ".join(
+        value.upper() if kind == "name" else query[start:end] for kind, value, start, end in parser.tokens
+    )
+    parsed["volatile"] = any(
+        (kind == "name" and value.upper() in _VOLATILE_FUNCTIONS) or (kind == "string" and value.lower() == "'now'")
+        for kind, value, _, _ in parser.tokens
+    )
+    return parsed
@@ -1,16 +1,128 @@
-from transformers import AutoTokenizer, AutoModel
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+from zerokdb.embedding_cache import embedding_cache
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide cache of tokenizer and model pairs.
+
+    Each model is loaded once, on first use, and shared by every thread;
+    transformers (and with it torch) is only imported when a model is loaded.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Tuple[Any, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME) -> Tuple[Any, Any]:
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        with self._lock:
+            lock = self._locks.setdefault(model_name, threading.Lock())
+        # Concurrent first requests wait for a single load instead of racing
+        with lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._load(model_name)
+                self._models[model_name] = model
+        return model
+
+    def is_loaded(self, model_name: str = DEFAULT_MODEL_NAME) -> bool:
+        return model_name in self._models
+
+    def warm_up(self, model_name: str = DEFAULT_MODEL_NAME):
+        """
+        Load a model and run one inference so the first request pays no setup cost.
+        The embedding cache is bypassed: a cached "warm up" would skip the model.
+        """
+        TextToEmbedding(model_name, registry=self, cache=None).convert("warm up")
+
+    def _load(self, model_name: str) -> Tuple[Any, Any]:
+        from transformers import AutoModel, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        return tokenizer, model
+
+
+model_registry = EmbeddingModelRegistry()
 
 
 class TextToEmbedding:
-    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2"):
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name)
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, registry=None, cache=embedding_cache):
+        self.model_name = model_name
+        self.registry = registry or model_registry
+        # Pass cache=None to always run the model
+        self.cache = cache
+
+    @property
+    def tokenizer(self):
+        return self.registry.get(self.model_name)[0]
+
+    @property
+    def model(self):
+        return self.registry.get(self.model_name)[1]
 
     def convert(self, text):
-        inputs = self.tokenizer(
-            text, return_tensors="pt", padding=True, truncation=True
-        )
-        outputs = self.model(**inputs)
-        # Mean pooling to get the sentence embedding
-        embeddings = outputs.last_hidden_state.mean(dim=1)
-        return embeddings.detach().numpy().tolist()[0]
+        return self.convert_batch([text])[0]
+
+    def convert_batch(self, texts: Sequence[str], batch_size: int = 32) -> List[List[float]]:
+        """
+        Embed many texts with one forward pass per `batch_size` texts.
+
+        Cached embeddings are returned without running the model; the remaining
+        texts are tokenized once and sorted by token count, so each batch is
+        padded to similar lengths. Embeddings come back in input order.
+        """
+        texts = list(texts)
+        if self.cache is None:
+            return self._embed(texts, batch_size)
+
+        embeddings = self.cache.get_many(self.model_name, texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            computed = dict(zip(missing, self._embed(missing, batch_size)))
+            self.cache.put_many(self.model_name, missing, [computed[text] for text in missing])
+            embeddings = [
+                computed[text] if embedding is None else embedding
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
+
+    def _embed(self, texts: List[str], batch_size: int) -> List[List[float]]:
+        if not texts:
+            return []
+        import torch
+
+        tokenizer, model = self.registry.get(self.model_name)
+        encoded = tokenizer(list(texts), truncation=True)
+        features = [
+            {key: values[i] for key, values in encoded.items()} for i in range(len(texts))
+        ]
+        order = sorted(range(len(texts)), key=lambda i: len(features[i]["input_ids"]))
+
+        embeddings: List[List[float]] = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start: start + batch_size]
+            inputs = tokenizer.pad([features[i] for i in batch], return_tensors="pt")
+            with torch.inference_mode():
+                outputs = model(**inputs)
+            pooled = mean_pool(outputs.last_hidden_state, inputs["attention_mask"])
+            for i, embedding in zip(batch, pooled.numpy().tolist()):
+                embeddings[i] = embedding
+        return embeddings
+
+
+def mean_pool(hidden_states, attention_mask):
+    """
+    Average the token embeddings of each text, leaving out padding tokens.
+    """
+    mask = attention_mask.unsqueeze(-1).to(hidden_states.dtype)
+    return (hidden_states * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
@@ -0,0 +1,607 @@
+import base64
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from zerokdb.vector_search import top_k_indices
+
+# Approximate nearest-neighbour indexes over a vector column. Indexes are built
+# over the column's rows in table order and only return candidate row positions;
+# the caller scores candidates exactly, so results never depend on index quality
+# beyond which rows get considered. Quantized indexes additionally hold a
+# compressed copy of every vector and rank the shortlist they return from it.
+
+# Rows scored per block when decoding compressed codes
+_BLOCK_SIZE = 16384
+
+# HNSW graphs are built one insertion at a time (several seconds per 5000 rows
+# of 384 dimensions); larger columns get an IVF index instead
+HNSW_MAX_ROWS = 10000
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scale every row to unit length so cosine similarity becomes a dot product.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _encode_array(array: np.ndarray, dtype: str) -> str:
+    return base64.b64encode(np.ascontiguousarray(array, dtype=dtype).tobytes()).decode(
+        "ascii"
+    )
+
+
+def _decode_array(value: str, dtype: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=dtype)
+
+
+def _assign(data: np.ndarray, centroids: np.ndarray, spherical: bool) -> np.ndarray:
+    # Nearest centroid by dot product (spherical) or by Euclidean distance
+    offsets = 0 if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    return np.concatenate(
+        [
+            np.argmax(block @ centroids.T - offsets, axis=1)
+            for block in np.array_split(data, max(1, len(data) // _BLOCK_SIZE))
+        ]
+    )
+
+
+def _kmeans(
+    data: np.ndarray, clusters: int, iterations: int, rng, spherical: bool
+) -> np.ndarray:
+    centroids = data[rng.choice(len(data), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(data, centroids, spherical)
+        counts = np.bincount(assignments, minlength=clusters)
+        filled = counts > 0
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[
+            filled, None
+        ]
+        # Re-seed empty clusters so every centroid stays useful
+        centroids[~filled] = data[rng.integers(len(data), size=int((~filled).sum()))]
+        if spherical:
+            centroids = normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: rows are clustered with spherical k-means and a query
+    only scans the rows of its `nprobe` closest clusters. Each cluster keeps the
+    largest angle between its rows and its centroid, so clusters that cannot
+    hold a row reaching `min_score` are skipped without being scanned.
+    """
+
+    kind = "ivf"
+    quantized = False
+
+    def __init__(self, nlist: int = 64, nprobe: int = 8, iterations: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.list_offsets = np.zeros(1, dtype=np.int32)
+        self.list_rows = np.empty(0, dtype=np.int32)
+        self.list_radius = np.empty(0, dtype=np.float32)
+        self.row_count = 0
+
+    def build(self, vectors: np.ndarray) -> "IVFIndex":
+        vectors = normalize_rows(vectors)
+        self.row_count = len(vectors)
+        if self.row_count == 0:
+            return self
+        nlist = max(1, min(self.nlist, self.row_count))
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a bounded sample, then assign every row to its closest centroid
+        sample_size = min(self.row_count, nlist * 256)
+        sample = vectors[rng.choice(self.row_count, sample_size, replace=False)]
+        centroids = _kmeans(sample, nlist, self.iterations, rng, spherical=True)
+        assignments = _assign(vectors, centroids, spherical=True)
+        self.centroids = centroids
+        self.list_rows = np.argsort(assignments, kind="stable").astype(np.int32)
+        counts = np.bincount(assignments, minlength=nlist)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+        angles = np.arccos(
+            np.clip(np.einsum("ij,ij->i", vectors, centroids[assignments]), -1, 1)
+        )
+        self.list_radius = np.zeros(nlist, dtype=np.float32)
+        np.maximum.at(self.list_radius, assignments, angles.astype(np.float32))
+        return self
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        vectors: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        ef: Optional[int] = None,
+        rerank: Optional[int] = None,
+        min_score: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Return the row positions stored in the `nprobe` lists closest to `query`,
+        leaving out lists whose best possible cosine similarity is below `min_score`.
+        """
+        if self.row_count == 0:
+            return np.empty(0, dtype=np.int64)
+        nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+        centroid_scores = self.centroids @ normalize_rows(query)
+        probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        if min_score is not None:
+            # Triangle inequality on angles bounds the similarity of every list row
+            angles = np.arccos(np.clip(centroid_scores[probed], -1, 1))
+            bounds = np.cos(np.maximum(angles - self.list_radius[probed], 0))
+            probed = probed[bounds >= min_score - 1e-6]
+        positions = [
+            self.list_rows[self.list_offsets[cluster]: self.list_offsets[cluster + 1]]
+            for cluster in probed
+        ]
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(positions)).astype(np.int64)
+
+    def memory_bytes(self) -> int:
+        return (
+            self.centroids.nbytes
+            + self.list_offsets.nbytes
+            + self.list_rows.nbytes
+            + self.list_radius.nbytes
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "iterations": self.iterations,
+            "seed": self.seed,
+            "row_count": self.row_count,
+            "dimension": int(self.centroids.shape[1]) if self.centroids.size else 0,
+            "centroids": _encode_array(self.centroids, "<f4"),
+            "list_offsets": _encode_array(self.list_offsets, "<i4"),
+            "list_rows": _encode_array(self.list_rows, "<i4"),
+            "list_radius": _encode_array(self.list_radius, "<f4"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IVFIndex":
+        index = cls(data["nlist"], data["nprobe"], data["iterations"], data["seed"])
+        index.row_count = data["row_count"]
+        index.centroids = _decode_array(data["centroids"], "<f4").reshape(
+            -1, data["dimension"] or 1
+        )
+        index.list_offsets = _decode_array(data["list_offsets"], "<i4")
+        index.list_rows = _decode_array(data["list_rows"], "<i4")
+        if "list_radius" in data:
+            index.list_radius = _decode_array(data["list_radius"], "<f4")
+        else:
+            # Indexes built before radii were stored can never skip a list
+            index.list_radius = np.full(len(index.centroids), np.pi, dtype=np.float32)
+        return index
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small world graph. Queries descend the upper layers
+    greedily and run a best-first search of width `ef` on the bottom layer.
+
+    Each layer's links are kept as a matrix of neighbor ids (padded with -1),
+    so a search step gathers and scores the neighbors of several nodes with
+    a few numpy operations instead of one Python iteration per neighbor.
+    """
+
+    kind = "hnsw"
+    quantized = False
+    # Nodes expanded together by one step of a layer search
+    expand = 32
+
+    def __init__(self, m: int = 16, ef_construction: int = 100, ef_search: int = 64, seed: int = 0):
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self.layers: List[Dict[int, List[int]]] = []
+        self.entry_point: Optional[int] = None
+        self.row_count = 0
+        self.dimension = 0
+        self._adjacency: Optional[List[np.ndarray]] = None
+
+    def _max_neighbors(self, layer: int) -> int:
+        return self.m * 2 if layer == 0 else self.m
+
+    def _adjacency_matrices(self) -> List[np.ndarray]:
+        if self._adjacency is None:
+            matrices = []
+            for layer, graph in enumerate(self.layers):
+                matrix = np.full((self.row_count, self._max_neighbors(layer)), -1, dtype=np.int64)
+                for node, links in graph.items():
+                    matrix[node, : len(links)] = links
+                matrices.append(matrix)
+            self._adjacency = matrices
+        return self._adjacency
+
+    def _search_layer(self, vectors, query, entry_points, ef, adjacency, visited=None):
+        """
+        Return the (nodes, scores) of the `ef` nodes of a layer closest to
+        `query`, best first. The best nodes not expanded yet are expanded
+        `expand` at a time until every kept node has been; `visited` is a
+        scratch mask over all rows, left cleared.
+        """
+        if visited is None:
+            visited = np.zeros(len(vectors), dtype=bool)
+        nodes = np.asarray(entry_points, dtype=np.int64)
+        seen = [nodes]
+        visited[nodes] = True
+        scores = vectors[nodes] @ query
+        expanded = np.zeros(len(nodes), dtype=bool)
+        while True:
+            order = np.argsort(-scores, kind="stable")[:ef]
+            nodes, scores, expanded = nodes[order], scores[order], expanded[order]
+            pending = np.flatnonzero(~expanded)[: self.expand]
+            if not len(pending):
+                break
+            expanded[pending] = True
+            neighbors = adjacency[nodes[pending]].ravel()
+            neighbors = neighbors[neighbors >= 0]
+            neighbors = np.unique(neighbors[~visited[neighbors]])
+            if not len(neighbors):
+                continue
+            visited[neighbors] = True
+            seen.append(neighbors)
+            nodes = np.concatenate([nodes, neighbors])
+            scores = np.concatenate([scores, vectors[neighbors] @ query])
+            expanded = np.concatenate([expanded, np.zeros(len(neighbors), dtype=bool)])
+        for touched in seen:
+            visited[touched] = False
+        return nodes, scores
+
+    def _link(self, vectors, adjacency, counts, node, neighbors, layer):
+        adjacency[node, : len(neighbors)] = neighbors
+        counts[node] = len(neighbors)
+        limit = self._max_neighbors(layer)
+        for neighbor in neighbors.tolist():
+            if counts[neighbor] < limit:
+                adjacency[neighbor, counts[neighbor]] = node
+                counts[neighbor] += 1
+            else:
+                # Keep the neighbor's `limit` closest links
+                links = np.append(adjacency[neighbor], node)
+                scores = vectors[links] @ vectors[neighbor]
+                adjacency[neighbor] = links[np.argsort(-scores, kind="stable")[:limit]]
+
+    def build(self, vectors: np.ndarray) -> "HNSWIndex":
+        vectors = normalize_rows(vectors)
+        self.row_count = len(vectors)
+        self.dimension = vectors.shape[1] if vectors.ndim == 2 else 0
+        self.layers = []
+        self.entry_point = None
+        self._adjacency = None
+        if not self.row_count:
+            return self
+        rng = np.random.default_rng(self.seed)
+        level_multiplier = 1 / math.log(max(self.m, 2))
+        levels = np.floor(-np.log(1 - rng.random(self.row_count)) * level_multiplier).astype(int)
+        adjacency = [
+            np.full((self.row_count, self._max_neighbors(layer)), -1, dtype=np.int64)
+            for layer in range(int(levels.max()) + 1)
+        ]
+        counts = [np.zeros(self.row_count, dtype=np.int64) for _ in adjacency]
+        visited = np.zeros(self.row_count, dtype=bool)
+
+        self.entry_point = 0
+        for node in range(1, self.row_count):
+            level = int(levels[node])
+            query = vectors[node]
+            entry = [self.entry_point]
+            top_level = int(levels[self.entry_point])
+            for layer in range(top_level, level, -1):
+                entry = self._search_layer(vectors, query, entry, 1, adjacency[layer], visited)[0]
+            for layer in range(min(level, top_level), -1, -1):
+                found, _ = self._search_layer(vectors, query, entry, self.ef_construction, adjacency[layer], visited)
+                self._link(vectors, adjacency[layer], counts[layer], node, found[: self.m], layer)
+                entry = found
+            if level > top_level:
+                self.entry_point = node
+
+        for layer, (matrix, layer_counts) in enumerate(zip(adjacency, counts)):
+            self.layers.append(
+                {
+                    node: matrix[node, : layer_counts[node]].tolist()
+                    for node in np.flatnonzero(levels >= layer).tolist()
+                }
+            )
+        self._adjacency = adjacency
+        return self
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        vectors: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        ef: Optional[int] = None,
+        rerank: Optional[int] = None,
+        min_score: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Return the positions of the `ef` best rows found by the graph search.
+        `vectors` must hold the indexed rows, already normalized.
+        """
+        if self.entry_point is None:
+            return np.empty(0, dtype=np.int64)
+        if vectors is None:
+            raise ValueError("HNSW search needs the indexed vectors")
+        vectors = vectors[: self.row_count]
+        query = normalize_rows(query)
+        ef = max(ef or self.ef_search, k)
+        adjacency = self._adjacency_matrices()
+        entry = [self.entry_point]
+        for layer in range(len(self.layers) - 1, 0, -1):
+            entry = self._search_layer(vectors, query, entry, 1, adjacency[layer])[0]
+        found, _ = self._search_layer(vectors, query, entry, ef, adjacency[0])
+        return np.sort(found)
+
+    def memory_bytes(self) -> int:
+        # Node ids and edges as 32-bit integers
+        return 4 * sum(len(graph) + sum(map(len, graph.values())) for graph in self.layers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        layers = []
+        for graph in self.layers:
+            nodes = sorted(graph)
+            lengths = [len(graph[node]) for node in nodes]
+            edges = [neighbor for node in nodes for neighbor in graph[node]]
+            layers.append(
+                {
+                    "nodes": _encode_array(np.array(nodes), "<i4"),
+                    "offsets": _encode_array(np.concatenate([[0], np.cumsum(lengths)]), "<i4"),
+                    "edges": _encode_array(np.array(edges), "<i4"),
+                }
+            )
+        return {
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "seed": self.seed,
+            "row_count": self.row_count,
+            "dimension": self.dimension,
+            "entry_point": self.entry_point,
+            "layers": layers,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HNSWIndex":
+        index = cls(data["m"], data["ef_construction"], data["ef_search"], data["seed"])
+        index.row_count = data["row_count"]
+        index.dimension = data["dimension"]
+        index.entry_point = data["entry_point"]
+        for layer in data["layers"]:
+            nodes = _decode_array(layer["nodes"], "<i4").tolist()
+            offsets = _decode_array(layer["offsets"], "<i4").tolist()
+            edges = _decode_array(layer["edges"], "<i4").tolist()
+            index.layers.append(
+                {
+                    node: edges[offsets[i]: offsets[i + 1]]
+                    for i, node in enumerate(nodes)
+                }
+            )
+        return index
+
+
+class ScalarQuantizer:
+    """
+    Scalar int8 quantization: every dimension of the normalized vectors is
+    mapped onto 256 levels between its minimum and maximum. A query ranks all
+    codes and returns the best `rerank` rows for exact re-ranking.
+    """
+
+    kind = "int8"
+    quantized = True
+
+    def __init__(self, rerank: int = 100):
+        self.rerank = rerank
+        self.minimum = np.empty(0, dtype=np.float32)
+        self.scale = np.empty(0, dtype=np.float32)
+        self.codes = np.empty((0, 0), dtype=np.uint8)
+        self.row_count = 0
+
+    def build(self, vectors: np.ndarray) -> "ScalarQuantizer":
+        vectors = normalize_rows(vectors)
+        self.row_count = len(vectors)
+        if self.row_count == 0:
+            return self
+        self.minimum = vectors.min(axis=0)
+        self.scale = (vectors.max(axis=0) - self.minimum) / 255
+        self.scale[self.scale == 0] = 1
+        self.codes = np.rint((vectors - self.minimum) / self.scale).astype(np.uint8)
+        return self
+
+    def approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of `query` to every row, computed from the codes.
+        """
+        query = normalize_rows(query)
+        scaled_query = query * self.scale
+        offset = float(query @ self.minimum)
+        scores = np.empty(self.row_count, dtype=np.float32)
+        for start in range(0, self.row_count, _BLOCK_SIZE):
+            block = self.codes[start: start + _BLOCK_SIZE].astype(np.float32)
+            scores[start: start + _BLOCK_SIZE] = block @ scaled_query + offset
+        return scores
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        vectors: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        ef: Optional[int] = None,
+        rerank: Optional[int] = None,
+        min_score: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Return the positions of the `rerank` rows with the best approximate scores.
+        """
+        if self.row_count == 0:
+            return np.empty(0, dtype=np.int64)
+        shortlist = max(rerank or self.rerank, k)
+        return np.sort(
+            np.array(top_k_indices(self.approximate_scores(query), shortlist), dtype=np.int64)
+        )
+
+    def memory_bytes(self) -> int:
+        return self.codes.nbytes + self.minimum.nbytes + self.scale.nbytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rerank": self.rerank,
+            "row_count": self.row_count,
+            "dimension": int(self.minimum.shape[0]),
+            "minimum": _encode_array(self.minimum, "<f4"),
+            "scale": _encode_array(self.scale, "<f4"),
+            "codes": _encode_array(self.codes, "u1"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ScalarQuantizer":
+        index = cls(data["rerank"])
+        index.row_count = data["row_count"]
+        index.minimum = _decode_array(data["minimum"], "<f4")
+        index.scale = _decode_array(data["scale"], "<f4")
+        index.codes = _decode_array(data["codes"], "u1").reshape(
+            index.row_count, data["dimension"]
+        )
+        return index
+
+
+class ProductQuantizer:
+    """
+    Product quantization: vectors are split into `m` sub-vectors, each encoded
+    as the id of its nearest centroid in a per-subspace codebook. Queries score
+    codes through one lookup table per subspace.
+    """
+
+    kind = "pq"
+    quantized = True
+
+    def __init__(self, m: int = 8, nbits: int = 8, iterations: int = 10, rerank: int = 100, seed: int = 0):
+        if not 1 <= nbits <= 8:
+            raise ValueError("nbits must be between 1 and 8")
+        self.m = m
+        self.nbits = nbits
+        self.iterations = iterations
+        self.rerank = rerank
+        self.seed = seed
+        self.codebooks = np.empty((0, 0, 0), dtype=np.float32)
+        self.codes = np.empty((0, 0), dtype=np.uint8)
+        self.row_count = 0
+
+    def build(self, vectors: np.ndarray) -> "ProductQuantizer":
+        vectors = normalize_rows(vectors)
+        self.row_count = len(vectors)
+        if self.row_count == 0:
+            return self
+        dimension = vectors.shape[1]
+        if dimension % self.m:
+            raise ValueError(f"Vector dimension {dimension} is not divisible by m={self.m}")
+        sub_dimension = dimension // self.m
+        centroids = min(2**self.nbits, self.row_count)
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(self.row_count, min(self.row_count, centroids * 256), replace=False)]
+
+        self.codebooks = np.empty((self.m, centroids, sub_dimension), dtype=np.float32)
+        self.codes = np.empty((self.row_count, self.m), dtype=np.uint8)
+        for j in range(self.m):
+            subspace = slice(j * sub_dimension, (j + 1) * sub_dimension)
+            self.codebooks[j] = _kmeans(
+                np.ascontiguousarray(sample[:, subspace]), centroids, self.iterations, rng, spherical=False
+            )
+            self.codes[:, j] = _assign(vectors[:, subspace], self.codebooks[j], spherical=False)
+        return self
+
+    def approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of `query` to every row, computed from the codes.
+        """
+        query = normalize_rows(query).reshape(self.m, -1)
+        # One table of sub-vector dot products per subspace
+        table = np.einsum("jkd,jd->jk", self.codebooks, query)
+        subspaces = np.arange(self.m)
+        scores = np.empty(self.row_count, dtype=np.float32)
+        for start in range(0, self.row_count, _BLOCK_SIZE):
+            codes = self.codes[start: start + _BLOCK_SIZE]
+            scores[start: start + _BLOCK_SIZE] = table[subspaces, codes].sum(axis=1)
+        return scores
+
+    search = ScalarQuantizer.search
+
+    def memory_bytes(self) -> int:
+        return self.codes.nbytes + self.codebooks.nbytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "m": self.m,
+            "nbits": self.nbits,
+            "iterations": self.iterations,
+            "rerank": self.rerank,
+            "seed": self.seed,
+            "row_count": self.row_count,
+            "codebook_shape": list(self.codebooks.shape),
+            "codebooks": _encode_array(self.codebooks, "<f4"),
+            "codes": _encode_array(self.codes, "u1"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProductQuantizer":
+        index = cls(data["m"], data["nbits"], data["iterations"], data["rerank"], data["seed"])
+        index.row_count = data["row_count"]
+        index.codebooks = _decode_array(data["codebooks"], "<f4").reshape(
+            data["codebook_shape"]
+        )
+        index.codes = _decode_array(data["codes"], "u1").reshape(index.row_count, index.m)
+        return index
+
+
+INDEX_TYPES = {
+    index_type.kind: index_type
+    for index_type in (IVFIndex, HNSWIndex, ScalarQuantizer, ProductQuantizer)
+}
+QUANTIZED_INDEX_TYPES = {kind for kind, index_type in INDEX_TYPES.items() if index_type.quantized}
+
+
+def build_index(kind: str, column: str, vectors: np.ndarray, **options) -> Dict[str, Any]:
+    """
+    Build an index over `vectors` and return its JSON-serializable payload, ready
+    to be stored in a table chunk's `indexes`. HNSW requests over more than
+    HNSW_MAX_ROWS rows build a default IVF index instead.
+    """
+    kind = kind.lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unsupported vector index type: {kind}")
+    if kind == HNSWIndex.kind and len(vectors) > HNSW_MAX_ROWS:
+        print(f"HNSW index over {len(vectors)} rows exceeds {HNSW_MAX_ROWS}; building an IVF index instead")
+        kind, options = IVFIndex.kind, {}
+    try:
+        index = INDEX_TYPES[kind](**options)
+    except TypeError as e:
+        raise ValueError(f"Invalid options for {kind} index: {e}")
+    index.build(vectors)
+    return {"type": kind, "column": column, "metric": "cosine", **index.to_dict()}
+
+
+def load_index(payload: Dict[str, Any]):
+    """
+    Rebuild an index object from its stored payload.
+    """
+    kind = payload.get("type")
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unsupported vector index type: {kind}")
+    return INDEX_TYPES[kind].from_dict(payload)
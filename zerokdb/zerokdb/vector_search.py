@@ -0,0 +1,228 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Supported metrics, mapped to whether larger scores rank first
+METRICS = {
+    "cosine_similarity": True,
+    "cosine_distance": False,
+    "inner_product": True,
+    "l2_distance": False,
+}
+
+
+def parse_vector(value: str) -> np.ndarray:
+    """
+    Parse a bracketed text embedding such as "[0.1, 0.2]" into a float32 vector.
+    """
+    return np.fromstring(value.strip().strip("[]"), dtype=np.float32, sep=",")
+
+
+def parse_vectors(values: Sequence[str]) -> np.ndarray:
+    """
+    Parse a batch of bracketed text embeddings into one (n, dim) float32 matrix.
+
+    All embeddings are joined and parsed in a single pass instead of one
+    `np.fromstring` call per row.
+    """
+    if not values:
+        return np.empty((0, 0), dtype=np.float32)
+
+    bodies = [value.strip().strip("[]") for value in values]
+    lengths = [body.count(",") + 1 if body.strip() else 0 for body in bodies]
+    if len(set(lengths)) != 1:
+        raise ValueError("All vectors must have the same dimension")
+
+    flat = np.fromstring(
+        ",".join(body for body in bodies if body.strip()), dtype=np.float32, sep=","
+    )
+    if flat.size != sum(lengths):
+        raise ValueError("Could not parse vector values")
+    return flat.reshape(len(values), lengths[0])
+
+
+def cosine_similarity(matrix: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """
+    Score every row of `matrix` against `target` with a single matrix-vector product.
+    """
+    if matrix.shape[0] == 0:
+        return np.empty(0, dtype=np.float32)
+    if matrix.shape[1] != target.shape[0]:
+        raise ValueError(
+            f"Vector dimension mismatch: {matrix.shape[1]} != {target.shape[0]}"
+        )
+    dots = matrix @ target
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(target)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return dots / norms
+
+
+def score_normalized(
+    matrix: np.ndarray, norms: np.ndarray, targets: np.ndarray, metric: str
+) -> np.ndarray:
+    """
+    Score unit-length rows (with their original `norms`) against every row of
+    `targets`, returning a (rows, targets) matrix.
+
+    Every metric comes out of the same matrix product: cosine uses the unit rows
+    directly, and the inner product and L2 distance are recovered by scaling it
+    with the stored norms, so vectors never have to be kept twice.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unsupported vector metric: {metric}")
+    if matrix.shape[0] == 0:
+        return np.empty((0, len(targets)), dtype=np.float32)
+    if matrix.shape[1] != targets.shape[1]:
+        raise ValueError(
+            f"Vector dimension mismatch: {matrix.shape[1]} != {targets.shape[1]}"
+        )
+
+    target_norms = np.linalg.norm(targets, axis=1)
+    if metric in ("cosine_similarity", "cosine_distance"):
+        scores = matrix @ (targets / np.where(target_norms == 0, 1, target_norms)[:, None]).T
+        # Zero-norm rows have no defined similarity; they rank last
+        scores[norms == 0] = np.nan
+        return scores if metric == "cosine_similarity" else 1 - scores
+
+    dots = (matrix @ targets.T) * norms[:, None]
+    if metric == "inner_product":
+        return dots
+    squared = norms[:, None] ** 2 + target_norms[None, :] ** 2 - 2 * dots
+    return np.sqrt(np.maximum(squared, 0))
+
+
+def score_vectors(matrix: np.ndarray, targets: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Score raw (not normalized) rows against every row of `targets` with `metric`.
+    """
+    norms = np.linalg.norm(matrix, axis=1)
+    return score_normalized(
+        matrix / np.where(norms == 0, 1, norms)[:, None], norms, targets, metric
+    )
+
+
+def top_k_indices(scores: np.ndarray, k: Optional[int] = None) -> List[int]:
+    """
+    Return the indices of the `k` highest scores, best first.
+
+    Uses a partial selection (argpartition) so only the candidates that can make
+    the cut get sorted. Ties keep their input order, which matches a stable
+    `list.sort(reverse=True)` over the same scores. NaN scores (zero-norm
+    vectors) rank last.
+    """
+    n = len(scores)
+    if n == 0 or (k is not None and k <= 0):
+        return []
+
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    if k is None or k >= n:
+        candidates = np.arange(n)
+    else:
+        partition = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[partition].min()
+        # Keep every tie with the k-th best score so input order can break them
+        candidates = np.flatnonzero(scores >= threshold)
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k].tolist()
+
+
+class NormalizedVectors:
+    """
+    Unit-length float32 rows of one vector column together with their SQLite
+    rowids, in rowid order. Rows are appended in place with amortized growth.
+    With `keep_matrix=False` only the rowids are kept, for columns whose
+    vectors are searched through a quantized index instead.
+    """
+
+    def __init__(self, version: Optional[str] = None, keep_matrix: bool = True):
+        self.version = version
+        self.keep_matrix = keep_matrix
+        self.size = 0
+        # Table shape when the rows were read, used to detect foreign writes
+        self.table_rows = 0
+        self.table_max_rowid = None
+        self._rowids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+
+    @property
+    def rowids(self) -> np.ndarray:
+        return self._rowids[: self.size]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[: self.size]
+
+    @property
+    def norms(self) -> np.ndarray:
+        return self._norms[: self.size]
+
+    @property
+    def last_rowid(self) -> Optional[int]:
+        return int(self._rowids[self.size - 1]) if self.size else None
+
+    def extend(self, rowids: np.ndarray, vectors: Optional[np.ndarray] = None):
+        """
+        Normalize and append rows whose rowids are greater than the stored ones.
+        """
+        count = len(rowids)
+        if count == 0:
+            return
+        if self.keep_matrix and vectors is None:
+            raise ValueError("Vectors are required when the matrix is kept")
+        if self.keep_matrix and self.size and vectors.shape[1] != self._matrix.shape[1]:
+            raise ValueError("All vectors must have the same dimension")
+
+        needed = self.size + count
+        if needed > len(self._rowids):
+            capacity = max(needed, 2 * len(self._rowids))
+            self._rowids = np.resize(self._rowids, capacity)
+            if self.keep_matrix:
+                matrix = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+                if self.size:
+                    matrix[: self.size] = self.matrix
+                self._matrix = matrix
+                self._norms = np.resize(self._norms, capacity)
+
+        self._rowids[self.size: needed] = rowids
+        if self.keep_matrix:
+            norms = np.linalg.norm(vectors, axis=1)
+            self._norms[self.size: needed] = norms
+            self._matrix[self.size: needed] = vectors / np.where(norms == 0, 1, norms)[:, None]
+        self.size = needed
+
+    def positions(self, rowids: np.ndarray) -> np.ndarray:
+        """
+        Map sorted rowids to row positions, dropping rowids that are not stored.
+        """
+        positions = np.searchsorted(self.rowids, rowids)
+        positions = positions[positions < self.size]
+        return positions[self.rowids[positions] == rowids[: len(positions)]]
+
+    def score(
+        self,
+        target: np.ndarray,
+        metric: str = "cosine_similarity",
+        positions: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Score the rows at `positions` (all rows by default) with one matrix product.
+        """
+        return self.score_many(target[None, :], metric, positions)[:, 0]
+
+    def score_many(
+        self,
+        targets: np.ndarray,
+        metric: str = "cosine_similarity",
+        positions: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Score the rows at `positions` against every row of `targets` with one
+        matrix-matrix product. Returns a (rows, targets) matrix.
+        """
+        if not self.keep_matrix:
+            raise ValueError("The normalized matrix is not kept for this column")
+        matrix = self.matrix if positions is None else self.matrix[positions]
+        norms = self.norms if positions is None else self.norms[positions]
+        return score_normalized(matrix, norms, targets, metric)
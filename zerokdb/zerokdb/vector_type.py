@@ -0,0 +1,104 @@
+import base64
+import re
+import sqlite3
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+# Vectors are stored as packed little-endian float32 values
+VECTOR_DTYPE = np.dtype("<f4")
+
+VectorValue = Union[bytes, bytearray, memoryview, str, Sequence[float], np.ndarray]
+
+_VECTOR_TYPE_PATTERN = re.compile(r"^\s*VECTOR\s*(?:\(\s*(\d+)\s*\))?\s*$", re.IGNORECASE)
+_LIST_FLOAT_TYPE = "LIST[FLOAT]"
+
+
+def is_vector_type(column_type: Optional[str]) -> bool:
+    """
+    Return True for `VECTOR`, `VECTOR(n)` and `list[float]` column types.
+    """
+    if not column_type:
+        return False
+    return bool(_VECTOR_TYPE_PATTERN.match(column_type)) or (
+        column_type.strip().upper() == _LIST_FLOAT_TYPE
+    )
+
+
+def vector_dimension(column_type: str) -> Optional[int]:
+    """
+    Return the declared dimension of a `VECTOR(n)` column type, if any.
+    """
+    match = _VECTOR_TYPE_PATTERN.match(column_type or "")
+    if match and match.group(1):
+        return int(match.group(1))
+    return None
+
+
+def to_vector(value: VectorValue, dimension: Optional[int] = None) -> np.ndarray:
+    """
+    Convert any supported vector representation into a float32 array.
+
+    Accepts the packed binary encoding, its base64 form (as found in JSON
+    chunks), legacy bracketed text such as "[0.1, 0.2]", and sequences of floats.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        vector = np.frombuffer(value, dtype=VECTOR_DTYPE)
+    elif isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            vector = np.fromstring(text.strip("[]"), dtype=np.float32, sep=",")
+        else:
+            vector = np.frombuffer(base64.b64decode(text), dtype=VECTOR_DTYPE)
+    else:
+        vector = np.asarray(value, dtype=VECTOR_DTYPE)
+
+    if vector.ndim != 1:
+        raise ValueError(f"Expected a one-dimensional vector, got shape {vector.shape}")
+    if dimension is not None and vector.shape[0] != dimension:
+        raise ValueError(
+            f"Expected a vector of dimension {dimension}, got {vector.shape[0]}"
+        )
+    return vector
+
+
+def encode_vector(value: VectorValue, dimension: Optional[int] = None) -> bytes:
+    """
+    Encode a vector as packed little-endian float32 bytes.
+    """
+    return to_vector(value, dimension).astype(VECTOR_DTYPE, copy=False).tobytes()
+
+
+def encode_vector_json(value: VectorValue, dimension: Optional[int] = None) -> str:
+    """
+    Encode a vector as base64 text so it can travel inside JSON chunks.
+    """
+    return base64.b64encode(encode_vector(value, dimension)).decode("ascii")
+
+
+def decode_vector(value: VectorValue) -> List[float]:
+    """
+    Decode any supported vector representation into a list of floats.
+    """
+    return to_vector(value).tolist()
+
+
+def vectors_from_blobs(blobs: Sequence[bytes], dimension: Optional[int] = None) -> np.ndarray:
+    """
+    Stack packed vectors into one (n, dim) float32 matrix without per-row parsing.
+    """
+    if not blobs:
+        return np.empty((0, dimension or 0), dtype=np.float32)
+    if any(blob is None for blob in blobs):
+        raise ValueError("Cannot score rows with a NULL vector")
+    sizes = {len(blob) for blob in blobs}
+    if len(sizes) != 1:
+        raise ValueError("All vectors must have the same dimension")
+    flat = np.frombuffer(b"".join(blobs), dtype=VECTOR_DTYPE)
+    return flat.reshape(len(blobs), -1).astype(np.float32, copy=False)
+
+
+# SQLite returns VECTOR columns as lists of floats when the connection is
+# opened with PARSE_DECLTYPES
+sqlite3.register_converter("VECTOR", decode_vector)
+sqlite3.register_converter(_LIST_FLOAT_TYPE, decode_vector)
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+# Bytes of the database file memory-mapped, and KiB of SQLite page cache, per connection
+DEFAULT_MMAP_SIZE = 256 << 20
+DEFAULT_CACHE_SIZE_KIB = 64 << 10
+
+METADATA_TABLE = "_zerokdb_tables"
+
+
+class WorkingSet:
+    """
+    File-backed SQLite database holding the tables a SimpleSQLDatabase has
+    loaded, so a restarted process serves them without downloading them again.
+
+    Next to each table it keeps the storage's sync state (for IPFS storage the
+    sequence CID and chunk ids the rows were loaded from), its vector indexes
+    and when it was last used. The state is written in the same transaction
+    as the rows, so after a restart only newer chunks are fetched. With
+    `max_bytes`, the least recently used tables are dropped whole once the
+    file holds more than that.
+
+    The file belongs to one process at a time; give each worker its own.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: Optional[int] = None,
+        mmap_size: int = DEFAULT_MMAP_SIZE,
+        cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+        # Only takes effect on a new file; freed pages are then returned by incremental_vacuum
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL commits survive process crashes without an fsync per transaction
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self.conn.execute(f"PRAGMA cache_size={-int(cache_size_kib)}")
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {METADATA_TABLE} "
+            "(table_name TEXT PRIMARY KEY, state TEXT, indexes TEXT, last_used REAL)"
+        )
+        self.conn.commit()
+        self.last_used: Dict[str, float] = {}
+        self.closed = False
+
+    def tables(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the sync state and indexes of every table kept in the file.
+        Tables without a recorded state (e.g. left half-loaded) are dropped.
+        """
+        stored = {
+            table_name: {"state": json.loads(state), "indexes": json.loads(indexes), "last_used": last_used}
+            for table_name, state, indexes, last_used in self.conn.execute(
+                f"SELECT table_name, state, indexes, last_used FROM {METADATA_TABLE}"
+            )
+        }
+        existing = {
+            name
+            for (name,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            if name != METADATA_TABLE
+        }
+        for table_name in existing - set(stored):
+            self.conn.execute(f"DROP TABLE {table_name}")
+        for table_name in set(stored) - existing:
+            self.conn.execute(f"DELETE FROM {METADATA_TABLE} WHERE table_name = ?", (table_name,))
+            del stored[table_name]
+        self.conn.commit()
+        for table_name, entry in stored.items():
+            self.last_used[table_name] = entry["last_used"]
+        return stored
+
+    def touch(self, table_name: str):
+        self.last_used[table_name] = time.time()
+
+    def remember(self, table_name: str, state: Dict[str, Any], indexes: Dict[str, Any]):
+        """
+        Record a table's sync state and indexes, in the caller's open transaction.
+        """
+        self.touch(table_name)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {METADATA_TABLE} (table_name, state, indexes, last_used) VALUES (?, ?, ?, ?)",
+            (table_name, json.dumps(state), json.dumps(indexes), self.last_used[table_name]),
+        )
+
+    def forget(self, table_name: str):
+        """
+        Drop a table and its metadata, in the caller's open transaction.
+        """
+        self.conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        self.conn.execute(f"DELETE FROM {METADATA_TABLE} WHERE table_name = ?", (table_name,))
+        self.last_used.pop(table_name, None)
+
+    def used_bytes(self) -> int:
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def eviction_candidates(self, keep: Iterable[str] = ()) -> List[str]:
+        """
+        Tables that can be evicted, least recently used first, other than those in `keep`.
+        """
+        keep = set(keep)
+        return sorted(
+            (table_name for table_name in self.last_used if table_name not in keep),
+            key=lambda table_name: self.last_used[table_name],
+        )
+
+    def over_budget(self) -> bool:
+        return self.max_bytes is not None and self.used_bytes() > self.max_bytes
+
+    def vacuum(self):
+        self.conn.execute("PRAGMA incremental_vacuum")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Usage times are only kept in memory between writes
+        self.conn.executemany(
+            f"UPDATE {METADATA_TABLE} SET last_used = ? WHERE table_name = ?",
+            [(last_used, table_name) for table_name, last_used in self.last_used.items()],
+        )
+        self.conn.commit()
+        self.conn.close()
@@ -13,6 +13,7 @@ from zerok.polynomials.field import SCALE
 from zerok.prover.prover import ZkProver
 
 from zerokdb.ipfs_storage import TableData
+from zerokdb.vector_type import encode_vector, is_vector_type
 
 sys.set_int_max_str_digits(100000)
 
@@ -37,7 +38,7 @@ def hash_value(value: Union[str, int, float, bool, datetime]) -> int:
 def hash_table_column(
     column_name: str,
     column_type: str,
-    column_value: Union[str, int, float, bool, datetime, List[float]],
+    column_value: Union[str, int, float, bool, datetime, List[float], bytes],
     column_index: int,
 ) -> int:
     type_handlers = {
@@ -47,11 +48,13 @@ def hash_table_column(
         "FLOAT": lambda x: int(round(x * 1e8)),
         "BOOL": int,
         "DATETIME": lambda x: int(x.timestamp()),
-        "LIST[FLOAT]": lambda x: int.from_bytes(
-            hashlib.sha256(str(x).encode()).digest(), "big"
+        # Vectors hash their packed float32 encoding, whichever form they arrive in
+        "VECTOR": lambda x: int.from_bytes(
+            hashlib.sha256(encode_vector(x)).digest(), "big"
         ),
     }
 
+    column_type = "VECTOR" if is_vector_type(column_type) else column_type
     if column_type not in type_handlers:
         raise ValueError(f"Unsupported column type: {column_type}")
 
@@ -1,12 +1,43 @@
+from typing import Dict, Optional
+
 from pydantic_settings import BaseSettings
 from dotenv import find_dotenv
 
+from zerokdb.text_to_embedding import DEFAULT_MODEL_NAME
+
 
 class Settings(BaseSettings):
     pinata_api_key: str
     api_host: str
     aptos_table_sequence_contract: str
     aptos_private_key: str
+    embedding_model_name: str = DEFAULT_MODEL_NAME
+    warm_up_embedding_model: bool = True
+    embedding_max_batch_size: int = 32
+    embedding_batch_window_ms: float = 5
+    embedding_cache_size: int = 10000
+    embedding_cache_path: Optional[str] = None
+    # Compact a table's sequence after an append once more chunks (or bytes)
+    # than this were appended since its last compaction
+    auto_compaction: bool = True
+    compaction_max_chunks: int = 64
+    compaction_max_delta_bytes: Optional[int] = 64 << 20
+    snapshot_max_rows: int = 50000
+    snapshot_max_bytes: int = 8 << 20
+    # "json" or "columnar"; chunks in either format stay readable
+    chunk_format: str = "json"
+    # None, "zstd", "zlib", "lzma" or "auto" (zstd when installed, zlib otherwise)
+    compression: Optional[str] = None
+    # "paged" sequences are appended to in O(log n) pages of `sequence_fanout` entries;
+    # "flat" ones are rewritten whole on every append
+    sequence_format: str = "paged"
+    sequence_fanout: int = 64
+    # Pooled connections to Pinata and the IPFS gateway, shared by every request
+    http_pool_size: int = 32
+    http_host_pool_sizes: Dict[str, int] = {}
+    http_connect_timeout: float = 5
+    http_read_timeout: float = 60
+    http2: bool = False
 
     class Config:
         extra = "allow"
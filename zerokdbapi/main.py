@@ -1,20 +1,47 @@
+import asyncio
 import json
 import os
-from typing import Any, Dict
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
 
 import TableSequenceClient
 from aptos_sdk.account import Account
 from config import settings
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from TextToEmbedding import TextToEmbedding
 
+from zerokdb.embedding_batcher import EmbeddingBatcher
+from zerokdb.embedding_cache import EmbeddingCache
+from zerokdb.http_transport import HTTPTransport
 from zerokdb.ipfs_storage import IPFSStorage
+from zerokdb.text_to_embedding import TextToEmbedding, model_registry
 
 from dotenv import load_dotenv
 
 load_dotenv()
 app = FastAPI()
+embedding_cache = EmbeddingCache(settings.embedding_cache_size, settings.embedding_cache_path)
+text_to_embedding = TextToEmbedding(settings.embedding_model_name, cache=embedding_cache)
+http_transport = HTTPTransport(
+    pool_maxsize=settings.http_pool_size,
+    host_pool_sizes=settings.http_host_pool_sizes,
+    connect_timeout=settings.http_connect_timeout,
+    read_timeout=settings.http_read_timeout,
+    http2=settings.http2,
+)
+# Concurrent /convert-to-embedding cache misses share one forward pass
+embedding_batcher = EmbeddingBatcher(
+    TextToEmbedding(settings.embedding_model_name, cache=None).convert_batch,
+    max_batch_size=settings.embedding_max_batch_size,
+    window=settings.embedding_batch_window_ms / 1000,
+)
+# Appends to a table and the switch to its compacted sequence take the table's
+# lock, so neither overwrites the other's sequence update
+table_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+# One compaction runs per table at a time, and one more is queued at most
+compaction_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+queued_compactions = set()
 
 
 class AppendDataPayload(BaseModel):
@@ -22,6 +49,11 @@ class AppendDataPayload(BaseModel):
     table_name: str
 
 
+class AppendChunksPayload(BaseModel):
+    chunks: List[Dict[str, Any]]
+    table_name: str
+
+
 class EntityPayload(BaseModel):
     entity_name: str
     data: Dict[str, Any]
@@ -31,10 +63,23 @@ class EmbeddingPayload(BaseModel):
     text: str
 
 
+class EmbeddingBatchPayload(BaseModel):
+    texts: List[str]
+    batch_size: int = 32
+
+
 class EntityNamePayload(BaseModel):
     entity_name: str
 
 
+class CompactPayload(BaseModel):
+    table_name: str
+    # Compact even when the sequence is below the configured thresholds
+    force: bool = False
+    max_chunk_rows: Optional[int] = None
+    max_chunk_bytes: Optional[int] = None
+
+
 async def get_table_sequence_client():
     node_url = os.getenv("APTOS_NODE_URL", "https://fullnode.testnet.aptoslabs.com/v1")
     return TableSequenceClient.TableSequenceClient(node_url)
@@ -43,10 +88,118 @@ async def get_table_sequence_client():
 async def get_sender():
     return Account.load_key(os.getenv("APTOS_PRIVATE_KEY"))
 
+
+def new_ipfs_storage() -> IPFSStorage:
+    return IPFSStorage(
+        pinata_api_key=settings.pinata_api_key,
+        chunk_format=settings.chunk_format,
+        compression=settings.compression,
+        transport=http_transport,
+        sequence_format=settings.sequence_format,
+        sequence_fanout=settings.sequence_fanout,
+    )
+
+
+async def get_table_sequence(client, account, table_name: str) -> Optional[Tuple[int, str]]:
+    sequence = await client.get_sequence_by_table_name(str(account.address()), table_name)
+    if not sequence:
+        return None
+    parsed_result = json.loads(sequence.decode("utf-8"))
+    return int(parsed_result[0]), parsed_result[2]
+
+
+async def compact_table(
+    client,
+    account,
+    table_name: str,
+    force: bool = False,
+    max_chunk_rows: Optional[int] = None,
+    max_chunk_bytes: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Compact a table's sequence when it is over the thresholds (or `force` is set)
+    and point the on-chain sequence at the compacted one.
+    """
+    async with compaction_locks[table_name]:
+        return await _compact_table(client, account, table_name, force, max_chunk_rows, max_chunk_bytes)
+
+
+async def _compact_table(
+    client,
+    account,
+    table_name: str,
+    force: bool,
+    max_chunk_rows: Optional[int],
+    max_chunk_bytes: Optional[int],
+) -> Optional[Dict[str, Any]]:
+    table_sequence = await get_table_sequence(client, account, table_name)
+    if table_sequence is None:
+        raise HTTPException(status_code=404, detail="Entity not found.")
+    id_, cid = table_sequence
+
+    storage = new_ipfs_storage()
+    sequence = await run_in_threadpool(storage.load_sequence_root, cid)
+    if not force and not storage.needs_compaction(
+        sequence, settings.compaction_max_chunks, settings.compaction_max_delta_bytes
+    ):
+        return None
+    new_cid, chunk_cids = await run_in_threadpool(
+        storage.compact,
+        cid,
+        max_chunk_rows or settings.snapshot_max_rows,
+        max_chunk_bytes or settings.snapshot_max_bytes,
+        sequence,
+    )
+    if new_cid == cid:
+        return None
+
+    # Chunks appended while compacting are carried over to the compacted sequence;
+    # appends wait until it is on chain
+    async with table_locks[table_name]:
+        _, latest_cid = await get_table_sequence(client, account, table_name)
+        if latest_cid != cid:
+            new_cid = await run_in_threadpool(storage.rebase_sequence, new_cid, cid, latest_cid)
+        await client.update_sequence_cid(account, id_, new_cid)
+    return {"sequence_cid": new_cid, "compacted_from": cid, "chunk_cids": chunk_cids}
+
+
+async def compact_table_in_background(client, account, table_name: str):
+    try:
+        async with compaction_locks[table_name]:
+            # Appends from here on queue the next compaction; earlier ones are covered by this one
+            queued_compactions.discard(table_name)
+            await _compact_table(client, account, table_name, False, None, None)
+    except Exception as e:
+        print('Error while compacting table: ', e)
+
+
+def queue_compaction(background_tasks: BackgroundTasks, client, account, table_name: str):
+    if settings.auto_compaction and table_name not in queued_compactions:
+        queued_compactions.add(table_name)
+        background_tasks.add_task(compact_table_in_background, client, account, table_name)
+
+
+@app.on_event("startup")
+async def warm_up_embedding_model():
+    if settings.warm_up_embedding_model:
+        await run_in_threadpool(model_registry.warm_up, settings.embedding_model_name)
+
+
+@app.on_event("shutdown")
+async def stop_embedding_batcher():
+    await embedding_batcher.close()
+
+
+@app.on_event("shutdown")
+async def close_http_transport():
+    http_transport.close()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "OK", "message": "Service is up and running"}
 
+
 @app.post("/sequence/name")
 async def get_cid_sequence_by_table_name(
     payload: EntityNamePayload,
@@ -96,7 +249,7 @@ async def create_entity(
             raise HTTPException(
                 status_code=400, detail="Invalid entity name. Entity already exists."
             )
-        storage = IPFSStorage(pinata_api_key=settings.pinata_api_key)
+        storage = new_ipfs_storage()
         data_cid, sequence_cid = storage.append_data(EntityPayload.data, "0x0")
         await client.create_sequence(account, EntityPayload.entity_name, sequence_cid)
         return {
@@ -111,21 +264,21 @@ async def create_entity(
 @app.post("/append-data")
 async def append_data_by_table_name(
     payload: AppendDataPayload,
+    background_tasks: BackgroundTasks,
     account: Account = Depends(get_sender),
     client: TableSequenceClient = Depends(get_table_sequence_client)
 ):
     try:
-        sequence = await client.get_sequence_by_table_name(str(account.address()), payload.table_name)
-        if not sequence:
-            raise HTTPException(status_code=404, detail="Entity not found.")
+        async with table_locks[payload.table_name]:
+            table_sequence = await get_table_sequence(client, account, payload.table_name)
+            if table_sequence is None:
+                raise HTTPException(status_code=404, detail="Entity not found.")
+            id_, cid = table_sequence
 
-        decoded_result = sequence.decode("utf-8")
-        parsed_result = json.loads(decoded_result)
-        id_, _, cid = int(parsed_result[0]), parsed_result[1], parsed_result[2]
-
-        storage = IPFSStorage(pinata_api_key=settings.pinata_api_key)
-        data_cid, cid_sequence = storage.append_data(payload.data, cid)
-        await client.update_sequence_cid(account, id_, cid_sequence)
+            storage = new_ipfs_storage()
+            data_cid, cid_sequence = await run_in_threadpool(storage.append_data, payload.data, cid)
+            await client.update_sequence_cid(account, id_, cid_sequence)
+        queue_compaction(background_tasks, client, account, payload.table_name)
 
         return {"data_cid": data_cid, "sequence_cid": cid_sequence}
     except HTTPException:
@@ -135,11 +288,68 @@ async def append_data_by_table_name(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/append-data/batch")
+async def append_chunks_by_table_name(
+    payload: AppendChunksPayload,
+    background_tasks: BackgroundTasks,
+    account: Account = Depends(get_sender),
+    client: TableSequenceClient = Depends(get_table_sequence_client)
+):
+    try:
+        if not payload.chunks:
+            raise HTTPException(status_code=400, detail="No chunks to append.")
+        async with table_locks[payload.table_name]:
+            table_sequence = await get_table_sequence(client, account, payload.table_name)
+            if table_sequence is None:
+                raise HTTPException(status_code=404, detail="Entity not found.")
+            id_, cid = table_sequence
+
+            # All chunks are pinned first, then the sequence is updated on chain once
+            storage = new_ipfs_storage()
+            data_cids, cid_sequence = await run_in_threadpool(storage.append_chunks, payload.chunks, cid)
+            await client.update_sequence_cid(account, id_, cid_sequence)
+        queue_compaction(background_tasks, client, account, payload.table_name)
+
+        return {"data_cids": data_cids, "sequence_cid": cid_sequence}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print('Error while appending data: ', e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/compact")
+async def compact_table_by_name(
+    payload: CompactPayload,
+    account: Account = Depends(get_sender),
+    client: TableSequenceClient = Depends(get_table_sequence_client)
+):
+    try:
+        result = await compact_table(
+            client,
+            account,
+            payload.table_name,
+            force=payload.force,
+            max_chunk_rows=payload.max_chunk_rows,
+            max_chunk_bytes=payload.max_chunk_bytes,
+        )
+        if result is None:
+            return {"compacted": False}
+        return {"compacted": True, **result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print('Error while compacting table: ', e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/convert-to-embedding")
 async def convert_to_embedding(payload: EmbeddingPayload):
     try:
-        text_to_embedding = TextToEmbedding()
-        embedding = text_to_embedding.convert(payload.text)
+        embedding = embedding_cache.get(settings.embedding_model_name, payload.text)
+        if embedding is None:
+            embedding = await embedding_batcher.embed(payload.text)
+            embedding_cache.put(settings.embedding_model_name, payload.text, embedding)
 
         if not isinstance(embedding, list):
             raise HTTPException(status_code=500, detail="Failed to generate valid embedding.")
@@ -147,3 +357,20 @@ async def convert_to_embedding(payload: EmbeddingPayload):
         return {"embedding": embedding}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/convert-to-embedding/cache-stats")
+async def get_embedding_cache_stats():
+    return embedding_cache.stats()
+
+
+@app.post("/convert-to-embedding/batch")
+async def convert_to_embedding_batch(payload: EmbeddingBatchPayload):
+    try:
+        # Inference runs in the thread pool so it does not block the event loop
+        embeddings = await run_in_threadpool(
+            text_to_embedding.convert_batch, payload.texts, payload.batch_size
+        )
+        return {"embeddings": embeddings}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))